@@ -0,0 +1,606 @@
+"""Local stand-in for the Datadog HTTP endpoints used by modules/.
+
+Serves deterministic, schema-valid payloads with configurable latency, payload size
+and pagination so tool performance can be measured without a Datadog account:
+
+    python -m bench.fake_datadog --port 8126 --latency-ms 50 --series 4 --points 500
+
+Point the server at it with DATADOG_HOST=http://127.0.0.1:8126.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+MONITOR_STATES = ["OK", "OK", "OK", "OK", "Alert", "Warn", "No Data"]
+TRACE_FANOUT = 4
+SERVICES = ["web", "checkout", "payments", "inventory", "search", "auth", "cart", "shipping"]
+# Aggregations the Spans aggregate API accepts; anything else is a 400
+SPAN_AGGREGATIONS = {"count", "cardinality", "pc75", "pc90", "pc95", "pc98", "pc99", "sum", "min", "max", "avg", "median"}
+
+
+class FakeApiError(Exception):
+    """Raised by a route to answer with an error status instead of a payload."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class FakeDatadogSettings:
+    latency_ms: float = 20.0     # Base latency added to every response
+    jitter_ms: float = 5.0       # Uniform random latency added on top of latency_ms
+    series: int = 4              # Series per metrics query
+    points: int = 300            # Points per series (spread evenly over the query window)
+    items: int = 200             # Length of list payloads (monitors, hosts, dashboards)
+    metric_names: int = 200      # Active metric names
+    spans: int = 2000            # Spans matching any span search
+    graph_services: int = 40     # Services in the APM dependency map
+    anomalous_services: tuple = ()  # Services whose metrics are 4x higher over the last hour
+    page_size: int = 1000        # Server-side cap on spans per search page
+    rate_limit: int = 0          # Requests allowed per route and rate_limit_period, 0 for no limit
+    rate_limit_period: float = 10.0
+    seed: int = 42
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+class FakeDatadogHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    routes = [
+        ("GET", re.compile(r"^/api/v1/query$"), "metrics_query"),
+        ("GET", re.compile(r"^/api/v1/search$"), "metrics_search"),
+        ("GET", re.compile(r"^/api/v1/metrics$"), "active_metrics"),
+        ("GET", re.compile(r"^/api/v1/monitor$"), "monitors_list"),
+        ("GET", re.compile(r"^/api/v1/monitor/search$"), "monitors_search"),
+        ("GET", re.compile(r"^/api/v1/monitor/(?P<monitor_id>\d+)$"), "monitor_get"),
+        ("GET", re.compile(r"^/api/v1/hosts$"), "hosts_list"),
+        ("GET", re.compile(r"^/api/v1/hosts/totals$"), "hosts_totals"),
+        ("GET", re.compile(r"^/api/v1/tags/hosts$"), "host_tags"),
+        ("GET", re.compile(r"^/api/v2/monitor/policy$"), "monitor_policies"),
+        ("GET", re.compile(r"^/api/v1/dashboard$"), "dashboards_list"),
+        ("GET", re.compile(r"^/api/v1/service_dependencies$"), "service_dependencies"),
+        ("POST", re.compile(r"^/api/v2/spans/events/search$"), "spans_search"),
+        ("POST", re.compile(r"^/api/v2/spans/analytics/aggregate$"), "spans_aggregate"),
+        ("GET", re.compile(r"^/api/v2/incidents$"), "incidents_list"),
+        ("GET", re.compile(r"^/api/v2/incidents/(?P<incident_id>[^/]+)$"), "incident_get"),
+        ("GET", re.compile(r"^/api/v2/usage/hourly_usage$"), "hourly_usage"),
+    ]
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"null") if length else None
+
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(url.path) if route_method == method else None
+            if match:
+                break
+        else:
+            self._send(404, {"errors": [f"No fake route for {method} {url.path}"]}, "unmatched")
+            return
+
+        rate_limit_headers = self.server.take_quota(name)
+        if rate_limit_headers and rate_limit_headers["X-RateLimit-Remaining"] == "-1":
+            rate_limit_headers["X-RateLimit-Remaining"] = "0"
+            self._send(429, {"errors": ["Rate limit exceeded"]}, "throttled", rate_limit_headers)
+            return
+
+        settings = self.server.settings
+        time.sleep((settings.latency_ms + random.uniform(0, settings.jitter_ms)) / 1000)
+        try:
+            payload = getattr(self, f"_{name}")(params, body, **match.groupdict())
+        except FakeApiError as e:
+            self._send(e.status, {"errors": [str(e)]}, name, rate_limit_headers)
+            return
+        self._send(200, payload, name, rate_limit_headers)
+
+    def _send(self, status, payload, route, extra_headers=None):
+        data = json.dumps(payload).encode()
+        self.server.record(route, len(data))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for header, value in (extra_headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Metrics
+
+    def _metrics_query(self, params, body):
+        settings = self.server.settings
+        from_ts, to_ts = int(params.get("from", 0)), int(params.get("to", 0))
+        query = params.get("query", "")
+        metric = re.sub(r"^\w+:", "", query).split("{")[0] or "system.cpu.user"
+        rollup = re.search(r"\.rollup\(\s*\w+\s*,\s*(\d+)\s*\)", query)
+        if rollup:
+            # Explicit rollups are honoured like Datadog does, up to its ~1500 point cap
+            interval = max(int(rollup.group(1)), (to_ts - from_ts) // 1500 + 1)
+            count = (to_ts - from_ts) // interval + 1
+        else:
+            interval = max(1, (to_ts - from_ts) // max(1, settings.points))
+            count = settings.points
+        # Grouped queries ("{service:a OR service:b} by {service}") get one series per selected value
+        group = re.search(r"\bby\s*\{([\w.]+)\}", query)
+        group_tag = group.group(1) if group else "service"
+        selected = re.findall(rf"(?<![\w.]){re.escape(group_tag)}:([\w.\-/]+)", query.split("}")[0]) if group else []
+        scopes = [f"{group_tag}:{value}" for value in selected] or [
+            f"service:{SERVICES[i % len(SERVICES)]}" for i in range(settings.series)
+        ]
+        series = []
+        recent = int(time.time()) - 3600
+        for i, scope in enumerate(scopes):
+            factor = 4 if scope.partition(":")[2] in settings.anomalous_services else 1
+            start = from_ts - from_ts % interval
+            # Values depend only on the timestamp, so overlapping queries agree on shared buckets
+            pointlist = [
+                [float(ts * 1000), round((50 + 20 * random.Random(f"{settings.seed}:{query}:{i}:{ts}").random() + i) * (factor if ts >= recent else 1), 4)]
+                for ts in (start + n * interval for n in range(count))
+                if ts <= to_ts
+            ]
+            series.append({
+                "metric": metric,
+                "display_name": metric,
+                # Datadog keeps an explicit rollup in each series' expression
+                "expression": f"{query.split('{')[0]}{{{scope}}}{rollup.group(0) if rollup else ''}",
+                "scope": scope,
+                "tag_set": [scope],
+                "aggr": "avg",
+                "interval": interval,
+                "length": len(pointlist),
+                "start": int(pointlist[0][0]) if pointlist else from_ts * 1000,
+                "end": int(pointlist[-1][0]) if pointlist else to_ts * 1000,
+                "pointlist": pointlist,
+                "query_index": 0,
+                "unit": None,
+            })
+        return {
+            "status": "ok",
+            "res_type": "time_series",
+            "query": query,
+            "from_date": from_ts * 1000,
+            "to_date": to_ts * 1000,
+            "series": series,
+            "group_by": [group_tag],
+        }
+
+    def _metric_names(self):
+        prefixes = ["system.cpu", "system.mem", "system.disk", "trace.http.request", "trace.db.query", "app.checkout"]
+        suffixes = ["user", "idle", "used", "free", "hits", "errors", "duration", "latency", "count"]
+        return [
+            f"{prefixes[i % len(prefixes)]}.{suffixes[(i // len(prefixes)) % len(suffixes)]}.{i}"
+            for i in range(self.server.settings.metric_names)
+        ]
+
+    def _metrics_search(self, params, body):
+        q = params.get("q", "").removeprefix("metrics:")
+        return {"results": {"metrics": [m for m in self._metric_names() if q in m]}}
+
+    def _active_metrics(self, params, body):
+        return {"from": params.get("from", "0"), "metrics": self._metric_names()}
+
+    # Monitors
+
+    def _monitor(self, i):
+        now = int(time.time())
+        service = SERVICES[i % len(SERVICES)]
+        return {
+            "id": i + 1,
+            "name": f"{service} latency monitor {i + 1}",
+            "type": "metric alert",
+            "query": f"avg(last_5m):avg:trace.http.request.duration{{service:{service}}} > 2",
+            "message": f"Latency is high on {service} @oncall",
+            "tags": [f"service:{service}", "team:platform"],
+            "overall_state": MONITOR_STATES[i % len(MONITOR_STATES)],
+            "created": _iso(now - 86400 * 30),
+            "modified": _iso(now - 3600 * (i % 48)),
+            "options": {"notify_no_data": False},
+        }
+
+    def _monitor_policies(self, params, body):
+        return {
+            "data": [
+                {
+                    "id": f"policy-{n}",
+                    "type": "monitor-config-policy",
+                    "attributes": {
+                        "policy_type": "tag",
+                        "policy": {"tag_key": key, "tag_key_required": True, "valid_tag_values": values},
+                    },
+                }
+                for n, (key, values) in enumerate([("service", SERVICES), ("team", ["platform", "payments"])])
+            ]
+        }
+
+    def _monitors_list(self, params, body):
+        total = self.server.settings.items
+        if "page" not in params:
+            return [self._monitor(i) for i in range(total)]
+        page_size = int(params.get("page_size", 100))
+        page = int(params["page"])
+        return [self._monitor(i) for i in range(page * page_size, min(total, (page + 1) * page_size))]
+
+    def _monitors_search(self, params, body):
+        per_page = int(params.get("per_page", 30))
+        page = int(params.get("page", 0))
+        total = self.server.settings.items
+        monitors = [
+            {
+                "id": m["id"],
+                "name": m["name"],
+                "query": m["query"],
+                "status": m["overall_state"],
+                "type": m["type"],
+                "tags": m["tags"],
+            }
+            for m in (self._monitor(i) for i in range(page * per_page, min(total, (page + 1) * per_page)))
+        ]
+        return {
+            "monitors": monitors,
+            "metadata": {"page": page, "per_page": per_page, "page_count": -(-total // per_page), "total_count": total},
+        }
+
+    def _monitor_get(self, params, body, monitor_id):
+        return self._monitor(int(monitor_id) - 1)
+
+    # Hosts, tags and dashboards
+
+    def _hosts_list(self, params, body):
+        count = int(params.get("count", 100))
+        start = int(params.get("start", 0))
+        total = self.server.settings.items
+        hosts = [
+            {
+                "id": i + 1,
+                "name": f"i-{i:08x}",
+                "host_name": f"i-{i:08x}",
+                "aliases": [f"ip-10-0-{i // 256}-{i % 256}"],
+                "apps": ["agent", "ntp"],
+                "is_muted": i % 17 == 0,
+                "up": i % 23 != 0,
+                "last_reported_time": int(time.time()) - i % 120,
+                "tags_by_source": {"Datadog": [f"service:{SERVICES[i % len(SERVICES)]}", "env:prod"]},
+            }
+            for i in range(start, min(total, start + count))
+        ]
+        return {"host_list": hosts, "total_matching": total, "total_returned": len(hosts)}
+
+    def _hosts_totals(self, params, body):
+        total = self.server.settings.items
+        return {"total_active": total, "total_up": total - total // 23}
+
+    def _host_tags(self, params, body):
+        hosts = [f"i-{i:08x}" for i in range(self.server.settings.items)]
+        return {"tags": {f"service:{s}": hosts[n::len(SERVICES)] for n, s in enumerate(SERVICES)}}
+
+    def _dashboards_list(self, params, body):
+        now = int(time.time())
+        return {
+            "dashboards": [
+                {
+                    "id": f"abc-{i:03d}-xyz",
+                    "title": f"{SERVICES[i % len(SERVICES)].title()} overview {i}",
+                    "author_handle": "owner@example.com",
+                    "description": None,
+                    "is_read_only": False,
+                    "layout_type": "ordered",
+                    "created_at": _iso(now - 86400 * 90),
+                    "modified_at": _iso(now - 86400 * (i % 30)),
+                    "url": f"/dashboard/abc-{i:03d}-xyz",
+                }
+                for i in range(self.server.settings.items)
+            ]
+        }
+
+    # Service dependencies
+
+    def _graph_service(self, k):
+        return SERVICES[k] if k < len(SERVICES) else f"svc-{k}"
+
+    def _service_dependencies(self, params, body):
+        """Services as a tree with 3 callees each (service 0 is "web"), plus a cross edge deeper into the tree."""
+        n = self.server.settings.graph_services
+        graph = {}
+        for k in range(n):
+            calls = {c for c in (3 * k + 1, 3 * k + 2, 3 * k + 3, (7 * k + 5) % n) if k < c < n}
+            graph[self._graph_service(k)] = {"calls": [self._graph_service(c) for c in sorted(calls)]}
+        return graph
+
+    # Spans
+
+    def _span(self, i, trace_count):
+        now = int(time.time())
+        trace = i % trace_count
+        service = SERVICES[(i // trace_count) % len(SERVICES)]
+        start = now - 600 + (i % 600)
+        return {
+            "id": f"span-{i}",
+            "type": "spans",
+            "attributes": {
+                "service": service,
+                "resource_name": f"GET /{service}/{i % 7}",
+                "trace_id": f"{trace + 1}",
+                "span_id": f"{trace + 1}{i:06d}",
+                "parent_id": "0" if i < trace_count else f"{trace + 1}{i - trace_count:06d}",
+                "start_timestamp": _iso(start),
+                "end_timestamp": _iso(start + 1),
+                "env": "prod",
+                "host": f"i-{i % 50:08x}",
+                "type": "web",
+                "tags": [f"service:{service}", "env:prod"],
+                "custom": {
+                    "duration": 1_000_000 * (5 + (i * 37) % 400),
+                    "error": 1 if i % 29 == 0 else 0,
+                },
+            },
+        }
+
+    def _spans_search(self, params, body):
+        settings = self.server.settings
+        attributes = (body or {}).get("data", {}).get("attributes", {})
+        page = attributes.get("page", {})
+        limit = min(int(page.get("limit", 10)), settings.page_size)
+        offset = int(page.get("cursor") or 0)
+        end = min(settings.spans, offset + limit)
+        trace_count = max(1, settings.spans // 20)
+        meta = {"elapsed": 12, "request_id": f"req-{offset}", "status": "done", "page": {}}
+        if end < settings.spans:
+            meta["page"]["after"] = str(end)
+        trace = re.search(r"trace_id:(\S+)", attributes.get("filter", {}).get("query", ""))
+        if trace:
+            return {"data": [self._trace_span(trace.group(1), k) for k in range(offset, end)], "meta": meta}
+        return {"data": [self._span(i, trace_count) for i in range(offset, end)], "meta": meta}
+
+    def _trace_span(self, trace_id, k):
+        """Span k of a single trace of settings.spans spans: a tree with 4 children per span.
+
+        Children run in overlapping slots inside their parent, so self time and the critical
+        path both have something to do.
+        """
+        chain = [k]
+        while chain[-1]:
+            chain.append((chain[-1] - 1) // TRACE_FANOUT)
+        # Aligned to the hour so every page of a trace agrees on its timing
+        start, duration = float(int(time.time()) // 3600 * 3600) * 1e9, 10e9
+        for node in reversed(chain[:-1]):
+            slot = (node - 1) % TRACE_FANOUT
+            start += duration * (0.05 + 0.2 * slot)
+            duration *= 0.3
+        service = SERVICES[len(chain) % len(SERVICES)]
+        return {
+            "id": f"span-{k}",
+            "type": "spans",
+            "attributes": {
+                "service": service,
+                "resource_name": f"GET /{service}/{k % 7}",
+                "trace_id": trace_id,
+                "span_id": str(k + 1),
+                "parent_id": str((k - 1) // TRACE_FANOUT + 1) if k else "0",
+                "start_timestamp": datetime.fromtimestamp(start / 1e9, timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z"),
+                "env": "prod",
+                "custom": {"duration": int(duration), "error": 1 if k % 29 == 0 else 0},
+            },
+        }
+
+    def _spans_aggregate(self, params, body):
+        settings = self.server.settings
+        attributes = (body or {}).get("data", {}).get("attributes", {})
+        query = attributes.get("filter", {}).get("query", "")
+        terms = dict(re.findall(r"([\w.@]+):(\S+)", query))
+        computes = attributes.get("compute") or [{"aggregation": "count"}]
+        group_by = attributes.get("group_by") or []
+        for aggregation in [c.get("aggregation") for c in computes] + [(g.get("sort") or {}).get("aggregation") for g in group_by]:
+            if aggregation is not None and aggregation not in SPAN_AGGREGATIONS:
+                raise FakeApiError(400, f"Invalid aggregation: {aggregation}")
+        trace_count = max(1, settings.spans // 20)
+        groups = {}
+        for i in range(settings.spans):
+            span = self._span(i, trace_count)["attributes"]
+            facets = {**span, "status": "error" if span["custom"]["error"] else "ok"}
+            if any(str(facets.get(k)) != v for k, v in terms.items()):
+                continue
+            key = tuple(facets.get(g["facet"]) for g in group_by)
+            groups.setdefault(key, []).append(span["custom"]["duration"])
+
+        def compute(durations, aggregation):
+            durations = sorted(durations)
+            if aggregation == "count":
+                return len(durations)
+            if aggregation == "median":
+                aggregation = "pc50"
+            if aggregation.startswith("pc"):
+                return durations[min(len(durations) - 1, int(float(aggregation[2:]) / 100 * len(durations)))]
+            return {"avg": sum(durations) / len(durations), "sum": sum(durations), "min": durations[0], "max": durations[-1]}[aggregation]
+
+        buckets = []
+        for key, durations in groups.items():
+            values = {f"c{i}": compute(durations, c["aggregation"]) for i, c in enumerate(computes)}
+            buckets.append((key, values, durations))
+        if group_by:
+            sort = group_by[0].get("sort") or {"aggregation": "count"}
+            buckets.sort(key=lambda bucket: -compute(bucket[2], sort.get("aggregation", "count")))
+            buckets = buckets[:int(group_by[0].get("limit", 10))]
+        data = [
+            {
+                "id": f"bucket-{n}",
+                "type": "bucket",
+                "attributes": {"by": {g["facet"]: v for g, v in zip(group_by, key)}, "computes": values},
+            }
+            for n, (key, values, _) in enumerate(buckets)
+        ]
+        return {"data": data, "meta": {"elapsed": 8, "request_id": "req-aggregate", "status": "done"}}
+
+    # Incidents and usage
+
+    def _incident(self, i):
+        now = int(time.time())
+        return {
+            "id": f"inc-{i + 1}",
+            "type": "incidents",
+            "attributes": {
+                "title": f"Elevated errors on {SERVICES[i % len(SERVICES)]}",
+                "created": _iso(now - 3600 * (i + 1)),
+                "modified": _iso(now - 600 * (i + 1)),
+                "customer_impacted": i % 3 == 0,
+                "public_id": i + 1,
+            },
+        }
+
+    def _incidents_list(self, params, body):
+        size = int(params.get("page[size]", 10))
+        offset = int(params.get("page[offset]", 0))
+        end = min(self.server.settings.items, offset + size)
+        return {"data": [self._incident(i) for i in range(offset, end)]}
+
+    def _incident_get(self, params, body, incident_id):
+        return {"data": self._incident(int(incident_id.rsplit("-", 1)[-1]) - 1)}
+
+    def _hourly_usage(self, params, body):
+        start = datetime.fromisoformat(params.get("filter[timestamp][start]", _iso(time.time() - 86400)))
+        hours = 24
+        return {
+            "data": [
+                {
+                    "id": f"usage-{h}",
+                    "type": "usage_timeseries",
+                    "attributes": {
+                        "org_name": "fake-org",
+                        "product_family": params.get("filter[product_families]", "infra_hosts"),
+                        "timestamp": _iso(start.timestamp() + 3600 * h),
+                        "measurements": [{"usage_type": "infra_host_top99p", "value": 100 + h}],
+                    },
+                }
+                for h in range(hours)
+            ],
+            "meta": {"pagination": {}},
+        }
+
+
+class FakeDatadogServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Concurrent benchmark clients overflow the default backlog of 5
+
+    def __init__(self, address, settings=None):
+        super().__init__(address, FakeDatadogHandler)
+        self.settings = settings or FakeDatadogSettings()
+        self.request_counts = Counter()
+        self.bytes_sent = Counter()
+        self._stats_lock = threading.Lock()
+        self._windows = {}  # route -> [window start, requests in window]
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, route, size):
+        with self._stats_lock:
+            self.request_counts[route] += 1
+            self.bytes_sent[route] += size
+
+    def take_quota(self, route):
+        """Count a request against the route's rate-limit window and return the X-RateLimit-* headers.
+
+        Remaining is reported as -1 when the request is over the limit.
+        """
+        settings = self.settings
+        if not settings.rate_limit:
+            return None
+        now = time.monotonic()
+        with self._stats_lock:
+            window = self._windows.get(route)
+            if window is None or now - window[0] >= settings.rate_limit_period:
+                window = self._windows[route] = [now, 0]
+            window[1] += 1
+            remaining = settings.rate_limit - window[1]
+            reset = max(0.0, window[0] + settings.rate_limit_period - now)
+        return {
+            "X-RateLimit-Name": route,
+            "X-RateLimit-Limit": str(settings.rate_limit),
+            "X-RateLimit-Period": str(int(settings.rate_limit_period)),
+            "X-RateLimit-Remaining": str(max(remaining, -1)),
+            "X-RateLimit-Reset": str(int(reset) + 1),
+        }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.request_counts.clear()
+            self.bytes_sent.clear()
+
+
+def start_server(settings=None, host="127.0.0.1", port=0):
+    """Start the fake server on a background thread and return it."""
+    server = FakeDatadogServer((host, port), settings)
+    threading.Thread(target=server.serve_forever, name="fake-datadog", daemon=True).start()
+    return server
+
+
+def add_settings_arguments(parser):
+    defaults = FakeDatadogSettings()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--series", type=int, default=defaults.series)
+    parser.add_argument("--points", type=int, default=defaults.points)
+    parser.add_argument("--items", type=int, default=defaults.items)
+    parser.add_argument("--metric-names", type=int, default=defaults.metric_names)
+    parser.add_argument("--spans", type=int, default=defaults.spans)
+    parser.add_argument("--graph-services", type=int, default=defaults.graph_services)
+    parser.add_argument("--anomalous-services", default="", help="Comma-separated services with a recent 4x metric spike")
+    parser.add_argument("--page-size", type=int, default=defaults.page_size)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--rate-limit", type=int, default=defaults.rate_limit, help="Requests per route and period, 0 for no limit")
+    parser.add_argument("--rate-limit-period", type=float, default=defaults.rate_limit_period)
+
+
+def settings_from_args(args):
+    return FakeDatadogSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        series=args.series,
+        points=args.points,
+        items=args.items,
+        metric_names=args.metric_names,
+        spans=args.spans,
+        graph_services=args.graph_services,
+        anomalous_services=tuple(filter(None, args.anomalous_services.split(","))),
+        page_size=args.page_size,
+        seed=args.seed,
+        rate_limit=args.rate_limit,
+        rate_limit_period=args.rate_limit_period,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8126)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    server = FakeDatadogServer((args.host, args.port), settings_from_args(args))
+    print(f"Fake Datadog API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
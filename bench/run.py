@@ -0,0 +1,197 @@
+"""Benchmark every registered MCP tool against the local fake Datadog API.
+
+Tools are driven through FastMCP's call_tool(), so argument validation and result
+serialization are measured along with the Datadog round trips:
+
+    python -m bench.run --iterations 50 --concurrency 8 --mode async --latency-ms 50
+
+Reports per-tool throughput, latency percentiles, response size, upstream requests per
+call and RSS growth, plus the process peak RSS. Use --json to keep results for diffing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+import warnings
+
+from bench.fake_datadog import start_server, add_settings_arguments, settings_from_args
+
+# Representative arguments for the read-only tools; tools missing here are skipped
+# because they would create, mutate or delete Datadog objects.
+WINDOW = 3600
+
+
+def tool_arguments(now):
+    window = {"from_time": now - WINDOW, "to_time": now}
+    return {
+        "get_monitor_status": {},
+        "list_monitor_config_policies": {},
+        "search_monitors": {"query": "type:metric"},
+        "get_monitor": {"monitor_id": 1},
+        "list_dashboards": {},
+        "list_prompts": {},
+        "list_hosts": {"count": 100},
+        "get_host_totals": {},
+        "list_incidents": {},
+        "get_incident": {"params": {"incident_id": "inc-1"}},
+        "list_traces": {"query": "env:prod", **window},
+        "summarize_traces": {"query": "env:prod", **window},
+        "get_trace_tree": {"trace_id": "1", **window},
+        "query_metrics": {"query": "avg:system.cpu.user{*} by {service}", **window},
+        "list_metrics": {"q": "metrics:system"},
+        "search_metrics": {"query": "system.cpu"},
+        "query_metrics_batch": {"queries": [f"avg:system.cpu.user{{service:{s}}}" for s in ("web", "checkout", "payments", "search")], **window},
+        "query_p99_latency": {"service_name": "web", **window},
+        "query_error_rate": {"service_name": "web", **window},
+        "query_downstream_latency": {"service_name": "web", **window},
+        "compare_to_baseline": {"service_name": "web", **window},
+        "query_service_metrics": {"services": ["web", "checkout", "payments", "inventory", "search", "auth", "cart", "shipping"], **window},
+        "list_host_tags": {},
+        "get_hourly_usage": {"start_date": time.strftime("%Y-%m-%d", time.gmtime(now - 86400)), "end_date": time.strftime("%Y-%m-%d", time.gmtime(now))},
+        "query_apm_errors": {"service_name": "web", **window},
+        "query_apm_latency": {"service_name": "web", **window},
+        "query_apm_spans": {"service_name": "web", **window},
+        "list_apm_traces": {"query": "service:web", **window},
+        "summarize_apm_traces": {"query": "service:web", **window},
+        "analyze_service_with_apm": {"service_name": "web", **window},
+        "find_downstream_root_cause": {"service_name": "web", **window},
+        "get_downstream_services": {"service_name": "web", "depth": 2},
+        "get_upstream_services": {"service_name": "svc-30"},
+        "get_blast_radius": {"service_name": "svc-30"},
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def is_error(contents):
+    for content in contents:
+        try:
+            result = json.loads(content.text)
+        except (AttributeError, ValueError):
+            continue
+        if isinstance(result, dict) and (result.get("status") == "error" or "error" in result):
+            return True
+    return False
+
+
+async def bench_tool(mcp, server, name, arguments, iterations, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    response_bytes = 0
+
+    async def call():
+        nonlocal errors, response_bytes
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                contents = await mcp.call_tool(name, arguments)
+                errors += is_error(contents)
+                response_bytes += sum(len(getattr(c, "text", "")) for c in contents)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    server.reset_stats()
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(iterations)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "tool": name,
+        "calls": iterations,
+        "errors": errors,
+        "throughput": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "avg_response_bytes": response_bytes / iterations,
+        "upstream_requests_per_call": sum(server.request_counts.values()) / iterations,
+        "upstream_bytes_per_call": sum(server.bytes_sent.values()) / iterations,
+        "throttled": server.request_counts["throttled"],
+        "rss_growth_mb": peak_rss_mb() - rss_before,
+    }
+
+
+def print_report(results, mode, peak):
+    header = f"{'tool':32} {'calls':>5} {'err':>4} {'ops/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'resp KB':>8} {'up req':>6} {'rss MB':>6}"
+    print(f"mode={mode}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['tool']:32} {r['calls']:>5} {r['errors']:>4} {r['throughput']:>8.1f} {r['p50_ms']:>8.1f} "
+            f"{r['p90_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['avg_response_bytes'] / 1024:>8.1f} "
+            f"{r['upstream_requests_per_call']:>6.1f} {r['rss_growth_mb']:>6.1f}"
+        )
+    print(f"peak RSS: {peak:.1f} MB")
+
+
+async def run(args):
+    server = start_server(settings_from_args(args))
+    os.environ["DATADOG_HOST"] = server.url
+    os.environ["DATADOG_ASYNC_MODE"] = "true" if args.mode == "async" else "false"
+    if args.no_cache:
+        os.environ["DATADOG_CACHE_MAX_BYTES"] = "0"
+    os.environ.setdefault("DATADOG_API_KEY", "fake-api-key")
+    os.environ.setdefault("DATADOG_APP_KEY", "fake-app-key")
+
+    import config
+    import main
+
+    # Incident endpoints are unstable in datadog-api-client and disabled by default.
+    for operation in ("list_incidents", "get_incident"):
+        config.configuration.unstable_operations[operation] = True
+    warnings.filterwarnings("ignore", message="Using unstable operation")
+
+    registered = {tool.name for tool in main.mcp._tool_manager.list_tools()}
+    arguments = tool_arguments(int(time.time()))
+    selected = args.tools.split(",") if args.tools else sorted(registered & arguments.keys())
+
+    results = []
+    for name in selected:
+        if name not in registered:
+            print(f"skipping {name}: not registered", file=sys.stderr)
+            continue
+        for _ in range(args.warmup):
+            await main.mcp.call_tool(name, arguments.get(name, {}))
+        results.append(await bench_tool(main.mcp, server, name, arguments.get(name, {}), args.iterations, args.concurrency))
+
+    skipped = sorted(registered - arguments.keys())
+    if skipped and not args.tools:
+        print(f"skipped (mutating or no sample arguments): {', '.join(skipped)}", file=sys.stderr)
+
+    peak = peak_rss_mb()
+    print_report(results, args.mode, peak)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": args.mode, "settings": vars(args), "peak_rss_mb": peak, "results": results}, f, indent=2)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--tools", help="Comma-separated tool names (default: every tool with sample arguments)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the tool result cache so every call reaches the fake API")
+    add_settings_arguments(parser)
+    asyncio.run(run(parser.parse_args()))
@@ -9,11 +9,89 @@ load_dotenv()
 DATADOG_API_KEY = os.getenv("DATADOG_API_KEY")
 DATADOG_APP_KEY = os.getenv("DATADOG_APP_KEY")
 DATADOG_SITE = os.getenv("DATADOG_SITE", "datadoghq.com")
+DATADOG_HOST = os.getenv("DATADOG_HOST")  # Full API base URL override, e.g. the local fake in bench/
 
 # Initialize Datadog API Configuration
 configuration = Configuration()
 configuration.api_key["apiKeyAuth"] = DATADOG_API_KEY
 configuration.api_key["appKeyAuth"] = DATADOG_APP_KEY
 configuration.server_variables["site"] = DATADOG_SITE
+if DATADOG_HOST:
+    configuration.host = DATADOG_HOST
 configuration.verify_ssl = False  # Consider setting to True for production
+# The client still flags the incident read endpoints as unstable and refuses to call them otherwise
+configuration.unstable_operations["list_incidents"] = True
+configuration.unstable_operations["get_incident"] = True
 # configuration.debug = True  # Enable debug mode
+
+# Shared client pool (see modules/client.py)
+DATADOG_POOL_SIZE = int(os.getenv("DATADOG_POOL_SIZE", "10"))  # Max keep-alive connections per API class
+DATADOG_POOL_IDLE_TIMEOUT = int(os.getenv("DATADOG_POOL_IDLE_TIMEOUT", "300"))  # Seconds before an unused client is closed, 0 to disable
+DATADOG_MAX_CONCURRENCY = int(os.getenv("DATADOG_MAX_CONCURRENCY", str(DATADOG_POOL_SIZE * 2)))  # Upper bound of each rate-limit bucket's adaptive concurrency
+DATADOG_MAX_RETRIES = int(os.getenv("DATADOG_MAX_RETRIES", "3"))  # Retries for 429s and read-only 5xx responses
+DATADOG_RETRY_BACKOFF = float(os.getenv("DATADOG_RETRY_BACKOFF", "0.5"))  # Base seconds of the jittered exponential backoff
+DATADOG_RETRY_BACKOFF_MAX = float(os.getenv("DATADOG_RETRY_BACKOFF_MAX", "30"))  # Longest wait before giving up and returning the error
+DATADOG_BATCH_CONCURRENCY = int(os.getenv("DATADOG_BATCH_CONCURRENCY", "8"))  # Queries in flight at once for batch tools
+DATADOG_METRICS_CHUNK_SECONDS = int(os.getenv("DATADOG_METRICS_CHUNK_SECONDS", "86400"))  # Metric queries over longer ranges are split into chunks
+DATADOG_METRICS_MAX_CHUNKS = int(os.getenv("DATADOG_METRICS_MAX_CHUNKS", "8"))  # Upper bound on chunks per query (chunks grow to fit)
+DATADOG_COALESCE = os.getenv("DATADOG_COALESCE", "true").lower() in ("1", "true", "yes")  # Share identical in-flight GET/search requests
+
+# Register native asyncio tools (AsyncApiClient) instead of the blocking sync ones
+DATADOG_ASYNC_MODE = os.getenv("DATADOG_ASYNC_MODE", "false").lower() in ("1", "true", "yes")
+
+# Write the stats://tools snapshot to this file when the server exits (unset to disable)
+DATADOG_STATS_FILE = os.getenv("DATADOG_STATS_FILE")
+
+# Read-through cache for slow-changing read-only tools (see modules/cache.py)
+DATADOG_CACHE_MAX_BYTES = int(os.getenv("DATADOG_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # 0 disables the cache
+# Seconds each tool's results stay cached; override with e.g. DATADOG_CACHE_TTLS="list_dashboards=60,get_host_totals=0"
+DATADOG_CACHE_TTLS = {
+    "list_dashboards": 300,
+    "list_host_tags": 120,
+    "list_metrics": 600,
+    "list_monitor_config_policies": 300,
+    "get_host_totals": 60,
+}
+
+# Optional SQLite tier that survives restarts, e.g. DATADOG_DISK_CACHE_PATH=~/.cache/mcp-datadog/cache.sqlite3
+DATADOG_DISK_CACHE_PATH = os.getenv("DATADOG_DISK_CACHE_PATH")  # Unset disables the disk cache
+DATADOG_DISK_CACHE_MAX_BYTES = int(os.getenv("DATADOG_DISK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Seconds slow-changing results stay on disk (historical metric windows and closed usage days are kept until evicted);
+# override with DATADOG_DISK_CACHE_TTLS like DATADOG_CACHE_TTLS
+DATADOG_DISK_CACHE_TTLS = {
+    "list_dashboards": 3600,
+    "list_metrics": 6 * 3600,
+}
+DATADOG_SETTLE_SECONDS = int(os.getenv("DATADOG_SETTLE_SECONDS", "900"))  # Metric windows that ended this long ago are final
+
+# Incremental fetching of recent metric windows (see SegmentCache in modules/timeseries.py)
+DATADOG_SEGMENT_CACHE = os.getenv("DATADOG_SEGMENT_CACHE", "true").lower() in ("1", "true", "yes")
+DATADOG_SEGMENT_SETTLE_SECONDS = int(os.getenv("DATADOG_SEGMENT_SETTLE_SECONDS", "120"))  # Newer buckets are fetched again on every poll
+
+
+# Per-service APM metric queries (see modules/query_planner.py)
+DATADOG_APM_OPERATION = os.getenv("DATADOG_APM_OPERATION", "http.request")  # Span name behind the trace.* metrics
+DATADOG_APM_ENV = os.getenv("DATADOG_APM_ENV", "prod")  # Environment the service dependency map is read from
+DATADOG_SERVICE_GRAPH_REFRESH = int(os.getenv("DATADOG_SERVICE_GRAPH_REFRESH", "300"))  # Seconds before the cached dependency graph refreshes in the background
+DATADOG_SERVICE_GRAPH_LOOKBACK = int(os.getenv("DATADOG_SERVICE_GRAPH_LOOKBACK", str(24 * 3600)))  # Dependencies not observed for this long are dropped
+DATADOG_MAX_SERVICES_PER_QUERY = int(os.getenv("DATADOG_MAX_SERVICES_PER_QUERY", "25"))  # Services per grouped query
+
+# Span search pagination (see modules/spans.py)
+DATADOG_SPAN_MAX_BYTES = int(os.getenv("DATADOG_SPAN_MAX_BYTES", str(8 * 1024 * 1024)))  # Serialized spans a tool returns before stopping
+DATADOG_SPAN_SUMMARY_MAX_SPANS = int(os.getenv("DATADOG_SPAN_SUMMARY_MAX_SPANS", "100000"))  # Spans a summary reads before stopping
+
+# analyze_service_with_apm runs its sub-queries concurrently and returns what finished by this deadline
+DATADOG_ANALYSIS_DEADLINE = float(os.getenv("DATADOG_ANALYSIS_DEADLINE", "20"))  # Seconds
+
+# Local index of active metric names behind search_metrics (see modules/metric_index.py)
+DATADOG_METRIC_INDEX_REFRESH = int(os.getenv("DATADOG_METRIC_INDEX_REFRESH", "300"))  # Seconds before newly reported metrics are merged in
+DATADOG_METRIC_INDEX_LOOKBACK = int(os.getenv("DATADOG_METRIC_INDEX_LOOKBACK", str(24 * 3600)))  # Metrics not reported for this long are dropped
+
+def _override_ttls(ttls, value):
+    for item in filter(None, value.split(",")):
+        tool, _, ttl = item.partition("=")
+        ttls[tool.strip()] = int(ttl)
+
+
+_override_ttls(DATADOG_CACHE_TTLS, os.getenv("DATADOG_CACHE_TTLS", ""))
+_override_ttls(DATADOG_DISK_CACHE_TTLS, os.getenv("DATADOG_DISK_CACHE_TTLS", ""))
@@ -2,16 +2,39 @@ import logging
 import sys
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s', stream=sys.stderr) # Redirect logs to stderr
 
+import atexit
+import json
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
-from modules import mcp_tools  # Import tool functions
+from modules import load_tools, module_import_times  # Tool registry
+from modules.client import async_registry, api_import_times, single_flight, async_single_flight, scheduler
+from modules import coalesce
+from modules.stats import instrument, tool_stats
+from modules.cache import cached, response_cache, disk_cache
 
-from config import DATADOG_API_KEY, DATADOG_APP_KEY, DATADOG_SITE  # Import API keys
+from config import DATADOG_API_KEY, DATADOG_APP_KEY, DATADOG_SITE, DATADOG_ASYNC_MODE, DATADOG_STATS_FILE  # Import API keys
+
+
+@asynccontextmanager
+async def lifespan(server):
+    try:
+        yield {}
+    finally:
+        await async_registry.aclose()
 
 # Initialize MCP server
-mcp = FastMCP("Datadog Integration Service")
+mcp = FastMCP("Datadog Integration Service", lifespan=lifespan)
 
-for tool in mcp_tools:
-    mcp.tool()(tool)
+if DATADOG_ASYNC_MODE:
+    for tool in load_tools("_async"):
+        name = tool.__name__.removesuffix("_async")
+        mcp.tool(name=name)(instrument(cached(tool, name), name))
+else:
+    for tool in load_tools():
+        mcp.tool()(instrument(cached(tool)))
+
+if DATADOG_STATS_FILE:
+    atexit.register(tool_stats.dump, DATADOG_STATS_FILE)
 
 
 
@@ -21,6 +44,34 @@ def get_config() -> str:
     return "App configuration here"
 
 
+@mcp.resource("stats://tools")
+def get_tool_stats() -> str:
+    """Per-tool call counts, latency histograms (Datadog HTTP vs local time), payload sizes, error classes, cache hit ratios, coalesced upstream calls, rate-limit buckets, segment cache savings and cached service graphs"""
+    # Imported here so startup doesn't pay for them when their tools are not registered
+    from modules.metrics import segment_cache, metric_index
+    from modules.service_dependencies import service_graphs
+
+    return json.dumps({
+        **tool_stats.snapshot(),
+        "cache": response_cache.snapshot(),
+        "disk_cache": disk_cache.snapshot() if disk_cache is not None else None,
+        "coalescing": coalesce.snapshot(single_flight, async_single_flight),
+        "rate_limits": scheduler.snapshot(),
+        "segment_cache": segment_cache.snapshot(),
+        "metric_index": metric_index.snapshot(),
+        "service_graphs": {env: graph.snapshot() for env, graph in list(service_graphs.items())},
+    })
+
+
+@mcp.resource("stats://imports")
+def get_import_times() -> str:
+    """Milliseconds spent importing each tool module and each Datadog API module used so far"""
+    return json.dumps({
+        "tool_modules": {name: round(t * 1000, 2) for name, t in module_import_times.items()},
+        "datadog_api_modules": {name: round(t * 1000, 2) for name, t in api_import_times.items()},
+    })
+
+
 @mcp.prompt()
 def review_code(code: str) -> str:
     return f"Please review this code:\n\n{code}"
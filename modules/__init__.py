@@ -1,105 +1,83 @@
-# Import tools from all modules
-from .monitor import (
-    get_monitor_status,
-    create_monitor_config_policy,
-    update_monitor_config_policy,
-    delete_monitor_config_policy,
-    list_monitor_config_policies,
-    search_monitors,
-    create_monitor,
-    delete_monitor,
-    get_monitor,
-    update_monitor,
-)
-from .dashboard import list_dashboards, list_prompts
-from .downtime import create_downtime, update_downtime, cancel_downtime
-from .host import list_hosts, mute_host, unmute_host, get_host_totals
-from .incident import list_incidents, get_incident
-from .trace import list_traces
-from .metrics import query_metrics, list_metrics, query_p99_latency, query_error_rate, query_downstream_latency
-from .logs import archive_logs
-from .events import delete_event
-from .tags import list_host_tags, add_host_tags, delete_host_tags
-from .users import list_users, get_user
-from .roles import list_roles, get_role, create_role, delete_role, update_role
-from .service_checks import submit_service_check, list_service_checks
-from .usage import get_hourly_usage
-from .alerts import mute_alert, unmute_alert
-from .apm import query_apm_errors, query_apm_latency, query_apm_spans
-from .root_cause import analyze_service_with_apm
-# List of tools for registration
-mcp_tools = [
-    # Monitor tools
-    get_monitor_status,
-    create_monitor_config_policy,
-    update_monitor_config_policy,
-    delete_monitor_config_policy,
-    list_monitor_config_policies,
-    search_monitors,
-    create_monitor,
-    delete_monitor,
-    get_monitor,
-    update_monitor,
-    # Dashboard tools
-    list_dashboards,
-    list_prompts,
-    # Downtime tools
-    create_downtime,
-    update_downtime,
-    cancel_downtime,
-    # Host tools
-    list_hosts,
-    # mute_host,
-    # unmute_host,
-    get_host_totals,
-    # Incident tools
-    list_incidents,
-    get_incident,
-    # Trace tools
-    list_traces,
-    # Metrics tools
-    query_metrics,
-    list_metrics,
-    query_p99_latency,
-    query_error_rate,
-    query_downstream_latency,
-    # Logs tools
-    # archive_logs,
-    # Events tools
-    # delete_event,
-    # Tags tools
-    list_host_tags,
-    # add_host_tags,
-    # delete_host_tags,
-    # Users tools
-    # list_users,
-    # get_user,
-    # Roles tools
-    # list_roles,
-    # get_role,
-    # create_role,
-    # delete_role,
-    # update_role,
-    # Service Checks tools
-    submit_service_check,
-    list_service_checks,
-    # Usage tools
-    get_hourly_usage,
-    # Alerts tools
-    mute_alert,
-    unmute_alert,
-    # APM tools
-    query_apm_errors,
-    query_apm_latency,
-    query_apm_spans,
-    # # Root Cause Analysis tools
-    # analyze_service_with_apm,
-]
+# Tool registry. Importing this package imports no tool modules; load_tools()
+# imports all of them when the server registers its tools, since FastMCP needs
+# each tool's signature. What is deferred to a tool's first call is its Datadog
+# API module (see client.resolve_api), the bulk of datadog_api_client.
+import importlib
+import time
 
-mcp_tools.extend([
-    update_monitor_config_policy,
-    delete_monitor_config_policy,
-    list_monitor_config_policies,
-    search_monitors,
-    get_monitor,
-])
+# Module name -> tools registered from it, in registration order
+TOOL_MODULES = {
+    "monitor": [
+        "get_monitor_status",
+        "create_monitor_config_policy",
+        "update_monitor_config_policy",
+        "delete_monitor_config_policy",
+        "list_monitor_config_policies",
+        "search_monitors",
+        "create_monitor",
+        "delete_monitor",
+        "get_monitor",
+        "update_monitor",
+    ],
+    "dashboard": ["list_dashboards", "list_prompts"],
+    "downtime": ["create_downtime", "update_downtime", "cancel_downtime"],
+    "host": [
+        "list_hosts",
+        # "mute_host",
+        # "unmute_host",
+        "get_host_totals",
+    ],
+    "incident": ["list_incidents", "get_incident"],
+    "trace": ["list_traces", "summarize_traces", "get_trace_tree"],
+    "service_dependencies": ["get_downstream_services", "get_upstream_services", "get_blast_radius"],
+    "metrics": [
+        "query_metrics",
+        "list_metrics",
+        "query_p99_latency",
+        "query_error_rate",
+        "query_downstream_latency",
+        "query_metrics_batch",
+        "search_metrics",
+        "query_service_metrics",
+        "compare_to_baseline",
+    ],
+    # "logs": ["archive_logs"],
+    # "events": ["delete_event"],
+    "tags": [
+        "list_host_tags",
+        # "add_host_tags",
+        # "delete_host_tags",
+    ],
+    # "users": ["list_users", "get_user"],
+    # "roles": ["list_roles", "get_role", "create_role", "delete_role", "update_role"],
+    "service_checks": ["submit_service_check"],
+    "usage": ["get_hourly_usage"],
+    "alerts": ["mute_alert", "unmute_alert"],
+    "apm": ["list_apm_traces", "summarize_apm_traces", "query_apm_errors", "query_apm_latency", "query_apm_spans"],
+    # Root Cause Analysis tools
+    "root_cause": ["analyze_service_with_apm", "find_downstream_root_cause"],
+}
+
+# Seconds spent importing each tool module, filled in by load_tools()
+module_import_times = {}
+
+
+def load_tools(suffix=""):
+    """Import the registered tool modules and return their tool functions (`suffix="_async"` for the asyncio variants)."""
+    tools = []
+    for module_name, tool_names in TOOL_MODULES.items():
+        start = time.perf_counter()
+        module = importlib.import_module(f".{module_name}", __name__)
+        module_import_times.setdefault(module_name, time.perf_counter() - start)
+        tools.extend(getattr(module, name + suffix) for name in tool_names)
+    return tools
+
+
+def __getattr__(name):
+    # Keep `from modules import mcp_tools, mcp_async_tools` working without eager imports.
+    if name == "mcp_tools":
+        return load_tools()
+    if name == "mcp_async_tools":
+        # Native asyncio variants, registered under their sync names when DATADOG_ASYNC_MODE is on
+        return load_tools("_async")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
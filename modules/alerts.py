@@ -1,16 +1,12 @@
 from typing import Optional, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.monitors_api import MonitorsApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
 from datadog_api_client.exceptions import (
     ApiException
 )
 
-mcp = FastMCP("Datadog Alerts Service")
+MONITORS_API = "datadog_api_client.v1.api.monitors_api.MonitorsApi"
 
-@mcp.tool()
 def mute_alert(
     monitor_id: int = Field(..., description="The ID of the monitor to mute"),
     scope: Optional[str] = Field(default=None, description="The scope to mute"),
@@ -18,8 +14,7 @@ def mute_alert(
 ) -> Dict[str, Any]:
     """Mute an alert for a specific monitor."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITORS_API) as monitors_api:
             body = {"scope": scope, "end": end}
             response = monitors_api.mute_monitor(monitor_id, body=body)
             return {"status": "success", "message": "Alert muted successfully", "content": response.to_dict()}
@@ -28,17 +23,46 @@ def mute_alert(
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while muting alert: {e}"}
 
-@mcp.tool()
 def unmute_alert(
     monitor_id: int = Field(..., description="The ID of the monitor to unmute")
 ) -> Dict[str, Any]:
     """Unmute an alert for a specific monitor."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITORS_API) as monitors_api:
             response = monitors_api.unmute_monitor(monitor_id)
             return {"status": "success", "message": "Alert unmuted successfully", "content": response.to_dict()}
     except ApiException as e:
         return {"status": "error", "message": f"API error while unmuting alert: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while unmuting alert: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def mute_alert_async(
+    monitor_id: int = Field(..., description="The ID of the monitor to mute"),
+    scope: Optional[str] = Field(default=None, description="The scope to mute"),
+    end: Optional[int] = Field(default=None, description="The end time for the mute in epoch seconds")
+) -> Dict[str, Any]:
+    """Mute an alert for a specific monitor."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            body = {"scope": scope, "end": end}
+            response = await monitors_api.mute_monitor(monitor_id, body=body)
+            return {"status": "success", "message": "Alert muted successfully", "content": response.to_dict()}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while muting alert: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while muting alert: {e}"}
+
+async def unmute_alert_async(
+    monitor_id: int = Field(..., description="The ID of the monitor to unmute")
+) -> Dict[str, Any]:
+    """Unmute an alert for a specific monitor."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            response = await monitors_api.unmute_monitor(monitor_id)
+            return {"status": "success", "message": "Alert unmuted successfully", "content": response.to_dict()}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while unmuting alert: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while unmuting alert: {e}"}
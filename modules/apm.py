@@ -1,57 +1,87 @@
+import asyncio
 from typing import Optional, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v2.api.spans_api import SpansApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
+from .spans import SpanStream, SpanSummary, LATENCY_COMPUTES, aggregate_body, aggregate_rows, aggregate_spans
+from config import DATADOG_SPAN_MAX_BYTES, DATADOG_SPAN_SUMMARY_MAX_SPANS
 from datadog_api_client.exceptions import (
     ApiException
 )
 
-mcp = FastMCP("Datadog APM Service")
+SPANS_API = "datadog_api_client.v2.api.spans_api.SpansApi"
+COUNT = (("count", "count"),)
+
+
+def _error_bodies(service_name, from_time, to_time, limit):
+    """Span counts by status, and error counts for the resources with the most errors."""
+    query = f"service:{service_name}"
+    return (
+        aggregate_body(query, from_time, to_time, COUNT, group_by=["status"]),
+        aggregate_body(f"{query} status:error", from_time, to_time, COUNT, group_by=["resource_name"], limit=limit),
+    )
+
+
+def _error_result(service_name, by_status, by_resource):
+    counts = {row.get("status"): row["count"] or 0 for row in aggregate_rows(by_status, COUNT)}
+    total = sum(counts.values())
+    errors = counts.get("error", 0)
+    return {
+        "service": service_name,
+        "span_count": total,
+        "error_count": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "top_error_resources": [
+            {"resource": row.get("resource_name"), "errors": row["count"]} for row in aggregate_rows(by_resource, COUNT)
+        ],
+    }
+
+
+def _latency_bodies(service_name, from_time, to_time, limit):
+    """Duration stats for the whole service, and for its resources with the highest p99."""
+    query = f"service:{service_name}"
+    return (
+        aggregate_body(query, from_time, to_time, LATENCY_COMPUTES),
+        aggregate_body(query, from_time, to_time, LATENCY_COMPUTES, group_by=["resource_name"], limit=limit, sort="pc99"),
+    )
+
+
+def _latency_result(service_name, overall, by_resource):
+    rows = aggregate_rows(overall, LATENCY_COMPUTES)
+    return {
+        "service": service_name,
+        "duration_ms": rows[0] if rows else {},
+        "slowest_resources": [
+            {"resource": row.pop("resource_name", None), **row} for row in aggregate_rows(by_resource, LATENCY_COMPUTES)
+        ],
+    }
+
 
-@mcp.tool()
 def list_apm_traces(
     query: str = Field(..., description="The query to filter traces"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
     to_time: int = Field(..., description="End time in epoch seconds"),
-    limit: int = Field(default=100, description="Maximum number of traces to return"),
-    sort: str = Field(default="-timestamp", description="Sort order for traces (e.g., '-timestamp')")
+    limit: int = Field(default=100, ge=1, le=10000, description="Maximum number of spans to return, fetched across pages"),
+    sort: str = Field(default="-timestamp", description="Sort order for traces (e.g., '-timestamp')"),
+    max_bytes: Optional[int] = Field(default=None, ge=1, description="Stop once this many bytes of spans are collected (default: DATADOG_SPAN_MAX_BYTES)"),
+    cursor: Optional[str] = Field(default=None, description="Resume a truncated listing from its next_cursor")
 ) -> Dict[str, Any]:
     """List APM traces based on a query."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": query,
-                                "from": str(from_time),
-                                "to": str(to_time),
-                            },
-                            "sort": sort,
-                            "page": {"limit": limit},
-                        },
-                        "type": "search_request",
-                    }
-                }
-            )
-            return {"status": "success", "message": "APM traces retrieved successfully", "content": response.to_dict()}
+        with datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, query, from_time, to_time, sort=sort, max_spans=limit, max_bytes=max_bytes or DATADOG_SPAN_MAX_BYTES, cursor=cursor)
+            spans = list(stream)
+            return {"status": "success", "message": stream.describe("APM traces retrieved successfully"), "content": {"data": spans, "meta": stream.meta()}}
     except ApiException as e:
         return {"status": "error", "message": f"API error while retrieving APM traces: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while retrieving APM traces: {e}"}
 
-@mcp.tool()
 def get_apm_trace_details(
     trace_id: str = Field(..., description="The unique ID of the trace to retrieve")
 ) -> Dict[str, Any]:
     """Retrieve details of a specific APM trace by ID."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
+        with datadog_api(SPANS_API) as spans_api:
             response = spans_api.get_span(trace_id)
             return {"status": "success", "message": "APM trace details retrieved successfully", "content": response.to_dict()}
     except ApiException as e:
@@ -59,135 +89,173 @@ def get_apm_trace_details(
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while retrieving APM trace details: {e}"}
 
-@mcp.tool()
 def summarize_apm_traces(
     query: str = Field(..., description="The query to filter traces"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    max_spans: int = Field(default=DATADOG_SPAN_SUMMARY_MAX_SPANS, ge=1, description="Stop after reading this many spans")
 ) -> Dict[str, Any]:
-    """Summarize APM trace statistics."""
+    """Summarize APM spans over the whole window: counts, error rates and duration percentiles per service and resource."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": query,
-                                "from": str(from_time),
-                                "to": str(to_time),
-                            },
-                            "page": {"limit": 1000},
-                        },
-                        "type": "search_request",
-                    }
-                }
-            )
-            trace_count = len(response.data)
-            services = set(d.attributes.get("service", "unknown") for d in response.data)
+        with datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, query, from_time, to_time, max_spans=max_spans)
+            summary = SpanSummary()
+            for span in stream:
+                summary.add(span)
             return {
                 "status": "success",
-                "message": "Trace summary retrieved successfully",
-                "content": {
-                    "trace_count": trace_count,
-                    "services": list(services)
-                }
+                "message": stream.describe("Trace summary retrieved successfully"),
+                "content": {**summary.result(), "pagination": stream.meta()}
             }
     except Exception as e:
         return {"status": "error", "message": f"Error summarizing traces: {e}"}
 
-@mcp.tool()
 def query_apm_errors(
     service_name: str = Field(..., description="The name of the service to query errors for"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    limit: int = Field(default=10, ge=1, le=100, description="Number of resources to list")
 ) -> Dict[str, Any]:
-    """Query error metrics for a specific APM service."""
+    """Error count and rate for an APM service, and the resources with the most errors, aggregated by Datadog."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            query = f"avg:trace.{service_name}.errors{99}percent"
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": query,
-                                "from": str(from_time),
-                                "to": str(to_time),
-                            },
-                            "page": {"limit": 1000},
-                        },
-                        "type": "search_request",
-                    }
-                }
-            )
-            return {"status": "success", "message": "APM errors retrieved successfully", "content": response.to_dict()}
+        with datadog_api(SPANS_API) as spans_api:
+            responses = [aggregate_spans(spans_api, body) for body in _error_bodies(service_name, from_time, to_time, limit)]
+            return {"status": "success", "message": "APM errors retrieved successfully", "content": _error_result(service_name, *responses)}
     except ApiException as e:
         return {"status": "error", "message": f"API error while querying APM errors: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while querying APM errors: {e}"}
 
-@mcp.tool()
 def query_apm_latency(
     service_name: str = Field(..., description="The name of the service to query latency for"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    limit: int = Field(default=10, ge=1, le=100, description="Number of resources to list")
 ) -> Dict[str, Any]:
-    """Query latency metrics for a specific APM service."""
+    """Duration percentiles for an APM service and its slowest resources, aggregated by Datadog."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            query = f"avg:trace.servlet.request.hits{{service:{service_name}}}"
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": query,
-                                "from": str(from_time),
-                                "to": str(to_time),
-                            },
-                            "page": {"limit": 1000},
-                        },
-                        "type": "search_request",
-                    }
-                }
-            )
-            return {"status": "success", "message": "APM latency retrieved successfully", "content": response.to_dict()}
+        with datadog_api(SPANS_API) as spans_api:
+            responses = [aggregate_spans(spans_api, body) for body in _latency_bodies(service_name, from_time, to_time, limit)]
+            return {"status": "success", "message": "APM latency retrieved successfully", "content": _latency_result(service_name, *responses)}
     except ApiException as e:
         return {"status": "error", "message": f"API error while querying APM latency: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while querying APM latency: {e}"}
 
-@mcp.tool()
 def query_apm_spans(
     service_name: str = Field(..., description="The name of the service to query spans for"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    max_spans: int = Field(default=1000, ge=1, le=10000, description="Maximum number of spans to return, fetched across pages"),
+    max_bytes: Optional[int] = Field(default=None, ge=1, description="Stop once this many bytes of spans are collected (default: DATADOG_SPAN_MAX_BYTES)"),
+    cursor: Optional[str] = Field(default=None, description="Resume a truncated query from its next_cursor")
 ) -> Dict[str, Any]:
     """Query spans for a specific APM service."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
+        with datadog_api(SPANS_API) as spans_api:
             query = f"service:{service_name}"
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": query,
-                                "from": str(from_time),
-                                "to": str(to_time),
-                            },
-                            "page": {"limit": 1000},
-                        },
-                        "type": "search_request",
-                    }
-                }
+            stream = SpanStream(spans_api, query, from_time, to_time, max_spans=max_spans, max_bytes=max_bytes or DATADOG_SPAN_MAX_BYTES, cursor=cursor)
+            spans = list(stream)
+            return {"status": "success", "message": stream.describe("APM spans retrieved successfully"), "content": {"data": spans, "meta": stream.meta()}}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while querying APM spans: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while querying APM spans: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def list_apm_traces_async(
+    query: str = Field(..., description="The query to filter traces"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    limit: int = Field(default=100, ge=1, le=10000, description="Maximum number of spans to return, fetched across pages"),
+    sort: str = Field(default="-timestamp", description="Sort order for traces (e.g., '-timestamp')"),
+    max_bytes: Optional[int] = Field(default=None, ge=1, description="Stop once this many bytes of spans are collected (default: DATADOG_SPAN_MAX_BYTES)"),
+    cursor: Optional[str] = Field(default=None, description="Resume a truncated listing from its next_cursor")
+) -> Dict[str, Any]:
+    """List APM traces based on a query."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, query, from_time, to_time, sort=sort, max_spans=limit, max_bytes=max_bytes or DATADOG_SPAN_MAX_BYTES, cursor=cursor)
+            spans = [span async for span in stream]
+            return {"status": "success", "message": stream.describe("APM traces retrieved successfully"), "content": {"data": spans, "meta": stream.meta()}}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while retrieving APM traces: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while retrieving APM traces: {e}"}
+
+async def summarize_apm_traces_async(
+    query: str = Field(..., description="The query to filter traces"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    max_spans: int = Field(default=DATADOG_SPAN_SUMMARY_MAX_SPANS, ge=1, description="Stop after reading this many spans")
+) -> Dict[str, Any]:
+    """Summarize APM spans over the whole window: counts, error rates and duration percentiles per service and resource."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, query, from_time, to_time, max_spans=max_spans)
+            summary = SpanSummary()
+            async for span in stream:
+                summary.add(span)
+            return {
+                "status": "success",
+                "message": stream.describe("Trace summary retrieved successfully"),
+                "content": {**summary.result(), "pagination": stream.meta()}
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error summarizing traces: {e}"}
+
+async def query_apm_errors_async(
+    service_name: str = Field(..., description="The name of the service to query errors for"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    limit: int = Field(default=10, ge=1, le=100, description="Number of resources to list")
+) -> Dict[str, Any]:
+    """Error count and rate for an APM service, and the resources with the most errors, aggregated by Datadog."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            responses = await asyncio.gather(
+                *(aggregate_spans(spans_api, body) for body in _error_bodies(service_name, from_time, to_time, limit))
+            )
+            return {"status": "success", "message": "APM errors retrieved successfully", "content": _error_result(service_name, *responses)}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while querying APM errors: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while querying APM errors: {e}"}
+
+async def query_apm_latency_async(
+    service_name: str = Field(..., description="The name of the service to query latency for"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    limit: int = Field(default=10, ge=1, le=100, description="Number of resources to list")
+) -> Dict[str, Any]:
+    """Duration percentiles for an APM service and its slowest resources, aggregated by Datadog."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            responses = await asyncio.gather(
+                *(aggregate_spans(spans_api, body) for body in _latency_bodies(service_name, from_time, to_time, limit))
             )
-            return {"status": "success", "message": "APM spans retrieved successfully", "content": response.to_dict()}
+            return {"status": "success", "message": "APM latency retrieved successfully", "content": _latency_result(service_name, *responses)}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while querying APM latency: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while querying APM latency: {e}"}
+
+async def query_apm_spans_async(
+    service_name: str = Field(..., description="The name of the service to query spans for"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    max_spans: int = Field(default=1000, ge=1, le=10000, description="Maximum number of spans to return, fetched across pages"),
+    max_bytes: Optional[int] = Field(default=None, ge=1, description="Stop once this many bytes of spans are collected (default: DATADOG_SPAN_MAX_BYTES)"),
+    cursor: Optional[str] = Field(default=None, description="Resume a truncated query from its next_cursor")
+) -> Dict[str, Any]:
+    """Query spans for a specific APM service."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            query = f"service:{service_name}"
+            stream = SpanStream(spans_api, query, from_time, to_time, max_spans=max_spans, max_bytes=max_bytes or DATADOG_SPAN_MAX_BYTES, cursor=cursor)
+            spans = [span async for span in stream]
+            return {"status": "success", "message": stream.describe("APM spans retrieved successfully"), "content": {"data": spans, "meta": stream.meta()}}
     except ApiException as e:
         return {"status": "error", "message": f"API error while querying APM spans: {e}"}
     except Exception as e:
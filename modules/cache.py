@@ -0,0 +1,331 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from pydantic import Field
+from config import (
+    configuration,
+    DATADOG_API_KEY,
+    DATADOG_CACHE_MAX_BYTES,
+    DATADOG_CACHE_TTLS,
+    DATADOG_DISK_CACHE_PATH,
+    DATADOG_DISK_CACHE_MAX_BYTES,
+    DATADOG_DISK_CACHE_TTLS,
+    DATADOG_SETTLE_SECONDS,
+)
+from .stats import payload_size, is_error_result
+
+logger = logging.getLogger(__name__)
+
+# Tools whose result is final once their [from_time, to_time] window is DATADOG_SETTLE_SECONDS in the past
+WINDOWED_TOOLS = (
+    "query_metrics",
+    "query_p99_latency",
+    "query_error_rate",
+    "query_downstream_latency",
+    "query_service_metrics",
+    "compare_to_baseline",
+)
+# Datadog may still revise hourly usage for up to 72 hours
+USAGE_FINAL_AFTER = 72 * 3600
+
+BYPASS_PARAM = inspect.Parameter(
+    "bypass_cache",
+    inspect.Parameter.KEYWORD_ONLY,
+    default=Field(default=False, description="Skip the cache and fetch fresh data from Datadog"),
+    annotation=bool,
+)
+
+
+def cache_key(name, kwargs):
+    """Tool name plus its arguments, serialized independently of argument order."""
+    return name + ":" + json.dumps(kwargs, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ResponseCache:
+    """In-memory read-through cache of tool results with per-entry expiry and an LRU byte budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (expires_at, size, tool name, result)
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _count(self, name, event, n=1):
+        self._counters.setdefault(name, Counter())[event] += n
+
+    def get(self, name, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self._count(name, "expirations")
+                entry = None
+            if entry is None:
+                self._count(name, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(name, "hits")
+            return entry[3]
+
+    def note_bypass(self, name):
+        with self._lock:
+            self._count(name, "bypasses")
+
+    def put(self, name, key, result, ttl):
+        size = payload_size(result)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, size, name, result)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                evicted_key, (_, _, evicted_name, _) = next(iter(self._entries.items()))
+                self._drop(evicted_key)
+                self._count(evicted_name, "evictions")
+
+    def _drop(self, key):
+        self.bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def snapshot(self):
+        with self._lock:
+            tools = {}
+            for name, counter in sorted(self._counters.items()):
+                lookups = counter["hits"] + counter["misses"]
+                tools[name] = {
+                    "hits": counter["hits"],
+                    "misses": counter["misses"],
+                    "hit_ratio": round(counter["hits"] / lookups, 3) if lookups else 0.0,
+                    "evictions": counter["evictions"],
+                    "expirations": counter["expirations"],
+                    "bypasses": counter["bypasses"],
+                }
+            return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes, "tools": tools}
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class DiskCache:
+    """SQLite-backed cache tier shared by every server process using the same file.
+
+    Entries are namespaced by Datadog host and API key so switching org or site never
+    serves another account's data. The least recently used entries are evicted once the
+    stored values exceed `max_bytes`. SQLite errors are logged and treated as misses.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.namespace = hashlib.sha256(f"{configuration.host}|{DATADOG_API_KEY}".encode()).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self._counters = {}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=2, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        self._evict()
+
+    def _count(self, name, event):
+        self._counters.setdefault(name, Counter())[event] += 1
+
+    def get(self, name, key):
+        key = f"{self.namespace}:{key}"
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] is not None and row[1] <= now:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                logger.warning("Disk cache read failed: %s", e)
+                row = None
+            self._count(name, "misses" if row is None else "hits")
+        return None if row is None else json.loads(row[0])
+
+    def put(self, name, key, result, ttl):
+        try:
+            value = json.dumps(result, default=_json_default)
+        except (TypeError, ValueError):
+            return
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = None if math.isinf(ttl) else now + ttl
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, tool, value, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    (f"{self.namespace}:{key}", name, value, len(value), expires_at, now),
+                )
+                self._evict()
+            except sqlite3.Error as e:
+                logger.warning("Disk cache write failed: %s", e)
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute("SELECT key, tool, size FROM entries ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, tool, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(tool, "evictions")
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def snapshot(self):
+        with self._lock:
+            try:
+                entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            except sqlite3.Error:
+                entries, size = None, None
+            tools = {
+                name: {
+                    "hits": counter["hits"],
+                    "misses": counter["misses"],
+                    "hit_ratio": round(counter["hits"] / (counter["hits"] + counter["misses"]), 3)
+                    if counter["hits"] + counter["misses"] else 0.0,
+                    "evictions": counter["evictions"],
+                }
+                for name, counter in sorted(self._counters.items())
+            }
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes, "tools": tools}
+
+
+def _epoch(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    return float(value)
+
+
+def disk_ttl(name, kwargs, now=None):
+    """Seconds to keep this call's result on disk: math.inf once the data can no longer change, 0 to skip."""
+    now = time.time() if now is None else now
+    try:
+        if name in WINDOWED_TOOLS:
+            return math.inf if _epoch(kwargs["to_time"]) <= now - DATADOG_SETTLE_SECONDS else 0
+        if name == "get_hourly_usage":
+            # end_date is inclusive, so the data is final 72h after that day ends
+            return math.inf if _epoch(kwargs["end_date"]) + 86400 <= now - USAGE_FINAL_AFTER else 0
+    except (KeyError, TypeError, ValueError):
+        return 0
+    return DATADOG_DISK_CACHE_TTLS.get(name, 0)
+
+
+def _has_disk_policy(name):
+    return name in WINDOWED_TOOLS or name == "get_hourly_usage" or DATADOG_DISK_CACHE_TTLS.get(name, 0) > 0
+
+
+response_cache = ResponseCache(DATADOG_CACHE_MAX_BYTES)
+
+disk_cache = None
+if DATADOG_DISK_CACHE_PATH and DATADOG_DISK_CACHE_MAX_BYTES > 0:
+    try:
+        disk_cache = DiskCache(DATADOG_DISK_CACHE_PATH, DATADOG_DISK_CACHE_MAX_BYTES)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Disk cache disabled, could not open %s: %s", DATADOG_DISK_CACHE_PATH, e)
+
+
+def _lookup(name, key, memory_ttl, on_disk):
+    result = response_cache.get(name, key) if memory_ttl > 0 else None
+    if result is None and on_disk:
+        result = disk_cache.get(name, key)
+        if result is not None and memory_ttl > 0:
+            response_cache.put(name, key, result, memory_ttl)
+    return result
+
+
+def _store(name, key, kwargs, result, memory_ttl, on_disk):
+    if is_error_result(result):
+        return
+    if memory_ttl > 0:
+        response_cache.put(name, key, result, memory_ttl)
+    if on_disk:
+        ttl = disk_ttl(name, kwargs)
+        if ttl > 0:
+            disk_cache.put(name, key, result, ttl)
+
+
+def cached(tool, name=None, ttl=None):
+    """Serve `tool` from `response_cache` (and `disk_cache` when its results can be kept) and add
+    a `bypass_cache` argument to its schema.
+
+    Error results are never cached. Returns `tool` unchanged when neither tier applies to it.
+    """
+    name = name or tool.__name__
+    ttl = DATADOG_CACHE_TTLS.get(name, 0) if ttl is None else ttl
+    memory_ttl = ttl if response_cache.max_bytes > 0 else 0
+    on_disk = disk_cache is not None and _has_disk_policy(name)
+    if memory_ttl <= 0 and not on_disk:
+        return tool
+
+    signature = inspect.signature(tool)
+    signature = signature.replace(parameters=[*signature.parameters.values(), BYPASS_PARAM])
+
+    if inspect.iscoroutinefunction(tool):
+        @functools.wraps(tool)
+        async def async_wrapper(**kwargs):
+            bypass = kwargs.pop("bypass_cache", False) is True
+            key = cache_key(name, kwargs)
+            if bypass:
+                response_cache.note_bypass(name)
+            else:
+                result = _lookup(name, key, memory_ttl, on_disk)
+                if result is not None:
+                    return result
+            result = await tool(**kwargs)
+            _store(name, key, kwargs, result, memory_ttl, on_disk)
+            return result
+
+        async_wrapper.__signature__ = signature
+        return async_wrapper
+
+    @functools.wraps(tool)
+    def wrapper(**kwargs):
+        bypass = kwargs.pop("bypass_cache", False) is True
+        key = cache_key(name, kwargs)
+        if bypass:
+            response_cache.note_bypass(name)
+        else:
+            result = _lookup(name, key, memory_ttl, on_disk)
+            if result is not None:
+                return result
+        result = tool(**kwargs)
+        _store(name, key, kwargs, result, memory_ttl, on_disk)
+        return result
+
+    wrapper.__signature__ = signature
+    return wrapper
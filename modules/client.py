@@ -0,0 +1,321 @@
+import asyncio
+import atexit
+import functools
+import importlib
+import logging
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from datadog_api_client import ApiClient, AsyncApiClient, rest
+from datadog_api_client.exceptions import ApiException
+from config import (
+    configuration,
+    DATADOG_POOL_SIZE,
+    DATADOG_POOL_IDLE_TIMEOUT,
+    DATADOG_COALESCE,
+    DATADOG_MAX_CONCURRENCY,
+    DATADOG_MAX_RETRIES,
+    DATADOG_RETRY_BACKOFF,
+    DATADOG_RETRY_BACKOFF_MAX,
+)
+from .coalesce import SingleFlight, AsyncSingleFlight, request_key
+from .ratelimit import RateLimitScheduler
+from .stats import payload_size, record_http
+
+logger = logging.getLogger(__name__)
+
+# Identical in-flight upstream requests share one HTTP call (see modules/coalesce.py)
+single_flight = SingleFlight()
+async_single_flight = AsyncSingleFlight()
+
+# Paces requests per Datadog rate-limit bucket and retries throttled/failed ones (see modules/ratelimit.py)
+scheduler = RateLimitScheduler(
+    initial_concurrency=DATADOG_POOL_SIZE,
+    max_concurrency=DATADOG_MAX_CONCURRENCY,
+    max_retries=DATADOG_MAX_RETRIES,
+    backoff=DATADOG_RETRY_BACKOFF,
+    max_backoff=DATADOG_RETRY_BACKOFF_MAX,
+)
+
+# Seconds spent importing each datadog_api_client API module, filled in on first use
+api_import_times = {}
+_api_classes = {}
+
+
+def resolve_api(api):
+    """Return the API class for a "package.module.ClassName" path, importing it on first use."""
+    if not isinstance(api, str):
+        return api
+    api_cls = _api_classes.get(api)
+    if api_cls is None:
+        module_path, _, class_name = api.rpartition(".")
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+        api_import_times.setdefault(module_path, time.perf_counter() - start)
+        api_cls = _api_classes[api] = getattr(module, class_name)
+    return api_cls
+
+
+def call_raw(endpoint, **kwargs):
+    """Call a generated API endpoint (e.g. `spans_api._list_spans_endpoint`) and return the parsed JSON.
+
+    Same request, auth, coalescing and rate limiting as the generated method, but the response is
+    left as plain dicts and lists instead of being deserialized into models, which is far cheaper for
+    large responses. Returns a coroutine for endpoints of an async client.
+    """
+    params = endpoint.gather_params(kwargs)
+    return endpoint.api_client.call_api(
+        endpoint.settings["endpoint_path"],
+        endpoint.settings["http_method"],
+        params["path"],
+        params["query"],
+        params["header"],
+        body=params["body"],
+        post_params=params["form"],
+        files=params["file"],
+        response_type=(dict, list),
+        check_type=False,
+        return_http_data_only=True,
+        request_timeout=endpoint.api_client.configuration.request_timeout,
+        host=endpoint._validate_and_get_host(kwargs),
+        collection_formats=params["collection_format"],
+    )
+
+
+def _error_bytes(e):
+    # ApiException keeps the decoded body (parsed JSON or text), not the raw bytes; no body means no response
+    return payload_size(e.body) if e.body is not None else 0
+
+
+class DatadogRESTClient(rest.RESTClientObject):
+    """urllib3 REST client that goes through the rate-limit scheduler, retries 429/5xx and
+    reports each round trip's time and size to the tool stats."""
+
+    def request(self, method, url, *args, **kwargs):
+        attempt = 0
+        while True:
+            bucket = scheduler.acquire(method, url)
+            start = time.perf_counter()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except ApiException as e:
+                record_http(time.perf_counter() - start, _error_bytes(e), e)
+                bucket = scheduler.release(bucket, method, url, e.status, e.headers)
+                delay = scheduler.retry_delay(bucket, method, url, attempt, e.status, e.headers)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                scheduler.release(bucket, method, url, 0, None)
+                raise
+            record_http(time.perf_counter() - start, len(response.data or b"") if kwargs.get("preload_content", True) else 0)
+            scheduler.release(bucket, method, url, response.status, response.headers)
+            return response
+
+
+class DatadogAsyncRESTClient(rest.AsyncRESTClientObject):
+    """aiosonic counterpart of DatadogRESTClient."""
+
+    async def request(self, method, url, *args, **kwargs):
+        attempt = 0
+        while True:
+            bucket = await scheduler.acquire_async(method, url)
+            start = time.perf_counter()
+            try:
+                response = await super().request(method, url, *args, **kwargs)
+                # Read the body here (aiosonic caches it) so HTTP time covers the whole download
+                data = await response.content() if kwargs.get("preload_content", True) else b""
+            except ApiException as e:
+                record_http(time.perf_counter() - start, _error_bytes(e), e)
+                bucket = scheduler.release(bucket, method, url, e.status, e.headers)
+                delay = scheduler.retry_delay(bucket, method, url, attempt, e.status, e.headers)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                scheduler.release(bucket, method, url, 0, None)
+                raise
+            record_http(time.perf_counter() - start, len(data))
+            scheduler.release(bucket, method, url, response.status_code, response.headers)
+            return response
+
+
+class PooledApiClient(ApiClient):
+    """ApiClient whose urllib3 pool is sized from config and kept open between tool calls."""
+
+    def __init__(self, configuration, pool_size):
+        self.pool_size = pool_size
+        super().__init__(configuration)
+
+    def _build_rest_client(self):
+        return DatadogRESTClient(self.configuration, maxsize=self.pool_size)
+
+    def _call_api(self, method, url, query_params=None, header_params=None, body=None, post_params=None,
+                  response_type=None, return_http_data_only=None, preload_content=True, request_timeout=None,
+                  check_type=None):
+        call = functools.partial(
+            super()._call_api, method, url, query_params, header_params, body, post_params,
+            response_type, return_http_data_only, preload_content, request_timeout, check_type,
+        )
+        if not DATADOG_COALESCE:
+            return call()
+        key = request_key(method, url, query_params, body, response_type, return_http_data_only, preload_content)
+        return single_flight.do(key, call)
+
+
+class PooledAsyncApiClient(AsyncApiClient):
+    """AsyncApiClient (aiosonic) with the same pool size as the sync clients."""
+
+    def __init__(self, configuration, pool_size):
+        self.pool_size = pool_size
+        super().__init__(configuration)
+
+    def _build_rest_client(self):
+        import aiosonic
+
+        rest_client = DatadogAsyncRESTClient(self.configuration)
+        # The generated client does not expose the aiosonic connector, so swap in a sized one.
+        rest_client._client.connector = aiosonic.TCPConnector(pool_size=self.pool_size)
+        return rest_client
+
+    async def _call_api(self, method, url, query_params=None, header_params=None, body=None, post_params=None,
+                        response_type=None, return_http_data_only=None, preload_content=True, request_timeout=None,
+                        check_type=None):
+        call = functools.partial(
+            super()._call_api, method, url, query_params, header_params, body, post_params,
+            response_type, return_http_data_only, preload_content, request_timeout, check_type,
+        )
+        if not DATADOG_COALESCE:
+            return await call()
+        key = request_key(method, url, query_params, body, response_type, return_http_data_only, preload_content)
+        return await async_single_flight.do(key, call)
+
+
+class _PoolEntry:
+    def __init__(self, api_client, api):
+        self.api_client = api_client
+        self.api = api
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+class ClientRegistry:
+    """Keeps one long-lived, keep-alive ApiClient per Datadog API class.
+
+    Entries that have not been used for `idle_timeout` seconds are closed the next
+    time any client is acquired, so an idle server does not hold sockets open forever.
+    """
+
+    def __init__(self, configuration, pool_size=10, idle_timeout=300):
+        self.configuration = configuration
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_client(self):
+        return PooledApiClient(self.configuration, self.pool_size)
+
+    def _close_client(self, api_client):
+        api_client.close()
+
+    def acquire(self, api_cls):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Datadog client registry has been shut down")
+            self._evict_idle_locked(time.monotonic())
+            entry = self._entries.get(api_cls)
+            if entry is None:
+                api_client = self._new_client()
+                entry = _PoolEntry(api_client, resolve_api(api_cls)(api_client))
+                self._entries[api_cls] = entry
+            entry.in_use += 1
+            return entry.api
+
+    def release(self, api_cls):
+        with self._lock:
+            entry = self._entries.get(api_cls)
+            if entry is not None:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    @contextmanager
+    def api(self, api_cls):
+        """Yield a pooled instance of `api_cls` (a class or its dotted import path), e.g. `with datadog_api(METRICS_API) as metrics_api:`."""
+        api = self.acquire(api_cls)
+        try:
+            yield api
+        finally:
+            self.release(api_cls)
+
+    def evict_idle(self):
+        with self._lock:
+            return self._evict_idle_locked(time.monotonic())
+
+    def _evict_idle_locked(self, now):
+        if not self.idle_timeout:
+            return 0
+        expired = [
+            api_cls for api_cls, entry in self._entries.items()
+            if entry.in_use == 0 and now - entry.last_used > self.idle_timeout
+        ]
+        for api_cls in expired:
+            self._close_client(self._entries.pop(api_cls).api_client)
+            logger.debug("Closed idle Datadog client for %s", api_cls)
+        return len(expired)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            entries, self._entries = self._entries, {}
+        for entry in entries.values():
+            try:
+                self._close_client(entry.api_client)
+            except Exception as e:
+                logger.warning("Error closing Datadog client: %s", e)
+
+
+class AsyncClientRegistry(ClientRegistry):
+    """Registry of AsyncApiClient instances for the asyncio tool path (DATADOG_ASYNC_MODE)."""
+
+    def _new_client(self):
+        return PooledAsyncApiClient(self.configuration, self.pool_size)
+
+    def _close_client(self, api_client):
+        # Idle eviction happens inside acquire(), which is synchronous, so the
+        # aiosonic shutdown is scheduled on the running loop instead of awaited.
+        try:
+            asyncio.get_running_loop().create_task(api_client.rest_client._client.shutdown())
+        except RuntimeError:
+            pass
+
+    @asynccontextmanager
+    async def api(self, api_cls):
+        """Yield a pooled async instance of `api_cls`, e.g. `async with async_datadog_api(METRICS_API) as metrics_api:`."""
+        api = self.acquire(api_cls)
+        try:
+            yield api
+        finally:
+            self.release(api_cls)
+
+    async def aclose(self):
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for entry in entries.values():
+            try:
+                await entry.api_client.rest_client._client.shutdown()
+            except Exception as e:
+                logger.warning("Error closing async Datadog client: %s", e)
+
+
+registry = ClientRegistry(configuration, pool_size=DATADOG_POOL_SIZE, idle_timeout=DATADOG_POOL_IDLE_TIMEOUT)
+datadog_api = registry.api
+atexit.register(registry.close)
+
+async_registry = AsyncClientRegistry(configuration, pool_size=DATADOG_POOL_SIZE, idle_timeout=DATADOG_POOL_IDLE_TIMEOUT)
+async_datadog_api = async_registry.api
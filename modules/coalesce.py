@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+# POST endpoints that only read data, so identical calls can share a result and be retried
+READ_ONLY_POST_PATHS = (
+    "/api/v2/spans/events/search",
+    "/api/v2/spans/analytics/aggregate",
+)
+
+
+def is_read_only(method, url):
+    return method == "GET" or (method == "POST" and urlsplit(url).path in READ_ONLY_POST_PATHS)
+
+
+def request_key(method, url, query_params, body, response_type, return_http_data_only, preload_content):
+    """Key identifying an upstream request whose result can be shared, or None if it must not be coalesced."""
+    if not preload_content or not is_read_only(method, url):
+        return None
+    return (
+        method,
+        url,
+        json.dumps(query_params or [], default=str),
+        json.dumps(body, sort_keys=True, default=str) if body is not None else None,
+        repr(response_type),
+        bool(return_http_data_only),
+    )
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one upstream call per key at a time; threads asking for the same key wait and share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.counters = Counter()
+
+    def do(self, key, fn):
+        if key is None:
+            return fn()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.counters["upstream"] += 1
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class AsyncSingleFlight:
+    """asyncio flavour of SingleFlight. The upstream call runs in its own task, so a
+    cancelled caller does not cancel the request for the others waiting on it."""
+
+    def __init__(self):
+        self._flights = {}
+        self.counters = Counter()
+
+    async def do(self, key, coro_fn):
+        if key is None:
+            return await coro_fn()
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        task = self._flights.get(flight_key)
+        if task is None:
+            task = self._flights[flight_key] = loop.create_task(coro_fn())
+            task.add_done_callback(lambda _: self._flights.pop(flight_key, None))
+            self.counters["upstream"] += 1
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+
+def snapshot(*flights):
+    counters = Counter()
+    for flight in flights:
+        counters.update(flight.counters)
+    upstream = counters["upstream"]
+    return {
+        "upstream_calls": upstream,
+        "coalesced_calls": counters["coalesced"],
+        "coalesced_ratio": round(counters["coalesced"] / (upstream + counters["coalesced"]), 3) if upstream else 0.0,
+    }
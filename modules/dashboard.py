@@ -3,12 +3,9 @@ import json
 import time
 import logging
 import sys
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.dashboards_api import DashboardsApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
 
-mcp = FastMCP("Datadog Dashboards Service")
+DASHBOARDS_API = "datadog_api_client.v1.api.dashboards_api.DashboardsApi"
 
 class DashboardResponse(BaseModel):
     id: str
@@ -34,56 +31,16 @@ dashboard_list_schema = {
     }
 }
 
-@mcp.tool()
 def list_dashboards(
     name: str = Field(default=None, description="Filter dashboards by name"),
     tags: list[str] = Field(default=None, description="Filter dashboards by tags")
 ) -> dict:
     """Retrieves a list of Datadog dashboards with optional filtering by name and tags."""
     try:
-        with ApiClient(configuration) as api_client:
-            dashboards_api = DashboardsApi(api_client)
+        with datadog_api(DASHBOARDS_API) as dashboards_api:
             response = dashboards_api.list_dashboards(filter_shared=False)
 
-            if response is not None and response.dashboards is not None:
-                # Apply filters if provided
-                filtered_dashboards = response.dashboards
-                if name:
-                    search_term = name.lower()
-                    filtered_dashboards = [
-                        d for d in filtered_dashboards if d.title and search_term in d.title.lower()
-                    ]
-                if tags:
-                    filtered_dashboards = [
-                        d for d in filtered_dashboards if set(tags).issubset(set(d.tags or []))
-                    ]
-
-                dashboards_data = [
-                    DashboardResponse(
-                        id=d.id,
-                        title=d.title,
-                        url=f"https://app.datadoghq.com/dashboard/{d.id}"
-                    ).dict()
-                    for d in filtered_dashboards
-                ]
-
-                result = {
-                    "content": {
-                        "dashboards": dashboards_data,
-                        "total": len(dashboards_data),
-                        "message": "Successfully retrieved dashboards."
-                    }
-                }
-                return result
-            else:
-                result = {
-                    "content": {
-                        "dashboards": [],
-                        "total": 0,
-                        "message": "Error: Invalid response from Datadog API."
-                    }
-                }
-                return result
+            return _dashboards_result(response, name, tags)
     except Exception as e:
         return {
             "content": {
@@ -95,7 +52,47 @@ def list_dashboards(
     finally:
         pass
 
-@mcp.tool()
+def _dashboards_result(response, name, tags) -> dict:
+    if response is not None and response.dashboards is not None:
+        # Apply filters if provided
+        filtered_dashboards = response.dashboards
+        if name:
+            search_term = name.lower()
+            filtered_dashboards = [
+                d for d in filtered_dashboards if d.title and search_term in d.title.lower()
+            ]
+        if tags:
+            filtered_dashboards = [
+                d for d in filtered_dashboards if set(tags).issubset(set(d.tags or []))
+            ]
+
+        dashboards_data = [
+            DashboardResponse(
+                id=d.id,
+                title=d.title,
+                url=f"https://app.datadoghq.com/dashboard/{d.id}"
+            ).dict()
+            for d in filtered_dashboards
+        ]
+
+        result = {
+            "content": {
+                "dashboards": dashboards_data,
+                "total": len(dashboards_data),
+                "message": "Successfully retrieved dashboards."
+            }
+        }
+        return result
+    else:
+        result = {
+            "content": {
+                "dashboards": [],
+                "total": 0,
+                "message": "Error: Invalid response from Datadog API."
+            }
+        }
+        return result
+
 def list_prompts() -> dict:
     """Placeholder function for prompts/list to avoid method not found errors."""
     try:
@@ -117,3 +114,28 @@ def list_prompts() -> dict:
         }
     finally:
         pass
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def list_dashboards_async(
+    name: str = Field(default=None, description="Filter dashboards by name"),
+    tags: list[str] = Field(default=None, description="Filter dashboards by tags")
+) -> dict:
+    """Retrieves a list of Datadog dashboards with optional filtering by name and tags."""
+    try:
+        async with async_datadog_api(DASHBOARDS_API) as dashboards_api:
+            response = await dashboards_api.list_dashboards(filter_shared=False)
+
+            return _dashboards_result(response, name, tags)
+    except Exception as e:
+        return {
+            "content": {
+                "dashboards": [],
+                "total": 0,
+                "message": f"Error fetching dashboards: {e}"
+            }
+        }
+
+async def list_prompts_async() -> dict:
+    """Placeholder function for prompts/list to avoid method not found errors."""
+    return list_prompts()
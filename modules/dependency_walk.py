@@ -0,0 +1,151 @@
+from .query_planner import SERVICE_QUERIES, canonical_service, plan_service_queries, split_by_tag
+from .timeseries import compare_response
+
+# Metrics a downstream service is checked on
+WALK_METRICS = ("p99_latency", "error_rate")
+
+
+def level_queries(services, operation, max_services, from_time, to_time, baseline_windows, period):
+    """Grouped queries checking `services` against earlier windows, as [(metric, group, query, start, end, offset)].
+
+    The target window has offset 0; every query runs once per window, so a level of up to
+    `max_services` services costs len(WALK_METRICS) * (baseline_windows + 1) requests.
+    """
+    queries = []
+    for metric in WALK_METRICS:
+        for query, group in plan_service_queries(metric, services, operation, max_services):
+            for k in range(baseline_windows + 1):
+                queries.append((metric, group, query, from_time - k * period, to_time - k * period, k * period))
+    return queries
+
+
+def _metric_health(target, baselines, threshold):
+    comparison = compare_response(target, baselines, threshold)
+    series = comparison["series"][0] if comparison["series"] else {}
+    return {
+        "verdict": comparison["verdict"],
+        "mean_z": series.get("mean_z"),
+        "pct_delta": series.get("pct_delta"),
+        "target_mean": series.get("target_mean"),
+        "baseline_mean": series.get("baseline_mean"),
+    }
+
+
+def level_health(queries, responses, threshold):
+    """{service: {metric: health}} for one level; failed queries leave the metric out."""
+    windows = {}
+    for (metric, group, query, _, _, offset), response in zip(queries, responses):
+        windows.setdefault((metric, query), (group, {}))[1][offset] = response
+    health = {}
+    for (metric, query), (group, by_offset) in windows.items():
+        target = by_offset.get(0)
+        if target is None or isinstance(target, Exception):
+            continue
+        tag = SERVICE_QUERIES[metric][1]
+        split_target = split_by_tag(target, tag, group)
+        split_baselines = [
+            (split_by_tag(response, tag, group), offset)
+            for offset, response in by_offset.items()
+            if offset and not isinstance(response, Exception)
+        ]
+        for service in group:
+            baselines = [(split[service], offset) for split, offset in split_baselines]
+            health.setdefault(service, {})[metric] = _metric_health(split_target[service], baselines, threshold)
+    return health
+
+
+def deviation(service_health):
+    """The largest positive mean z-score across metrics: only increases in latency or errors count."""
+    return max([0.0] + [h["mean_z"] for h in service_health.values() if h.get("mean_z") is not None])
+
+
+def is_anomalous(service_health, threshold):
+    return any(h["verdict"] == "anomalous" and (h.get("mean_z") or 0) > 0 for h in service_health.values()) or (
+        deviation(service_health) > threshold
+    )
+
+
+class DependencyWalk:
+    """Breadth-first walk down a service dependency graph, one level of services at a time.
+
+    `next_level()` returns the services to check next; feed their health back with `record()`.
+    Healthy services are pruned: their downstream services are only visited if reached through an
+    anomalous path. The start service is always expanded.
+    """
+
+    def __init__(self, graph, service, max_depth, threshold, max_level_services=None):
+        self.graph = {canonical_service(s): [canonical_service(c) for c in calls] for s, calls in graph.items()}
+        self.service = canonical_service(service)
+        self.max_depth = max_depth
+        self.threshold = threshold
+        self.max_level_services = max_level_services
+        self.depth = 0
+        self.frontier = [self.service]
+        self.paths = {self.service: [self.service]}
+        self.health = {}
+        self.levels = []
+        self.pruned = 0  # healthy services whose downstream was not walked
+        self.skipped = 0  # services left out of a level by max_level_services
+
+    def next_level(self):
+        return self.frontier
+
+    def record(self, health, elapsed_ms):
+        """Store the health of the current level and build the next frontier from its anomalous services."""
+        level = self.frontier
+        for service in level:
+            self.health[service] = health.get(service, {})
+        anomalous = [service for service in level if is_anomalous(self.health[service], self.threshold)]
+        expand = anomalous if self.depth else level
+        self.pruned += sum(1 for service in level if service not in expand and self.graph.get(service))
+        self.levels.append({
+            "depth": self.depth,
+            "services": len(level),
+            "anomalous": anomalous,
+            "elapsed_ms": round(elapsed_ms, 1),
+        })
+        frontier = []
+        for service in expand:
+            for callee in self.graph.get(service, []):
+                if callee not in self.paths:
+                    self.paths[callee] = self.paths[service] + [callee]
+                    frontier.append(callee)
+        if self.max_level_services and len(frontier) > self.max_level_services:
+            self.skipped += len(frontier) - self.max_level_services
+            frontier = frontier[:self.max_level_services]
+        self.depth += 1
+        self.frontier = frontier if self.depth <= self.max_depth else []
+
+    def suspects(self, top=10):
+        """Anomalous services, most likely origins first.
+
+        A service with no anomalous downstream service of its own is where a problem starts rather
+        than where it propagates, so those rank first, then by deviation.
+        """
+        anomalous = {s for s, h in self.health.items() if is_anomalous(h, self.threshold)}
+        ranked = []
+        for service in anomalous:
+            downstream = [c for c in self.graph.get(service, []) if c in anomalous]
+            ranked.append({
+                "service": service,
+                "depth": len(self.paths[service]) - 1,
+                "path": self.paths[service],
+                "deviation": round(deviation(self.health[service]), 2),
+                "origin": not downstream,
+                "anomalous_downstream": downstream,
+                **self.health[service],
+            })
+        ranked.sort(key=lambda s: (not s["origin"], -s["deviation"]))
+        return ranked[:top]
+
+    def result(self, top=10):
+        return {
+            "service": self.service,
+            "max_depth": self.max_depth,
+            "threshold": self.threshold,
+            "suspects": self.suspects(top),
+            "levels": self.levels,
+            "services_checked": len(self.health),
+            "pruned_services": self.pruned,
+            "skipped_services": self.skipped,
+        }
@@ -2,13 +2,10 @@ from pydantic import BaseModel, Field
 import json
 import logging
 import sys
-from datadog_api_client import ApiClient
-from datadog_api_client.v2.api.incidents_api import IncidentsApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
 from typing import Optional
 
-mcp = FastMCP("Datadog Incident Service")
+INCIDENTS_API = "datadog_api_client.v2.api.incidents_api.IncidentsApi"
 
 class ListIncidentsParams(BaseModel):
     page_size: int = Field(10, ge=1, le=100)
@@ -17,12 +14,10 @@ class ListIncidentsParams(BaseModel):
 class GetIncidentParams(BaseModel):
     incident_id: str
 
-@mcp.tool()
 def list_incidents(params: ListIncidentsParams = ListIncidentsParams()) -> dict:
     """Retrieves a list of incidents from Datadog."""
     try:
-        with ApiClient(configuration) as api_client:
-            incidents_api = IncidentsApi(api_client)
+        with datadog_api(INCIDENTS_API) as incidents_api:
             response = incidents_api.list_incidents(
                 page_size=params.page_size, page_offset=params.page_offset
             )
@@ -30,7 +25,7 @@ def list_incidents(params: ListIncidentsParams = ListIncidentsParams()) -> dict:
             if not response.data:
                 return {"status": "error", "message": "No incidents data returned", "content": []}
 
-            incidents_data = [json.dumps(d, indent=2) for d in response.data]
+            incidents_data = response.to_dict()["data"]
             return {
                 "status": "success",
                 "message": "Incidents retrieved successfully",
@@ -41,12 +36,10 @@ def list_incidents(params: ListIncidentsParams = ListIncidentsParams()) -> dict:
     finally:
         pass
 
-@mcp.tool()
 def get_incident(params: GetIncidentParams) -> dict:
     """Retrieves a specific incident from Datadog."""
     try:
-        with ApiClient(configuration) as api_client:
-            incidents_api = IncidentsApi(api_client)
+        with datadog_api(INCIDENTS_API) as incidents_api:
             response = incidents_api.get_incident(params.incident_id)
 
             if not response.data:
@@ -55,19 +48,17 @@ def get_incident(params: GetIncidentParams) -> dict:
             return {
                 "status": "success",
                 "message": "Incident retrieved successfully",
-                "content": [{"type": "text", "text": json.dumps(response.data, indent=2)}]
+                "content": [{"type": "text", "text": json.dumps(response.to_dict()["data"], indent=2, default=str)}]
             }
     except Exception as e:
         return {"status": "error", "message": f"Error fetching incident: {e}", "content": []}
     finally:
         pass
 
-@mcp.tool()
 def update_incident(incident_id: str, title: Optional[str] = None, status: Optional[str] = None) -> dict:
     """Update an existing incident."""
     try:
-        with ApiClient(configuration) as api_client:
-            incidents_api = IncidentsApi(api_client)
+        with datadog_api(INCIDENTS_API) as incidents_api:
             body = {"data": {"attributes": {}}}
             if title:
                 body["data"]["attributes"]["title"] = title
@@ -79,13 +70,50 @@ def update_incident(incident_id: str, title: Optional[str] = None, status: Optio
     except Exception as e:
         return {"status": "error", "message": f"Error updating incident: {e}", "content": []}
 
-@mcp.tool()
 def delete_incident(incident_id: str) -> dict:
     """Delete an incident."""
     try:
-        with ApiClient(configuration) as api_client:
-            incidents_api = IncidentsApi(api_client)
+        with datadog_api(INCIDENTS_API) as incidents_api:
             incidents_api.delete_incident(incident_id)
             return {"status": "success", "message": "Incident deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting incident: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def list_incidents_async(params: ListIncidentsParams = ListIncidentsParams()) -> dict:
+    """Retrieves a list of incidents from Datadog."""
+    try:
+        async with async_datadog_api(INCIDENTS_API) as incidents_api:
+            response = await incidents_api.list_incidents(
+                page_size=params.page_size, page_offset=params.page_offset
+            )
+
+            if not response.data:
+                return {"status": "error", "message": "No incidents data returned", "content": []}
+
+            incidents_data = response.to_dict()["data"]
+            return {
+                "status": "success",
+                "message": "Incidents retrieved successfully",
+                "content": incidents_data
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching incidents: {e}", "content": []}
+
+async def get_incident_async(params: GetIncidentParams) -> dict:
+    """Retrieves a specific incident from Datadog."""
+    try:
+        async with async_datadog_api(INCIDENTS_API) as incidents_api:
+            response = await incidents_api.get_incident(params.incident_id)
+
+            if not response.data:
+                return {"status": "error", "message": "No incident data returned", "content": []}
+
+            return {
+                "status": "success",
+                "message": "Incident retrieved successfully",
+                "content": [{"type": "text", "text": json.dumps(response.to_dict()["data"], indent=2, default=str)}]
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching incident: {e}", "content": []}
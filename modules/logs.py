@@ -1,13 +1,9 @@
 from typing import Optional, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.logs_api import LogsApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api
 
-mcp = FastMCP("Datadog Logs Service")
+LOGS_API = "datadog_api_client.v1.api.logs_api.LogsApi"
 
-@mcp.tool()
 def archive_logs(
     query: str = Field(..., description="The query to filter logs for archiving"),
     start: str = Field(..., description="Start time in ISO8601 format"),
@@ -15,8 +11,7 @@ def archive_logs(
 ) -> Dict[str, Any]:
     """Archive logs based on a query."""
     try:
-        with ApiClient(configuration) as api_client:
-            logs_api = LogsApi(api_client)
+        with datadog_api(LOGS_API) as logs_api:
             body = {"query": query, "from": start, "to": end}
             response = logs_api.archive_logs(body=body)
             return {"status": "success", "message": "Logs archived successfully", "content": response.to_dict()}
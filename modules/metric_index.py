@@ -0,0 +1,245 @@
+import asyncio
+import bisect
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+_TOKEN_SPLIT = re.compile(r"[._\-\s:/]+")
+# Query tokens at least this long also match names with a token one edit away
+FUZZY_MIN_LENGTH = 4
+
+# Match classes, best first
+EXACT, PREFIX, TOKENS, FUZZY = range(4)
+MATCH_NAMES = ("exact", "prefix", "tokens", "fuzzy")
+# Ranked result lists kept for paging and repeated queries
+RESULT_CACHE_SIZE = 128
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_SPLIT.split(text.lower()) if token]
+
+
+def _deletes(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _fuzzy_indexed(token):
+    # Numbers (shard ids, ports, versions) are never mistyped on purpose and would bloat the index
+    return len(token) >= FUZZY_MIN_LENGTH - 1 and not token.isdigit()
+
+
+def _intersect(sets):
+    # Smallest first, so every step is bounded by the most selective token
+    sets = sorted(sets, key=len)
+    return sets[0].intersection(*sets[1:])
+
+
+class MetricIndex:
+    """Searchable index of active metric names.
+
+    Names are kept sorted, so a name prefix resolves with two binary searches (the same
+    lookup a trie gives, without a node per character). Every name is also indexed by its
+    dot/underscore separated tokens for token-prefix matches, and by each token's one-character
+    deletions so a query token with one typo still finds it.
+
+    Names reported by `list_active_metrics` since the last refresh are merged in, and names not
+    seen for `lookback` seconds are dropped, so refreshes after the first only touch what changed.
+    """
+
+    def __init__(self, refresh_seconds=300, lookback=86400):
+        self.refresh_seconds = refresh_seconds
+        self.lookback = lookback
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_seen = {}  # name -> epoch seconds it was last reported active
+        self._names = []  # sorted
+        self._postings = defaultdict(set)  # token -> names containing it
+        self._vocabulary = []  # sorted tokens
+        self._deletions = defaultdict(set)  # token with one character removed -> tokens
+        self._by_length = []  # names sorted by (length, name), the order within a match class
+        self._order = {}  # name -> position in _by_length
+        self._results = OrderedDict()  # (query, fuzzy) -> (ranked names, end of each match class)
+        self.refreshed_at = 0.0
+        self.refreshes = 0
+
+    def is_stale(self, now=None):
+        now = time.time() if now is None else now
+        return now - self.refreshed_at >= self.refresh_seconds
+
+    def refresh_window(self, now=None):
+        """`from` timestamp for the next `list_active_metrics` call: the full lookback the first time, then since the last refresh."""
+        now = time.time() if now is None else now
+        if not self.refreshed_at:
+            return int(now - self.lookback)
+        return int(max(self.refreshed_at, now - self.lookback)) - 60
+
+    def refresh(self, fetch):
+        """Refresh from `fetch(from_ts) -> names` if the index is stale. While one caller refreshes,
+        the others keep searching the current index (or wait for it, if it has never been built)."""
+        if not self.is_stale() or not self._refresh_lock.acquire(blocking=not self.refreshed_at):
+            return
+        try:
+            if self.is_stale():
+                now = time.time()
+                self.update(fetch(self.refresh_window(now)), now)
+        finally:
+            self._refresh_lock.release()
+
+    async def refresh_async(self, fetch):
+        """refresh() for a coroutine `fetch`."""
+        if not self.is_stale():
+            return
+        while not self._refresh_lock.acquire(blocking=False):
+            if self.refreshed_at:
+                return
+            await asyncio.sleep(0.01)
+        try:
+            if self.is_stale():
+                now = time.time()
+                self.update(await fetch(self.refresh_window(now)), now)
+        finally:
+            self._refresh_lock.release()
+
+    def update(self, names, now=None):
+        """Merge names reported active into the index and drop those not seen within the lookback."""
+        now = time.time() if now is None else now
+        with self._lock:
+            added = [name for name in set(names) if name not in self._last_seen]
+            for name in names:
+                self._last_seen[name] = now
+            expired = [name for name, seen in self._last_seen.items() if seen < now - self.lookback]
+            for name in expired:
+                del self._last_seen[name]
+            if added or expired:
+                self._reindex(added, expired)
+            self.refreshed_at = now
+            self.refreshes += 1
+        return len(added), len(expired)
+
+    def _reindex(self, added, expired):
+        touched = set()
+        for name in expired:
+            for token in tokenize(name):
+                self._postings[token].discard(name)
+                touched.add(token)
+        for name in added:
+            for token in tokenize(name):
+                self._postings[token].add(name)
+                touched.add(token)
+        gone = {token for token in touched if not self._postings[token]}
+        new = {token for token in touched if self._postings[token]} - set(self._vocabulary)
+        for token in gone:
+            del self._postings[token]
+            for deletion in _deletes(token) if _fuzzy_indexed(token) else ():
+                self._deletions[deletion].discard(token)
+                if not self._deletions[deletion]:
+                    del self._deletions[deletion]
+        for token in new:
+            for deletion in _deletes(token) if _fuzzy_indexed(token) else ():
+                self._deletions[deletion].add(token)
+        self._by_length = sorted(self._last_seen, key=lambda name: (len(name), name))
+        self._order = {name: i for i, name in enumerate(self._by_length)}
+        self._results.clear()
+        if len(added) + len(expired) > len(self._names) // 10:
+            self._names = sorted(self._last_seen)
+            self._vocabulary = sorted(self._postings)
+            return
+        expired = set(expired)
+        self._names = [name for name in self._names if name not in expired] if expired else self._names
+        for name in added:
+            bisect.insort(self._names, name)
+        self._vocabulary = [token for token in self._vocabulary if token not in gone] if gone else self._vocabulary
+        for token in new:
+            bisect.insort(self._vocabulary, token)
+
+    def _prefix_range(self, values, prefix):
+        start = bisect.bisect_left(values, prefix)
+        return start, bisect.bisect_left(values, prefix + "\uffff", start)
+
+    def _token_candidates(self, token, fuzzy):
+        """Vocabulary tokens starting with `token`, plus (when `fuzzy`) tokens one edit away from it."""
+        start, end = self._prefix_range(self._vocabulary, token)
+        matches = set(self._vocabulary[start:end])
+        typos = set()
+        if fuzzy and len(token) >= FUZZY_MIN_LENGTH:
+            deletes = _deletes(token)
+            # A substituted character leaves a shared one-deletion key, a missing one leaves the
+            # token itself as a key, and an extra one leaves a real token among our deletions
+            for key in deletes | {token}:
+                typos |= self._deletions.get(key, set())
+            typos |= {key for key in deletes if key in self._postings}
+            typos -= matches
+        return matches, typos
+
+    def _names_matching(self, tokens):
+        """Names containing any of `tokens`. Treat the result as read-only: it may be a posting set."""
+        if len(tokens) == 1:
+            return self._postings[next(iter(tokens))]
+        names = set()
+        for token in tokens:
+            names |= self._postings[token]
+        return names
+
+    def _shortest_first(self, names):
+        # Sorting positions is much cheaper than sorting names with a key function
+        return [self._by_length[i] for i in sorted(map(self._order.__getitem__, names))]
+
+    def _rank(self, query, fuzzy):
+        """Matching names best first, and where each match class ends in that list."""
+        start, end = self._prefix_range(self._names, query)
+        prefixed = self._names[start:end]
+        # The exact name is the shortest name with itself as prefix, so it sorts first
+        ranked = self._shortest_first(prefixed)
+        ends = [1 if ranked and ranked[0] == query else 0, len(ranked)]
+
+        tokens = tokenize(query)
+        if tokens:
+            seen = set(prefixed)
+            exact_sets, loose_sets = [], []
+            for token in tokens:
+                matches, typos = self._token_candidates(token, fuzzy)
+                exact = self._names_matching(matches)
+                exact_sets.append(exact)
+                loose_sets.append(exact | self._names_matching(typos) if typos else exact)
+            word_matches = _intersect(exact_sets) - seen
+            ranked += self._shortest_first(word_matches)
+            ends.append(len(ranked))
+            if fuzzy:
+                ranked += self._shortest_first(_intersect(loose_sets) - seen - word_matches)
+        ends += [len(ranked)] * (4 - len(ends))
+        return ranked, ends
+
+    def search(self, query, limit=50, offset=0, fuzzy=True):
+        """Names matching `query`, best first, and the total number of matches.
+
+        Exact names rank first, then names starting with the query, then names where every query
+        token prefixes one of the name's tokens, then names matched only with a typo. Shorter names
+        rank first within a class. Ranked results are kept per query until the index changes, so
+        paging through them is a slice.
+        """
+        query = query.strip()
+        with self._lock:
+            key = (query, fuzzy)
+            result = self._results.get(key)
+            if result is None:
+                result = self._results[key] = self._rank(query, fuzzy)
+                while len(self._results) > RESULT_CACHE_SIZE:
+                    self._results.popitem(last=False)
+            else:
+                self._results.move_to_end(key)
+        ranked, ends = result
+        page = [
+            {"metric": ranked[i], "match": MATCH_NAMES[bisect.bisect_right(ends, i)]}
+            for i in range(offset, min(offset + limit, len(ranked)))
+        ]
+        return page, len(ranked)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "metrics": len(self._names),
+                "tokens": len(self._vocabulary),
+                "refreshes": self.refreshes,
+                "age_seconds": round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            }
@@ -1,44 +1,230 @@
-from typing import Optional, Dict, Any, List
-from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.metrics_api import MetricsApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Union
+from pydantic import BaseModel, Field
+from .client import datadog_api, async_datadog_api
 from datadog_api_client.exceptions import (
     ApiException
 )
+from config import (
+    DATADOG_APM_OPERATION,
+    DATADOG_BATCH_CONCURRENCY,
+    DATADOG_METRIC_INDEX_LOOKBACK,
+    DATADOG_METRIC_INDEX_REFRESH,
+    DATADOG_METRICS_CHUNK_SECONDS,
+    DATADOG_METRICS_MAX_CHUNKS,
+    DATADOG_MAX_SERVICES_PER_QUERY,
+    DATADOG_SEGMENT_CACHE,
+    DATADOG_SEGMENT_SETTLE_SECONDS,
+    DATADOG_SETTLE_SECONDS,
+)
+from .metric_index import MetricIndex
+from .query_planner import SERVICE_QUERIES, plan_service_queries, split_by_tag
+from .timeseries import plan_chunks, stitch, summarize_response, compact_response, compare_response, rollup_interval, segment_query, SegmentCache
+
+METRICS_API = "datadog_api_client.v1.api.metrics_api.MetricsApi"
+MAX_BATCH_QUERIES = 100
+
+# Points already downloaded for recent windows, so repeated polls only fetch the new tail
+segment_cache = SegmentCache(settle_seconds=DATADOG_SEGMENT_SETTLE_SECONDS)
+# Active metric names, built on the first search_metrics call
+metric_index = MetricIndex(refresh_seconds=DATADOG_METRIC_INDEX_REFRESH, lookback=DATADOG_METRIC_INDEX_LOOKBACK)
+
+class MetricQuery(BaseModel):
+    query: str = Field(..., description="The query to execute")
+    from_time: Optional[int] = Field(default=None, description="Start time in epoch seconds (defaults to the batch from_time)")
+    to_time: Optional[int] = Field(default=None, description="End time in epoch seconds (defaults to the batch to_time)")
+
+def _fetch_chunks(metrics_api, query, from_time, to_time):
+    chunks = plan_chunks(query, from_time, to_time, DATADOG_METRICS_CHUNK_SECONDS, DATADOG_METRICS_MAX_CHUNKS)
+    if len(chunks) == 1:
+        return metrics_api.query_metrics(from_time, to_time, query).to_dict()
+    with ThreadPoolExecutor(max_workers=min(DATADOG_BATCH_CONCURRENCY, len(chunks))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, metrics_api.query_metrics, start, end, query)
+            for start, end in chunks
+        ]
+        return stitch([future.result().to_dict() for future in futures], from_time, to_time)
+
+async def _fetch_chunks_async(metrics_api, query, from_time, to_time):
+    chunks = plan_chunks(query, from_time, to_time, DATADOG_METRICS_CHUNK_SECONDS, DATADOG_METRICS_MAX_CHUNKS)
+    if len(chunks) == 1:
+        return (await metrics_api.query_metrics(from_time, to_time, query)).to_dict()
+    semaphore = asyncio.Semaphore(DATADOG_BATCH_CONCURRENCY)
+
+    async def fetch(start, end):
+        async with semaphore:
+            return (await metrics_api.query_metrics(start, end, query)).to_dict()
+
+    return stitch(await asyncio.gather(*(fetch(start, end) for start, end in chunks)), from_time, to_time)
+
+def _chunk_seconds(query, from_time, to_time):
+    start, end = plan_chunks(query, from_time, to_time, DATADOG_METRICS_CHUNK_SECONDS, DATADOG_METRICS_MAX_CHUNKS)[0]
+    return end - start
+
+def _segment(query, from_time, to_time, now):
+    """(rolled-up query, interval) when this window should go through the segment cache, else None."""
+    if not DATADOG_SEGMENT_CACHE or to_time < now - DATADOG_SETTLE_SECONDS:
+        return None
+    seconds = _chunk_seconds(query, from_time, to_time)
+    key = segment_query(query, rollup_interval(query, seconds))
+    return None if key is None else (key, rollup_interval(key, seconds))
+
+def comparable_query(query, from_time, to_time):
+    """`query` with the explicit rollup the segment cache would give it for this window's length.
+
+    Windows compared with each other must be fetched with this: a recent window goes through the
+    segment cache and an older one doesn't, and without a shared rollup they could come back with
+    different buckets. Queries the segment cache can't handle are returned unchanged.
+    """
+    return segment_query(query, rollup_interval(query, _chunk_seconds(query, from_time, to_time))) or query
+
+def _fetch_metrics(metrics_api, query, from_time, to_time):
+    """query_metrics as a dict. Long ranges are fetched as rollup-aligned chunks in parallel and stitched;
+    recent windows only download what the segment cache doesn't already hold."""
+    now = int(time.time())
+    segment = _segment(query, from_time, to_time, now)
+    if segment is None:
+        return _fetch_chunks(metrics_api, query, from_time, to_time)
+    key, interval = segment
+    window = segment_cache.window(key, interval, from_time, to_time)
+    response = _fetch_chunks(metrics_api, key, *window) if window else None
+    return segment_cache.merge(key, interval, response, window, from_time, to_time, now)
+
+async def _fetch_metrics_async(metrics_api, query, from_time, to_time):
+    now = int(time.time())
+    segment = _segment(query, from_time, to_time, now)
+    if segment is None:
+        return await _fetch_chunks_async(metrics_api, query, from_time, to_time)
+    key, interval = segment
+    window = segment_cache.window(key, interval, from_time, to_time)
+    response = await _fetch_chunks_async(metrics_api, key, *window) if window else None
+    return segment_cache.merge(key, interval, response, window, from_time, to_time, now)
+
+def _service_metric(metrics_api, kind, service_name, from_time, to_time):
+    """One service's series for a SERVICE_QUERIES metric, using the same canonical query as query_service_metrics."""
+    (query, group), = plan_service_queries(kind, [service_name], DATADOG_APM_OPERATION, 1)
+    return split_by_tag(_fetch_metrics(metrics_api, query, from_time, to_time), SERVICE_QUERIES[kind][1], group)[group[0]]
 
-mcp = FastMCP("Datadog Metrics Service")
+async def _service_metric_async(metrics_api, kind, service_name, from_time, to_time):
+    (query, group), = plan_service_queries(kind, [service_name], DATADOG_APM_OPERATION, 1)
+    response = await _fetch_metrics_async(metrics_api, query, from_time, to_time)
+    return split_by_tag(response, SERVICE_QUERIES[kind][1], group)[group[0]]
+
+def _shape(response, summary, downsample, compact, precision):
+    if summary:
+        return summarize_response(response, downsample)
+    if compact:
+        return compact_response(response, precision)
+    return response
+
+def _batch_plan(queries, from_time, to_time):
+    """Resolve each batch entry to (key, query, from_time, to_time); keys are the query unless it repeats with another range."""
+    plan = []
+    for entry in queries:
+        if isinstance(entry, str):
+            entry = MetricQuery(query=entry)
+        elif isinstance(entry, dict):
+            entry = MetricQuery(**entry)
+        start = entry.from_time if entry.from_time is not None else from_time
+        end = entry.to_time if entry.to_time is not None else to_time
+        plan.append((entry.query, start, end))
+    counts = {}
+    for query, _, _ in plan:
+        counts[query] = counts.get(query, 0) + 1
+    return [
+        (query if counts[query] == 1 else f"{query} [{start}-{end}]", query, start, end)
+        for query, start, end in plan
+    ]
+
+def _batch_result(results):
+    failed = sum(1 for r in results.values() if r["status"] == "error")
+    status = "success" if not failed else "partial" if failed < len(results) else "error"
+    return {
+        "status": status,
+        "message": f"{len(results) - failed} of {len(results)} metric queries succeeded",
+        "content": results,
+    }
+
+def _service_result(plan, responses, tag, summary, downsample, compact, precision):
+    """Per-service results for the grouped queries in `plan`; `responses` holds each query's response or exception."""
+    results = {}
+    for (query, group), response in zip(plan, responses):
+        if isinstance(response, Exception):
+            results.update({service: {"status": "error", "message": f"Error querying metrics: {response}"} for service in group})
+            continue
+        for service, split in split_by_tag(response, tag, group).items():
+            results[service] = {"status": "success", "content": _shape(split, summary, downsample, compact, precision)}
+    result = _batch_result(results)
+    succeeded = sum(1 for r in results.values() if r["status"] == "success")
+    result["message"] = f"{succeeded} of {len(results)} services queried successfully in {len(plan)} grouped queries"
+    return result
+
+def _query_one(query, from_time, to_time, summary, downsample, compact, precision):
+    if from_time is None or to_time is None:
+        return {"status": "error", "message": "from_time and to_time are required (per query or for the whole batch)"}
+    try:
+        with datadog_api(METRICS_API) as metrics_api:
+            response = _fetch_metrics(metrics_api, query, from_time, to_time)
+            return {"status": "success", "content": _shape(response, summary, downsample, compact, precision)}
+    except Exception as e:
+        return {"status": "error", "message": f"Error querying metrics: {e}"}
 
-@mcp.tool()
 def query_metrics(
     query: str = Field(..., description="The query to execute"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
 ) -> Dict[str, Any]:
     """Query metrics from Datadog."""
     try:
-        with ApiClient(configuration) as api_client:
-            metrics_api = MetricsApi(api_client)
-            response = metrics_api.query_metrics(from_time, to_time, query)
-            return {"status": "success", "message": "Metrics queried successfully", "content": response.to_dict()}
+        with datadog_api(METRICS_API) as metrics_api:
+            response = _fetch_metrics(metrics_api, query, from_time, to_time)
+            return {"status": "success", "message": "Metrics queried successfully", "content": _shape(response, summary, downsample, compact, precision)}
     except Exception as e:
         return {"status": "error", "message": f"Error querying metrics: {e}"}
 
-@mcp.tool()
 def list_metrics(
     q: Optional[str] = Field(default=None, description="Query to filter metrics")
 ) -> Dict[str, Any]:
     """List available metrics."""
     try:
-        with ApiClient(configuration) as api_client:
-            metrics_api = MetricsApi(api_client)
+        with datadog_api(METRICS_API) as metrics_api:
             response = metrics_api.list_metrics(q=q)
             return {"status": "success", "message": "Metrics listed successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error listing metrics: {e}"}
 
-@mcp.tool()
+def _search_result(query, limit, offset, fuzzy):
+    results, total = metric_index.search(query, limit=limit, offset=offset, fuzzy=fuzzy)
+    next_offset = offset + len(results) if offset + len(results) < total else None
+    return {
+        "status": "success",
+        "message": f"Found {total} metrics matching '{query}'",
+        "content": {"total": total, "offset": offset, "next_offset": next_offset, "results": results},
+    }
+
+def search_metrics(
+    query: str = Field(..., description="Metric name prefix or words to match, e.g. 'system.cpu' or 'checkout latency' (tolerates one typo per word)"),
+    limit: int = Field(default=50, ge=1, le=1000, description="Maximum number of metric names to return"),
+    offset: int = Field(default=0, ge=0, description="Number of ranked results to skip, from a previous response's next_offset"),
+    fuzzy: bool = Field(default=True, description="Also match words one typo away")
+) -> Dict[str, Any]:
+    """Search active metric names, best matches first (exact, prefix, word matches, then typos)."""
+    try:
+        with datadog_api(METRICS_API) as metrics_api:
+            metric_index.refresh(lambda from_ts: metrics_api.list_active_metrics(from_ts).to_dict().get("metrics") or [])
+        return _search_result(query, limit, offset, fuzzy)
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while searching metrics: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while searching metrics: {e}"}
+
 def update_metric_metadata(
     metric_name: str = Field(..., description="The name of the metric"),
     type: Optional[str] = Field(default=None, description="The type of the metric (e.g., 'gauge', 'count')"),
@@ -47,8 +233,7 @@ def update_metric_metadata(
 ) -> Dict[str, Any]:
     """Update metadata for a metric."""
     try:
-        with ApiClient(configuration) as api_client:
-            metrics_api = MetricsApi(api_client)
+        with datadog_api(METRICS_API) as metrics_api:
             body = {}
             if type:
                 body["type"] = type
@@ -61,69 +246,365 @@ def update_metric_metadata(
     except Exception as e:
         return {"status": "error", "message": f"Error updating metric metadata: {e}"}
 
-@mcp.tool()
 def delete_metric_metadata(
     metric_name: str = Field(..., description="The name of the metric to delete metadata for")
 ) -> Dict[str, Any]:
     """Delete metadata for a metric."""
     try:
-        with ApiClient(configuration) as api_client:
-            metrics_api = MetricsApi(api_client)
+        with datadog_api(METRICS_API) as metrics_api:
             metrics_api.delete_metric_metadata(metric_name)
             return {"status": "success", "message": "Metric metadata deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting metric metadata: {e}"}
 
-@mcp.tool()
 def query_p99_latency(
     service_name: str = Field(..., description="The name of the service to query"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
 ) -> Dict[str, Any]:
     """Query P99 latency for a specific service."""
     try:
-        with ApiClient(configuration) as api_client:
-            metrics_api = MetricsApi(api_client)
-            query = f"avg:trace.{service_name}.duration{99}percent"
-            response = metrics_api.query_metrics(from_time, to_time, query)
-            return {"status": "success", "message": "P99 latency retrieved successfully", "content": response.to_dict()}
+        with datadog_api(METRICS_API) as metrics_api:
+            response = _service_metric(metrics_api, "p99_latency", service_name, from_time, to_time)
+            return {"status": "success", "message": "P99 latency retrieved successfully", "content": _shape(response, summary, downsample, compact, precision)}
     except ApiException as e:
         return {"status": "error", "message": f"API error while querying P99 latency: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while querying P99 latency: {e}"}
 
-@mcp.tool()
 def query_error_rate(
     service_name: str = Field(..., description="The name of the service to query"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
 ) -> Dict[str, Any]:
     """Query error rate for a specific service."""
     try:
-        with ApiClient(configuration) as api_client:
-            metrics_api = MetricsApi(api_client)
-            query = f"avg:trace.{service_name}.errors{99}percent"
-            response = metrics_api.query_metrics(from_time, to_time, query)
-            return {"status": "success", "message": "Error rate retrieved successfully", "content": response.to_dict()}
+        with datadog_api(METRICS_API) as metrics_api:
+            response = _service_metric(metrics_api, "error_rate", service_name, from_time, to_time)
+            return {"status": "success", "message": "Error rate retrieved successfully", "content": _shape(response, summary, downsample, compact, precision)}
     except ApiException as e:
         return {"status": "error", "message": f"API error while querying error rate: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while querying error rate: {e}"}
 
-@mcp.tool()
 def query_downstream_latency(
     service_name: str = Field(..., description="The name of the downstream service to query"),
     from_time: int = Field(..., description="Start time in epoch seconds"),
-    to_time: int = Field(..., description="End time in epoch seconds")
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Query latency for a downstream service."""
+    try:
+        with datadog_api(METRICS_API) as metrics_api:
+            response = _service_metric(metrics_api, "downstream_latency", service_name, from_time, to_time)
+            return {"status": "success", "message": "Downstream latency retrieved successfully", "content": _shape(response, summary, downsample, compact, precision)}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while querying downstream latency: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while querying downstream latency: {e}"}
+
+def query_metrics_batch(
+    queries: List[Union[str, MetricQuery]] = Field(..., description="Metric queries to run, as query strings or {query, from_time, to_time} objects"),
+    from_time: Optional[int] = Field(default=None, description="Start time in epoch seconds for queries without their own"),
+    to_time: Optional[int] = Field(default=None, description="End time in epoch seconds for queries without their own"),
+    summary: bool = Field(default=False, description="Return per-series statistics instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Run several metric queries concurrently; results are keyed by query, each with its own status."""
+    try:
+        if len(queries) > MAX_BATCH_QUERIES:
+            return {"status": "error", "message": f"At most {MAX_BATCH_QUERIES} queries per batch, got {len(queries)}"}
+        plan = _batch_plan(queries, from_time, to_time)
+        if not plan:
+            return {"status": "error", "message": "No queries given"}
+        with ThreadPoolExecutor(max_workers=min(DATADOG_BATCH_CONCURRENCY, len(plan))) as executor:
+            # Run each query in a copy of this context so its HTTP time is attributed to this tool call
+            futures = [
+                (key, executor.submit(contextvars.copy_context().run, _query_one, query, start, end, summary, downsample, compact, precision))
+                for key, query, start, end in plan
+            ]
+            return _batch_result({key: future.result() for key, future in futures})
+    except Exception as e:
+        return {"status": "error", "message": f"Error running metric query batch: {e}"}
+
+def fetch_group(query, from_time, to_time):
+    """One metrics query as a response dict, or the exception it raised, so a batch of them can run in a pool."""
+    try:
+        with datadog_api(METRICS_API) as metrics_api:
+            return _fetch_metrics(metrics_api, query, from_time, to_time)
+    except Exception as e:
+        return e
+
+def query_service_metrics(
+    services: List[str] = Field(..., description="Services to compare"),
+    metric: str = Field(default="p99_latency", description="One of 'p99_latency', 'error_rate' (errors / hits) or 'downstream_latency' (p99 latency callers see)"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Query one APM metric for many services with as few grouped (`by {service}`) queries as possible; results are keyed by service."""
+    try:
+        if metric not in SERVICE_QUERIES:
+            return {"status": "error", "message": f"Unknown metric '{metric}', expected one of {sorted(SERVICE_QUERIES)}"}
+        plan = plan_service_queries(metric, services, DATADOG_APM_OPERATION, DATADOG_MAX_SERVICES_PER_QUERY)
+        if not plan:
+            return {"status": "error", "message": "No services given"}
+        with ThreadPoolExecutor(max_workers=min(DATADOG_BATCH_CONCURRENCY, len(plan))) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, fetch_group, query, from_time, to_time)
+                for query, _ in plan
+            ]
+            responses = [future.result() for future in futures]
+        return _service_result(plan, responses, SERVICE_QUERIES[metric][1], summary, downsample, compact, precision)
+    except Exception as e:
+        return {"status": "error", "message": f"Error querying service metrics: {e}"}
+
+def _baseline_plan(query, service_name, metric, from_time, to_time, baseline_windows, period):
+    """The query to compare and its [(from_time, to_time, offset)] windows, target window first."""
+    if not query:
+        if not service_name:
+            raise ValueError("Give either query or service_name")
+        if metric not in SERVICE_QUERIES:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {sorted(SERVICE_QUERIES)}")
+        (query, _), = plan_service_queries(metric, [service_name], DATADOG_APM_OPERATION, 1)
+    query = comparable_query(query, from_time, to_time)
+    return query, [(from_time - k * period, to_time - k * period, k * period) for k in range(baseline_windows + 1)]
+
+def _baseline_result(query, windows, responses, threshold):
+    if isinstance(responses[0], Exception):
+        return {"status": "error", "message": f"Error querying metrics: {responses[0]}"}
+    baselines = [(response, offset) for (_, _, offset), response in zip(windows[1:], responses[1:]) if not isinstance(response, Exception)]
+    comparison = compare_response(responses[0], baselines, threshold)
+    comparison["baseline_windows"] = len(baselines)
+    return {
+        "status": "success",
+        "message": f"Window is {comparison['verdict']} compared with {len(baselines)} baseline windows",
+        "content": comparison,
+    }
+
+def compare_to_baseline(
+    from_time: int = Field(..., description="Start of the window to check, in epoch seconds"),
+    to_time: int = Field(..., description="End of the window to check, in epoch seconds"),
+    query: Optional[str] = Field(default=None, description="Metric query to check; alternatively give service_name and metric"),
+    service_name: Optional[str] = Field(default=None, description="Service to check with one of the canonical APM metrics"),
+    metric: str = Field(default="p99_latency", description="With service_name: 'p99_latency', 'error_rate' or 'downstream_latency'"),
+    baseline_windows: int = Field(default=4, ge=1, le=28, description="Number of earlier equivalent windows to compare against"),
+    period: int = Field(default=86400, ge=60, description="Seconds between equivalent windows (86400 = same time on previous days, 604800 = previous weeks)"),
+    threshold: float = Field(default=3.0, gt=0, description="|z-score| above which a point counts as anomalous")
+) -> Dict[str, Any]:
+    """Check whether a window is abnormal: compares it with earlier equivalent windows (z-scores, % deltas, anomalous intervals)."""
+    try:
+        query, windows = _baseline_plan(query, service_name, metric, from_time, to_time, baseline_windows, period)
+        with ThreadPoolExecutor(max_workers=min(DATADOG_BATCH_CONCURRENCY, len(windows))) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, fetch_group, query, start, end)
+                for start, end, _ in windows
+            ]
+            responses = [future.result() for future in futures]
+        return _baseline_result(query, windows, responses, threshold)
+    except Exception as e:
+        return {"status": "error", "message": f"Error comparing to baseline: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def query_metrics_async(
+    query: str = Field(..., description="The query to execute"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Query metrics from Datadog."""
+    try:
+        async with async_datadog_api(METRICS_API) as metrics_api:
+            response = await _fetch_metrics_async(metrics_api, query, from_time, to_time)
+            return {"status": "success", "message": "Metrics queried successfully", "content": _shape(response, summary, downsample, compact, precision)}
+    except Exception as e:
+        return {"status": "error", "message": f"Error querying metrics: {e}"}
+
+async def list_metrics_async(
+    q: Optional[str] = Field(default=None, description="Query to filter metrics")
+) -> Dict[str, Any]:
+    """List available metrics."""
+    try:
+        async with async_datadog_api(METRICS_API) as metrics_api:
+            response = await metrics_api.list_metrics(q=q)
+            return {"status": "success", "message": "Metrics listed successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error listing metrics: {e}"}
+
+async def search_metrics_async(
+    query: str = Field(..., description="Metric name prefix or words to match, e.g. 'system.cpu' or 'checkout latency' (tolerates one typo per word)"),
+    limit: int = Field(default=50, ge=1, le=1000, description="Maximum number of metric names to return"),
+    offset: int = Field(default=0, ge=0, description="Number of ranked results to skip, from a previous response's next_offset"),
+    fuzzy: bool = Field(default=True, description="Also match words one typo away")
+) -> Dict[str, Any]:
+    """Search active metric names, best matches first (exact, prefix, word matches, then typos)."""
+    try:
+        async with async_datadog_api(METRICS_API) as metrics_api:
+            async def fetch(from_ts):
+                return (await metrics_api.list_active_metrics(from_ts)).to_dict().get("metrics") or []
+
+            await metric_index.refresh_async(fetch)
+        return _search_result(query, limit, offset, fuzzy)
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while searching metrics: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while searching metrics: {e}"}
+
+async def query_p99_latency_async(
+    service_name: str = Field(..., description="The name of the service to query"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Query P99 latency for a specific service."""
+    try:
+        async with async_datadog_api(METRICS_API) as metrics_api:
+            response = await _service_metric_async(metrics_api, "p99_latency", service_name, from_time, to_time)
+            return {"status": "success", "message": "P99 latency retrieved successfully", "content": _shape(response, summary, downsample, compact, precision)}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while querying P99 latency: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while querying P99 latency: {e}"}
+
+async def query_error_rate_async(
+    service_name: str = Field(..., description="The name of the service to query"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Query error rate for a specific service."""
+    try:
+        async with async_datadog_api(METRICS_API) as metrics_api:
+            response = await _service_metric_async(metrics_api, "error_rate", service_name, from_time, to_time)
+            return {"status": "success", "message": "Error rate retrieved successfully", "content": _shape(response, summary, downsample, compact, precision)}
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while querying error rate: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while querying error rate: {e}"}
+
+async def query_downstream_latency_async(
+    service_name: str = Field(..., description="The name of the downstream service to query"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics (min/max/mean/percentiles, last value, slope, change points) instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
 ) -> Dict[str, Any]:
     """Query latency for a downstream service."""
     try:
-        with ApiClient(configuration) as api_client:
-            metrics_api = MetricsApi(api_client)
-            query = f"avg:trace.{service_name}.downstream.duration{99}percent"
-            response = metrics_api.query_metrics(from_time, to_time, query)
-            return {"status": "success", "message": "Downstream latency retrieved successfully", "content": response.to_dict()}
+        async with async_datadog_api(METRICS_API) as metrics_api:
+            response = await _service_metric_async(metrics_api, "downstream_latency", service_name, from_time, to_time)
+            return {"status": "success", "message": "Downstream latency retrieved successfully", "content": _shape(response, summary, downsample, compact, precision)}
     except ApiException as e:
         return {"status": "error", "message": f"API error while querying downstream latency: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while querying downstream latency: {e}"}
+
+async def _query_one_async(semaphore, query, from_time, to_time, summary, downsample, compact, precision):
+    if from_time is None or to_time is None:
+        return {"status": "error", "message": "from_time and to_time are required (per query or for the whole batch)"}
+    try:
+        async with semaphore, async_datadog_api(METRICS_API) as metrics_api:
+            response = await _fetch_metrics_async(metrics_api, query, from_time, to_time)
+            return {"status": "success", "content": _shape(response, summary, downsample, compact, precision)}
+    except Exception as e:
+        return {"status": "error", "message": f"Error querying metrics: {e}"}
+
+async def query_metrics_batch_async(
+    queries: List[Union[str, MetricQuery]] = Field(..., description="Metric queries to run, as query strings or {query, from_time, to_time} objects"),
+    from_time: Optional[int] = Field(default=None, description="Start time in epoch seconds for queries without their own"),
+    to_time: Optional[int] = Field(default=None, description="End time in epoch seconds for queries without their own"),
+    summary: bool = Field(default=False, description="Return per-series statistics instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Run several metric queries concurrently; results are keyed by query, each with its own status."""
+    try:
+        if len(queries) > MAX_BATCH_QUERIES:
+            return {"status": "error", "message": f"At most {MAX_BATCH_QUERIES} queries per batch, got {len(queries)}"}
+        plan = _batch_plan(queries, from_time, to_time)
+        if not plan:
+            return {"status": "error", "message": "No queries given"}
+        semaphore = asyncio.Semaphore(DATADOG_BATCH_CONCURRENCY)
+        results = await asyncio.gather(*(_query_one_async(semaphore, query, start, end, summary, downsample, compact, precision) for _, query, start, end in plan))
+        return _batch_result({key: result for (key, _, _, _), result in zip(plan, results)})
+    except Exception as e:
+        return {"status": "error", "message": f"Error running metric query batch: {e}"}
+
+async def fetch_group_async(semaphore, query, from_time, to_time):
+    """fetch_group() for the async client, holding `semaphore` while the query is in flight."""
+    try:
+        async with semaphore, async_datadog_api(METRICS_API) as metrics_api:
+            return await _fetch_metrics_async(metrics_api, query, from_time, to_time)
+    except Exception as e:
+        return e
+
+async def query_service_metrics_async(
+    services: List[str] = Field(..., description="Services to compare"),
+    metric: str = Field(default="p99_latency", description="One of 'p99_latency', 'error_rate' (errors / hits) or 'downstream_latency' (p99 latency callers see)"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    summary: bool = Field(default=False, description="Return per-series statistics instead of every point"),
+    downsample: Optional[int] = Field(default=None, description="With summary, also keep this many representative points per series (LTTB)"),
+    compact: bool = Field(default=False, description="Return each series as a start timestamp, a step (or timestamp deltas) and a column of values instead of [timestamp, value] pairs"),
+    precision: Optional[int] = Field(default=None, description="With compact, round values to this many decimal places")
+) -> Dict[str, Any]:
+    """Query one APM metric for many services with as few grouped (`by {service}`) queries as possible; results are keyed by service."""
+    try:
+        if metric not in SERVICE_QUERIES:
+            return {"status": "error", "message": f"Unknown metric '{metric}', expected one of {sorted(SERVICE_QUERIES)}"}
+        plan = plan_service_queries(metric, services, DATADOG_APM_OPERATION, DATADOG_MAX_SERVICES_PER_QUERY)
+        if not plan:
+            return {"status": "error", "message": "No services given"}
+        semaphore = asyncio.Semaphore(DATADOG_BATCH_CONCURRENCY)
+        responses = await asyncio.gather(*(fetch_group_async(semaphore, query, from_time, to_time) for query, _ in plan))
+        return _service_result(plan, responses, SERVICE_QUERIES[metric][1], summary, downsample, compact, precision)
+    except Exception as e:
+        return {"status": "error", "message": f"Error querying service metrics: {e}"}
+
+async def compare_to_baseline_async(
+    from_time: int = Field(..., description="Start of the window to check, in epoch seconds"),
+    to_time: int = Field(..., description="End of the window to check, in epoch seconds"),
+    query: Optional[str] = Field(default=None, description="Metric query to check; alternatively give service_name and metric"),
+    service_name: Optional[str] = Field(default=None, description="Service to check with one of the canonical APM metrics"),
+    metric: str = Field(default="p99_latency", description="With service_name: 'p99_latency', 'error_rate' or 'downstream_latency'"),
+    baseline_windows: int = Field(default=4, ge=1, le=28, description="Number of earlier equivalent windows to compare against"),
+    period: int = Field(default=86400, ge=60, description="Seconds between equivalent windows (86400 = same time on previous days, 604800 = previous weeks)"),
+    threshold: float = Field(default=3.0, gt=0, description="|z-score| above which a point counts as anomalous")
+) -> Dict[str, Any]:
+    """Check whether a window is abnormal: compares it with earlier equivalent windows (z-scores, % deltas, anomalous intervals)."""
+    try:
+        query, windows = _baseline_plan(query, service_name, metric, from_time, to_time, baseline_windows, period)
+        semaphore = asyncio.Semaphore(DATADOG_BATCH_CONCURRENCY)
+        responses = await asyncio.gather(*(fetch_group_async(semaphore, query, start, end) for start, end, _ in windows))
+        return _baseline_result(query, windows, responses, threshold)
+    except Exception as e:
+        return {"status": "error", "message": f"Error comparing to baseline: {e}"}
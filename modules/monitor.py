@@ -1,13 +1,16 @@
+import asyncio
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 from typing import Optional, List, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.monitors_api import MonitorsApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api, call_raw
+from config import DATADOG_BATCH_CONCURRENCY
 
-mcp = FastMCP("Datadog Monitor Service")
+MONITORS_API = "datadog_api_client.v1.api.monitors_api.MonitorsApi"
+# Monitor configuration policies only exist in the v2 API
+MONITOR_CONFIG_POLICIES_API = "datadog_api_client.v2.api.monitors_api.MonitorsApi"
 
-@mcp.tool()
 def create_monitor(
     name: str = Field(..., description="The name of the monitor"),
     type: str = Field(..., description="The type of the monitor (e.g., 'metric alert')"),
@@ -17,8 +20,7 @@ def create_monitor(
 ) -> Dict[str, Any]:
     """Create a new monitor."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITORS_API) as monitors_api:
             body = {
                 "name": name,
                 "type": type,
@@ -31,71 +33,162 @@ def create_monitor(
     except Exception as e:
         return {"status": "error", "message": f"Error creating monitor: {e}"}
 
-@mcp.tool()
 def delete_monitor(
     monitor_id: int = Field(..., description="The ID of the monitor to delete")
 ) -> Dict[str, Any]:
     """Delete a specific monitor."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITORS_API) as monitors_api:
             monitors_api.delete_monitor(monitor_id)
             return {"status": "success", "message": "Monitor deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting monitor: {e}"}
 
-@mcp.tool()
+# Monitors per list_monitors page (the API allows up to 1000)
+MONITOR_PAGE_SIZE = 1000
+MONITOR_STATES = ("alert", "warn", "no_data", "ok", "ignored", "skipped", "unknown")
+
+
+def _monitor_state(monitor):
+    state = monitor.get("overall_state")
+    return str(state).lower().replace(" ", "_") if state else "unknown"
+
+
+def _modified_ts(value):
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+class MonitorStatus:
+    """Status summary and per-monitor records built in one pass over list_monitors pages.
+
+    Pages can arrive in any order; records are kept per page and returned in page order.
+    """
+
+    def __init__(self, summary_only=False, only_non_ok=False):
+        self.summary_only = summary_only
+        self.only_non_ok = only_non_ok
+        self.summary = {status: 0 for status in MONITOR_STATES}
+        self.total = 0
+        self.pages = {}
+
+    def add(self, page, monitors):
+        records = []
+        for monitor in monitors:
+            status = _monitor_state(monitor)
+            self.summary[status] = self.summary.get(status, 0) + 1
+            self.total += 1
+            if self.summary_only or (self.only_non_ok and status == "ok"):
+                continue
+            records.append({
+                "name": monitor.get("name") or "",
+                "id": monitor.get("id") or 0,
+                "status": status,
+                "message": monitor.get("message"),
+                "tags": monitor.get("tags") or [],
+                "query": monitor.get("query") or "",
+                "last_updated_ts": _modified_ts(monitor.get("modified")),
+            })
+        self.pages[page] = records
+
+    def result(self):
+        if not self.total:
+            return {"status": "error", "message": "No monitor data returned", "content": []}
+        content = {"summary": self.summary, "total": self.total}
+        if not self.summary_only:
+            content["monitors"] = [record for page in sorted(self.pages) for record in self.pages[page]]
+        return {"status": "success", "message": "Monitors retrieved successfully", "content": content}
+
+
+def _list_monitors_kwargs(name=None, group_states=None, tags=None, monitor_tags=None):
+    # Only filters that are set: the generated client rejects None for its optional parameters
+    kwargs = {
+        "name": name,
+        "group_states": ",".join(group_states) if group_states else None,
+        "tags": ",".join(tags) if tags else None,
+        "monitor_tags": monitor_tags,
+    }
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+
+def _window(full_pages):
+    # Pages in flight: one to start with, growing with each full page up to DATADOG_BATCH_CONCURRENCY,
+    # so small fleets don't request pages past their end
+    return min(DATADOG_BATCH_CONCURRENCY, full_pages + 1)
+
+
+def list_monitor_pages(monitors_api, status, page_size=MONITOR_PAGE_SIZE, **filters):
+    """Feed every page of list_monitors into `status`, with up to DATADOG_BATCH_CONCURRENCY pages in flight.
+
+    No page past the first short one is requested once it has come back; only pages already in
+    flight at that point can be wasted, and there are never more of those than full pages seen.
+    """
+    def fetch(page):
+        return page, call_raw(monitors_api._list_monitors_endpoint, page=page, page_size=page_size, **filters)
+
+    pending = {}
+    next_page, full, last = 0, 0, None
+    with ThreadPoolExecutor(max_workers=DATADOG_BATCH_CONCURRENCY) as executor:
+        while pending or last is None:
+            while last is None and len(pending) < _window(full):
+                pending[executor.submit(contextvars.copy_context().run, fetch, next_page)] = next_page
+                next_page += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                page, monitors = future.result()
+                status.add(page, monitors)
+                if len(monitors) < page_size:
+                    last = page if last is None else min(last, page)
+                else:
+                    full += 1
+    return status
+
+
+async def list_monitor_pages_async(monitors_api, status, page_size=MONITOR_PAGE_SIZE, **filters):
+    """list_monitor_pages() for an async client."""
+    async def fetch(page):
+        return page, await call_raw(monitors_api._list_monitors_endpoint, page=page, page_size=page_size, **filters)
+
+    pending = set()
+    next_page, full, last = 0, 0, None
+    try:
+        while pending or last is None:
+            while last is None and len(pending) < _window(full):
+                pending.add(asyncio.ensure_future(fetch(next_page)))
+                next_page += 1
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page, monitors = task.result()
+                status.add(page, monitors)
+                if len(monitors) < page_size:
+                    last = page if last is None else min(last, page)
+                else:
+                    full += 1
+    finally:
+        for task in pending:
+            task.cancel()
+    return status
+
+
 def get_monitor_status(
     name: Optional[str] = Field(default=None, description="The name of the monitor to filter"),
     group_states: Optional[List[str]] = Field(default=None, description="Filter by group states (e.g., 'alert', 'warn')"),
-    tags: Optional[List[str]] = Field(default=None, description="Filter by tags")
+    tags: Optional[List[str]] = Field(default=None, description="Filter by tags"),
+    summary_only: bool = Field(default=False, description="Return only the count of monitors per status"),
+    only_non_ok: bool = Field(default=False, description="List only monitors that are not OK (the summary still counts all)"),
+    page_size: int = Field(default=MONITOR_PAGE_SIZE, ge=1, le=1000, description="Monitors per list_monitors request")
 ) -> Dict[str, Any]:
     """Fetch the status of Datadog monitors."""
-    group_states = group_states or []
-    tags = tags or []
-
-    try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
-            response = monitors_api.list_monitors(
-                group_states=','.join(group_states) if group_states else None,
-                name=name,
-                tags=','.join(tags) if tags else None
-            )
-
-            if not response:
-                return {"status": "error", "message": "No monitor data returned", "content": []}
-
-            monitors_data = [
-                {
-                    "name": monitor.name or "",
-                    "id": monitor.id or 0,
-                    "status": str(monitor.overall_state).lower() if monitor.overall_state else "unknown",
-                    "message": monitor.message,
-                    "tags": monitor.tags or [],
-                    "query": monitor.query or "",
-                    "last_updated_ts": int(monitor.modified.timestamp()) if monitor.modified else None,
-                }
-                for monitor in response
-            ]
-
-            summary = {status: 0 for status in ["alert", "warn", "no_data", "ok", "ignored", "skipped", "unknown"]}
-            for monitor in response:
-                status = str(monitor.overall_state).lower() if monitor.overall_state else "unknown"
-                summary[status] = summary.get(status, 0) + 1
-
-            return {
-                "status": "success",
-                "message": "Monitors retrieved successfully",
-                "content": {
-                    "monitors": monitors_data,
-                    "summary": summary
-                }
-            }
+    try:
+        with datadog_api(MONITORS_API) as monitors_api:
+            status = MonitorStatus(summary_only, only_non_ok)
+            list_monitor_pages(monitors_api, status, page_size, **_list_monitors_kwargs(name, group_states, tags))
+            return status.result()
     except Exception as e:
         return {"status": "error", "message": f"Error fetching monitor status: {e}", "content": []}
 
-@mcp.tool()
 def update_monitor(
     monitor_id: int = Field(..., description="The ID of the monitor to update"),
     name: Optional[str] = Field(default=None, description="The new name of the monitor"),
@@ -105,8 +198,7 @@ def update_monitor(
 ) -> Dict[str, Any]:
     """Update an existing monitor."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITORS_API) as monitors_api:
             body = {}
             if name:
                 body["name"] = name
@@ -121,7 +213,6 @@ def update_monitor(
     except Exception as e:
         return {"status": "error", "message": f"Error updating monitor: {e}"}
 
-@mcp.tool()
 def create_monitor_config_policy(
     name: str = Field(..., description="The name of the monitor config policy"),
     policy_type: str = Field(..., description="The type of the policy (e.g., 'tag')"),
@@ -130,8 +221,7 @@ def create_monitor_config_policy(
 ) -> Dict[str, Any]:
     """Create a new monitor configuration policy."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
             body = {
                 "data": {
                     "type": "monitor_config_policy",
@@ -148,7 +238,6 @@ def create_monitor_config_policy(
     except Exception as e:
         return {"status": "error", "message": f"Error creating monitor config policy: {e}"}
 
-@mcp.tool()
 def update_monitor_config_policy(
     policy_id: str = Field(..., description="The ID of the monitor config policy to update"),
     name: Optional[str] = Field(default=None, description="The new name of the policy"),
@@ -156,8 +245,7 @@ def update_monitor_config_policy(
 ) -> Dict[str, Any]:
     """Update an existing monitor configuration policy."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
             body = {"data": {"type": "monitor_config_policy", "id": policy_id, "attributes": {}}}
             if name:
                 body["data"]["attributes"]["name"] = name
@@ -168,31 +256,26 @@ def update_monitor_config_policy(
     except Exception as e:
         return {"status": "error", "message": f"Error updating monitor config policy: {e}"}
 
-@mcp.tool()
 def delete_monitor_config_policy(
     policy_id: str = Field(..., description="The ID of the monitor config policy to delete")
 ) -> Dict[str, Any]:
     """Delete a monitor configuration policy."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
             monitors_api.delete_monitor_config_policy(policy_id)
             return {"status": "success", "message": "Monitor config policy deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting monitor config policy: {e}"}
 
-@mcp.tool()
 def list_monitor_config_policies() -> Dict[str, Any]:
     """List all monitor configuration policies."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
             response = monitors_api.list_monitor_config_policies()
             return {"status": "success", "message": "Monitor config policies retrieved successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error listing monitor config policies: {e}"}
 
-@mcp.tool()
 def search_monitors(
     query: str = Field(..., description="The search query for monitors"),
     page: int = Field(default=0, description="Page number for pagination"),
@@ -200,22 +283,182 @@ def search_monitors(
 ) -> Dict[str, Any]:
     """Search monitors using a query."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITORS_API) as monitors_api:
             response = monitors_api.search_monitors(query=query, page=page, per_page=per_page)
             return {"status": "success", "message": "Monitors retrieved successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error searching monitors: {e}"}
 
-@mcp.tool()
 def get_monitor(
     monitor_id: int = Field(..., description="The ID of the monitor to retrieve")
 ) -> Dict[str, Any]:
     """Retrieve details of a specific monitor."""
     try:
-        with ApiClient(configuration) as api_client:
-            monitors_api = MonitorsApi(api_client)
+        with datadog_api(MONITORS_API) as monitors_api:
             response = monitors_api.get_monitor(monitor_id)
             return {"status": "success", "message": "Monitor retrieved successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error retrieving monitor: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def create_monitor_async(
+    name: str = Field(..., description="The name of the monitor"),
+    type: str = Field(..., description="The type of the monitor (e.g., 'metric alert')"),
+    query: str = Field(..., description="The query to evaluate for the monitor"),
+    message: Optional[str] = Field(default=None, description="The message to include with notifications"),
+    tags: Optional[List[str]] = Field(default=None, description="A list of tags to associate with the monitor")
+) -> Dict[str, Any]:
+    """Create a new monitor."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            body = {
+                "name": name,
+                "type": type,
+                "query": query,
+                "message": message,
+                "tags": tags or []
+            }
+            response = await monitors_api.create_monitor(body=body)
+            return {"status": "success", "message": "Monitor created successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error creating monitor: {e}"}
+
+async def delete_monitor_async(
+    monitor_id: int = Field(..., description="The ID of the monitor to delete")
+) -> Dict[str, Any]:
+    """Delete a specific monitor."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            await monitors_api.delete_monitor(monitor_id)
+            return {"status": "success", "message": "Monitor deleted successfully"}
+    except Exception as e:
+        return {"status": "error", "message": f"Error deleting monitor: {e}"}
+
+async def get_monitor_status_async(
+    name: Optional[str] = Field(default=None, description="The name of the monitor to filter"),
+    group_states: Optional[List[str]] = Field(default=None, description="Filter by group states (e.g., 'alert', 'warn')"),
+    tags: Optional[List[str]] = Field(default=None, description="Filter by tags"),
+    summary_only: bool = Field(default=False, description="Return only the count of monitors per status"),
+    only_non_ok: bool = Field(default=False, description="List only monitors that are not OK (the summary still counts all)"),
+    page_size: int = Field(default=MONITOR_PAGE_SIZE, ge=1, le=1000, description="Monitors per list_monitors request")
+) -> Dict[str, Any]:
+    """Fetch the status of Datadog monitors."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            status = MonitorStatus(summary_only, only_non_ok)
+            await list_monitor_pages_async(monitors_api, status, page_size, **_list_monitors_kwargs(name, group_states, tags))
+            return status.result()
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching monitor status: {e}", "content": []}
+
+async def update_monitor_async(
+    monitor_id: int = Field(..., description="The ID of the monitor to update"),
+    name: Optional[str] = Field(default=None, description="The new name of the monitor"),
+    query: Optional[str] = Field(default=None, description="The new query for the monitor"),
+    message: Optional[str] = Field(default=None, description="The new message for the monitor"),
+    tags: Optional[List[str]] = Field(default=None, description="The new tags for the monitor")
+) -> Dict[str, Any]:
+    """Update an existing monitor."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            body = {}
+            if name:
+                body["name"] = name
+            if query:
+                body["query"] = query
+            if message:
+                body["message"] = message
+            if tags:
+                body["tags"] = tags
+            response = await monitors_api.update_monitor(monitor_id, body=body)
+            return {"status": "success", "message": "Monitor updated successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error updating monitor: {e}"}
+
+async def create_monitor_config_policy_async(
+    name: str = Field(..., description="The name of the monitor config policy"),
+    policy_type: str = Field(..., description="The type of the policy (e.g., 'tag')"),
+    tags: List[str] = Field(..., description="The tags to apply the policy to"),
+    policy: Dict[str, Any] = Field(..., description="The policy configuration")
+) -> Dict[str, Any]:
+    """Create a new monitor configuration policy."""
+    try:
+        async with async_datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
+            body = {
+                "data": {
+                    "type": "monitor_config_policy",
+                    "attributes": {
+                        "name": name,
+                        "policy_type": policy_type,
+                        "tags": tags,
+                        "policy": policy,
+                    },
+                }
+            }
+            response = await monitors_api.create_monitor_config_policy(body=body)
+            return {"status": "success", "message": "Monitor config policy created successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error creating monitor config policy: {e}"}
+
+async def update_monitor_config_policy_async(
+    policy_id: str = Field(..., description="The ID of the monitor config policy to update"),
+    name: Optional[str] = Field(default=None, description="The new name of the policy"),
+    policy: Optional[Dict[str, Any]] = Field(default=None, description="The updated policy configuration")
+) -> Dict[str, Any]:
+    """Update an existing monitor configuration policy."""
+    try:
+        async with async_datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
+            body = {"data": {"type": "monitor_config_policy", "id": policy_id, "attributes": {}}}
+            if name:
+                body["data"]["attributes"]["name"] = name
+            if policy:
+                body["data"]["attributes"]["policy"] = policy
+            response = await monitors_api.update_monitor_config_policy(policy_id, body=body)
+            return {"status": "success", "message": "Monitor config policy updated successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error updating monitor config policy: {e}"}
+
+async def delete_monitor_config_policy_async(
+    policy_id: str = Field(..., description="The ID of the monitor config policy to delete")
+) -> Dict[str, Any]:
+    """Delete a monitor configuration policy."""
+    try:
+        async with async_datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
+            await monitors_api.delete_monitor_config_policy(policy_id)
+            return {"status": "success", "message": "Monitor config policy deleted successfully"}
+    except Exception as e:
+        return {"status": "error", "message": f"Error deleting monitor config policy: {e}"}
+
+async def list_monitor_config_policies_async() -> Dict[str, Any]:
+    """List all monitor configuration policies."""
+    try:
+        async with async_datadog_api(MONITOR_CONFIG_POLICIES_API) as monitors_api:
+            response = await monitors_api.list_monitor_config_policies()
+            return {"status": "success", "message": "Monitor config policies retrieved successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error listing monitor config policies: {e}"}
+
+async def search_monitors_async(
+    query: str = Field(..., description="The search query for monitors"),
+    page: int = Field(default=0, description="Page number for pagination"),
+    per_page: int = Field(default=30, description="Number of monitors per page")
+) -> Dict[str, Any]:
+    """Search monitors using a query."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            response = await monitors_api.search_monitors(query=query, page=page, per_page=per_page)
+            return {"status": "success", "message": "Monitors retrieved successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error searching monitors: {e}"}
+
+async def get_monitor_async(
+    monitor_id: int = Field(..., description="The ID of the monitor to retrieve")
+) -> Dict[str, Any]:
+    """Retrieve details of a specific monitor."""
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            response = await monitors_api.get_monitor(monitor_id)
+            return {"status": "success", "message": "Monitor retrieved successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error retrieving monitor: {e}"}
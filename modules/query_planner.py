@@ -0,0 +1,56 @@
+import re
+
+# Canonical per-service APM metric queries: (query template, tag the services are selected and grouped by).
+# {operation} is the traced operation (span name), {scope} the tag filter and {tag} the group-by tag.
+SERVICE_QUERIES = {
+    "p99_latency": ("p99:trace.{operation}{{{scope}}} by {{{tag}}}", "service"),
+    "error_rate": (
+        "sum:trace.{operation}.errors{{{scope}}} by {{{tag}}}.as_count() / "
+        "sum:trace.{operation}.hits{{{scope}}} by {{{tag}}}.as_count()",
+        "service",
+    ),
+    # Latency callers see when calling the service: client spans are tagged with the service they call
+    "downstream_latency": ("p99:trace.{operation}{{{scope}}} by {{{tag}}}", "peer.service"),
+}
+
+_INVALID_TAG_CHARS = re.compile(r"[^a-z0-9_\-./:]")
+
+
+def canonical_service(name):
+    """A service name as Datadog stores it in tags: lowercased, with unsupported characters replaced by '_'."""
+    return _INVALID_TAG_CHARS.sub("_", name.strip().lower())
+
+
+def plan_service_queries(kind, services, operation, max_services):
+    """Grouped queries covering `services`, as [(query, [service, ...])].
+
+    Services are deduplicated and sorted before being packed into groups of at most
+    `max_services`, so the same set of services always produces the same query strings.
+    """
+    template, tag = SERVICE_QUERIES[kind]
+    services = sorted({canonical_service(s) for s in services if s and s.strip()})
+    plan = []
+    for i in range(0, len(services), max(1, max_services)):
+        group = services[i:i + max_services]
+        scope = " OR ".join(f"{tag}:{service}" for service in group)
+        plan.append((template.format(operation=operation, scope=scope, tag=tag), group))
+    return plan
+
+
+def _series_value(series, tag):
+    prefix = tag + ":"
+    for item in [*(series.get("tag_set") or []), *str(series.get("scope") or "").split(",")]:
+        if item.startswith(prefix):
+            return item[len(prefix):]
+    return None
+
+
+def split_by_tag(response, tag, services):
+    """Split a grouped query_metrics response into one response per service (empty series for services without data)."""
+    template = {k: v for k, v in response.items() if k != "series"}
+    split = {service: {**template, "series": []} for service in services}
+    for series in response.get("series") or []:
+        service = _series_value(series, tag)
+        if service in split:
+            split[service]["series"].append(series)
+    return split
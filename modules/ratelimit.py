@@ -0,0 +1,199 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+from .coalesce import is_read_only
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Pace requests evenly over the rest of the window once less than this share of the quota is left
+PACING_THRESHOLD = 0.25
+
+_ID_SEGMENT = re.compile(r"^(?!v\d+$).*\d")
+
+
+def _header(headers, name):
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        name = name.lower()
+        value = next((v for k, v in headers.items() if k.lower() == name), None)
+    return value
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def endpoint_key(method, url):
+    """`METHOD /path` with id-like path segments collapsed, used until Datadog names the bucket."""
+    path = "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in urlsplit(url).path.split("/"))
+    return f"{method} {path}"
+
+
+class _Bucket:
+    def __init__(self, name, concurrency):
+        self.name = name
+        self.concurrency = float(concurrency)
+        self.in_flight = 0
+        self.limit = None
+        self.remaining = None
+        self.period = None
+        self.reset_at = 0.0
+        self.next_slot = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.waited = 0.0
+
+    def snapshot(self, now):
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "period": self.period,
+            "reset_in": round(max(0.0, self.reset_at - now), 2),
+            "concurrency": round(self.concurrency, 2),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "waited_seconds": round(self.waited, 3),
+        }
+
+
+class RateLimitScheduler:
+    """Paces Datadog requests per rate-limit bucket using the X-RateLimit-* response headers.
+
+    Each bucket (named by X-RateLimit-Name, or by endpoint until the name is known) has an
+    AIMD concurrency limit: +1/concurrency per success, halved on every 429. Requests wait for a
+    free slot, hold back while the quota is exhausted until X-RateLimit-Reset, and are spread
+    over the rest of the window once the remaining quota runs low.
+    """
+
+    def __init__(self, initial_concurrency=10, max_concurrency=20, max_retries=3, backoff=0.5, max_backoff=30):
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._cond = threading.Condition(threading.Lock())
+        self._buckets = {}
+        self._endpoint_buckets = {}
+
+    def _bucket(self, name):
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = _Bucket(name, min(self.initial_concurrency, self.max_concurrency))
+        return bucket
+
+    def _wait_time(self, bucket, now):
+        """0 if a request may start now, seconds to wait otherwise, None to wait for a free slot."""
+        if bucket.in_flight >= max(1, int(bucket.concurrency)):
+            return None
+        if bucket.remaining is not None and bucket.remaining <= 0 and now < bucket.reset_at:
+            wait = bucket.reset_at - now
+            # Don't stall a tool for a long window; let Datadog reject it and surface the error
+            return wait if wait <= self.max_backoff else 0
+        return max(0.0, bucket.next_slot - now)
+
+    def _take(self, bucket, now):
+        bucket.in_flight += 1
+        bucket.requests += 1
+        if bucket.remaining is None or now >= bucket.reset_at:
+            return
+        bucket.remaining -= 1
+        if bucket.limit and bucket.remaining < bucket.limit * PACING_THRESHOLD:
+            bucket.next_slot = now + (bucket.reset_at - now) / max(bucket.remaining, 1)
+
+    def acquire(self, method, url):
+        """Block until a request to `url` may be sent; returns the bucket to pass to release()."""
+        key = endpoint_key(method, url)
+        with self._cond:
+            start = time.monotonic()
+            while True:
+                now = time.monotonic()
+                bucket = self._bucket(self._endpoint_buckets.get(key, key))
+                wait = self._wait_time(bucket, now)
+                if wait == 0:
+                    self._take(bucket, now)
+                    bucket.waited += now - start
+                    return bucket
+                self._cond.wait(wait)
+
+    async def acquire_async(self, method, url):
+        key = endpoint_key(method, url)
+        start = time.monotonic()
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                bucket = self._bucket(self._endpoint_buckets.get(key, key))
+                wait = self._wait_time(bucket, now)
+                if wait == 0:
+                    self._take(bucket, now)
+                    bucket.waited += now - start
+                    return bucket
+            await asyncio.sleep(0.01 if wait is None else wait)
+
+    def release(self, bucket, method, url, status, headers):
+        """Record the outcome of a request started with acquire(), adapt the bucket's limits and return the bucket."""
+        now = time.monotonic()
+        with self._cond:
+            bucket.in_flight -= 1
+            name = _header(headers, "X-RateLimit-Name")
+            if name:
+                key = endpoint_key(method, url)
+                if self._endpoint_buckets.get(key) != name:
+                    self._endpoint_buckets[key] = name
+                bucket = self._bucket(name)
+            limit = _number(_header(headers, "X-RateLimit-Limit"))
+            if limit is not None:
+                bucket.limit = int(limit)
+                bucket.period = _number(_header(headers, "X-RateLimit-Period"))
+                remaining = _number(_header(headers, "X-RateLimit-Remaining"))
+                reset = _number(_header(headers, "X-RateLimit-Reset"))
+                if remaining is not None:
+                    bucket.remaining = int(remaining)
+                if reset is not None:
+                    bucket.reset_at = now + reset
+                if bucket.remaining is not None and bucket.remaining >= bucket.limit * PACING_THRESHOLD:
+                    bucket.next_slot = 0.0
+            if status == 429:
+                bucket.throttled += 1
+                bucket.concurrency = max(1.0, bucket.concurrency / 2)
+                bucket.remaining = 0
+            elif 200 <= status < 300:
+                bucket.concurrency = min(self.max_concurrency, bucket.concurrency + 1 / bucket.concurrency)
+            self._cond.notify_all()
+        return bucket
+
+    def retry_delay(self, bucket, method, url, attempt, status, headers):
+        """Seconds to wait before retrying a failed request, or None if it should not be retried.
+
+        429s are always retried (the request was rejected, not executed), after X-RateLimit-Reset
+        when Datadog sends it. 5xx are retried only for read-only requests, with full-jitter
+        exponential backoff.
+        """
+        if attempt >= self.max_retries or status not in RETRY_STATUSES:
+            return None
+        if status != 429 and not is_read_only(method, url):
+            return None
+        reset = _number(_header(headers, "X-RateLimit-Reset")) if status == 429 else None
+        if reset is not None:
+            if reset > self.max_backoff:
+                return None
+            delay = reset + random.uniform(0, min(1.0, 0.1 * reset + 0.05))
+        else:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        with self._cond:
+            bucket.retries += 1
+        return delay
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._cond:
+            return {name: bucket.snapshot(now) for name, bucket in sorted(self._buckets.items())}
@@ -1,63 +1,303 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
 from typing import Dict, Any, Optional
 from pydantic import Field
-from mcp.server.fastmcp import FastMCP
-from .apm import query_apm_errors, query_apm_latency, query_apm_spans
-from datadog_api_client.exceptions import (
-    ApiException
+from .apm import (
+    query_apm_errors, query_apm_errors_async,
+    query_apm_latency, query_apm_latency_async,
+    query_apm_spans, query_apm_spans_async,
 )
-import json
-import time
+from .client import datadog_api, async_datadog_api
+from .dependency_walk import DependencyWalk, level_health, level_queries
+from .metrics import comparable_query, fetch_group, fetch_group_async
+from .monitor import MONITORS_API, MonitorStatus, list_monitor_pages, list_monitor_pages_async
+from .service_dependencies import SERVICE_DEPENDENCIES_API, downstream_graph, warm_graph, warm_graph_async
+from config import (
+    DATADOG_ANALYSIS_DEADLINE,
+    DATADOG_APM_ENV,
+    DATADOG_APM_OPERATION,
+    DATADOG_BATCH_CONCURRENCY,
+    DATADOG_MAX_SERVICES_PER_QUERY,
+    DATADOG_SERVICE_GRAPH_LOOKBACK,
+)
+
+INCIDENTS_API = "datadog_api_client.v2.api.incidents_api.IncidentsApi"
+# Recent incidents scanned for ones that involve the service
+INCIDENT_PAGE_SIZE = 50
+# Services checked per level of a dependency walk; the rest of a very wide level is skipped
+MAX_LEVEL_SERVICES = 100
+
+
+def _window(from_time, to_time):
+    # Defaults to the last 2 hours
+    now = int(time.time())
+    to_time = to_time if isinstance(to_time, int) else now
+    from_time = from_time if isinstance(from_time, int) else to_time - 7200
+    return from_time, to_time
+
+
+def _incident_services(incident):
+    attributes = incident.get("attributes") or {}
+    services = ((attributes.get("fields") or {}).get("services") or {}).get("value") or []
+    return [services] if isinstance(services, str) else services
+
+
+def _incident_time(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _incidents_result(service_name, from_time, response):
+    """Incidents updated since `from_time` that list the service or name it in their title."""
+    incidents = []
+    for incident in response.to_dict().get("data") or []:
+        attributes = incident.get("attributes") or {}
+        modified = _incident_time(attributes.get("modified") or attributes.get("created"))
+        if modified is not None and modified < from_time:
+            continue
+        if service_name not in _incident_services(incident) and service_name not in (attributes.get("title") or ""):
+            continue
+        incidents.append({
+            "id": incident.get("id"),
+            "title": attributes.get("title"),
+            "state": ((attributes.get("fields") or {}).get("state") or {}).get("value"),
+            "created": str(attributes.get("created")),
+            "modified": str(attributes.get("modified")),
+            "customer_impacted": attributes.get("customer_impacted"),
+        })
+    return {"status": "success", "message": f"{len(incidents)} related incidents", "content": incidents}
+
+
+def _service_incidents(service_name, from_time):
+    try:
+        with datadog_api(INCIDENTS_API) as incidents_api:
+            return _incidents_result(service_name, from_time, incidents_api.list_incidents(page_size=INCIDENT_PAGE_SIZE))
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching incidents: {e}"}
+
+
+async def _service_incidents_async(service_name, from_time):
+    try:
+        async with async_datadog_api(INCIDENTS_API) as incidents_api:
+            return _incidents_result(service_name, from_time, await incidents_api.list_incidents(page_size=INCIDENT_PAGE_SIZE))
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching incidents: {e}"}
+
+
+def _service_monitors(service_name):
+    """Monitors tagged with the service (monitor tags, not the scope of their query)."""
+    try:
+        with datadog_api(MONITORS_API) as monitors_api:
+            return list_monitor_pages(monitors_api, MonitorStatus(), monitor_tags=f"service:{service_name}").result()
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching monitor status: {e}"}
+
+
+async def _service_monitors_async(service_name):
+    try:
+        async with async_datadog_api(MONITORS_API) as monitors_api:
+            return (await list_monitor_pages_async(monitors_api, MonitorStatus(), monitor_tags=f"service:{service_name}")).result()
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching monitor status: {e}"}
+
+
+# Section name -> (tool, async tool) queried by an analysis
+SECTION_TOOLS = {
+    "latency": (query_apm_latency, query_apm_latency_async),
+    "errors": (query_apm_errors, query_apm_errors_async),
+    "spans": (query_apm_spans, query_apm_spans_async),
+    "monitors": (_service_monitors, _service_monitors_async),
+    "incidents": (_service_incidents, _service_incidents_async),
+}
+
 
+def _section_kwargs(service_name, from_time, to_time, max_spans):
+    window = {"service_name": service_name, "from_time": from_time, "to_time": to_time}
+    return {
+        "latency": {**window, "limit": 10},
+        "errors": {**window, "limit": 10},
+        "spans": {**window, "max_spans": max_spans, "max_bytes": None, "cursor": None},
+        "monitors": {"service_name": service_name},
+        "incidents": {"service_name": service_name, "from_time": from_time},
+    }
+
+
+def _analysis_result(service_name, from_time, to_time, deadline, started, results):
+    """Combine section results; sections that failed or missed the deadline are listed under `partial`."""
+    sections, partial = {}, []
+    for name, result in results.items():
+        if result is None:
+            sections[name] = {"status": "timeout", "message": f"Did not finish within the {deadline:g}s deadline"}
+        else:
+            sections[name] = result
+        if sections[name].get("status") != "success":
+            partial.append(name)
+    content = {
+        "service_name": service_name,
+        "time_range": {"from": from_time, "to": to_time},
+        "sections": sections,
+        "partial": partial,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+    if len(partial) == len(sections):
+        return {"status": "error", "message": "Every root cause query failed or timed out", "content": content}
+    message = "Root cause analysis completed"
+    if partial:
+        message += f" (partial: {', '.join(partial)})"
+    return {"status": "success", "message": message, "content": content}
 
-mcp = FastMCP("Datadog Root Cause Analysis Service")
 
-@mcp.tool()
 def analyze_service_with_apm(
     service_name: str = Field(..., description="The name of the service to analyze"),
-    from_time: Optional[int] = Field(None, description="Start time in epoch seconds. Defaults to 2 hours ago if not provided"), 
-    to_time: Optional[int] = Field(None, description="End time in epoch seconds. Defaults to current time if not provided")
+    from_time: Optional[int] = Field(None, description="Start time in epoch seconds. Defaults to 2 hours ago if not provided"),
+    to_time: Optional[int] = Field(None, description="End time in epoch seconds. Defaults to current time if not provided"),
+    max_spans: int = Field(default=50, ge=1, le=1000, description="Sample spans to include"),
+    deadline: float = Field(default=DATADOG_ANALYSIS_DEADLINE, gt=0, le=300, description="Seconds to wait for the sub-queries before returning what has finished")
 ) -> Dict[str, Any]:
-    """Perform root cause analysis for a service, including APM spans, errors, and latency."""
-    try:
-        # Set default time range to last 2 hours if not provided
-        current_time = int(time.time())
-        to_time = to_time or current_time
-        from_time = from_time or (current_time - 7200)  # 7200 seconds = 2 hours
-
-        # Step 1: Query APM latency
-        latency_result = query_apm_latency(service_name, from_time, to_time)
-        if latency_result.get("status") != "success" or "data" not in latency_result:
-            return {"status": "error", "message": "Failed to retrieve APM latency", "details": latency_result}
-
-        # Step 2: Query APM errors
-        error_result = query_apm_errors(service_name, from_time, to_time)
-        if error_result.get("status") != "success" or "data" not in error_result:
-            return {"status": "error", "message": "Failed to retrieve APM errors", "details": error_result}
-
-        # Step 3: Query APM spans
-        spans_result = query_apm_spans(service_name, from_time, to_time)
-        if spans_result.get("status") != "success" or "data" not in spans_result:
-            return {"status": "error", "message": "Failed to retrieve APM spans", "details": spans_result}
-
-        # Structure the analysis result
-        analysis_result = {
-            "status": "success",
-            "service_name": service_name,
-            "time_range": {
-                "from": from_time,
-                "to": to_time
-            },
-            "data": {
-                "latency": latency_result.get("data", {}),
-                "errors": error_result.get("data", {}),
-                "spans": spans_result.get("data", {})
-            }
+    """Perform root cause analysis for a service: APM latency, errors and sample spans, plus its monitors and recent incidents, queried concurrently."""
+    try:
+        started = time.monotonic()
+        from_time, to_time = _window(from_time, to_time)
+        sections = _section_kwargs(service_name, from_time, to_time, max_spans)
+        executor = ThreadPoolExecutor(max_workers=len(sections))
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, SECTION_TOOLS[name][0], **kwargs)
+            for name, kwargs in sections.items()
         }
-        
-        return analysis_result
+        wait(futures.values(), timeout=deadline)
+        # Don't block on stragglers: their threads finish in the background and the results are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+        results = {name: future.result() if future.done() else None for name, future in futures.items()}
+        return _analysis_result(service_name, from_time, to_time, deadline, started, results)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Unexpected error during root cause analysis with APM: {str(e)}"
+        }
+
+def _recent(to_time):
+    # Windows the cached dependency graph covers are answered from memory; older ones fetch their own map
+    return to_time >= time.time() - DATADOG_SERVICE_GRAPH_LOOKBACK
+
 
+def _walk_result(walk):
+    content = walk.result()
+    if walk.service not in walk.graph:
+        return {"status": "error", "message": f"Service '{walk.service}' is not in the dependency map", "content": content}
+    suspects = content["suspects"]
+    message = f"Checked {content['services_checked']} services over {len(walk.levels)} levels"
+    message += f"; most likely origin: {suspects[0]['service']}" if suspects else "; no anomalous services found"
+    return {"status": "success", "message": message, "content": content}
+
+
+def find_downstream_root_cause(
+    service_name: str = Field(..., description="The service showing the problem"),
+    from_time: Optional[int] = Field(None, description="Start time in epoch seconds. Defaults to 2 hours ago if not provided"),
+    to_time: Optional[int] = Field(None, description="End time in epoch seconds. Defaults to current time if not provided"),
+    max_depth: int = Field(default=3, ge=1, le=10, description="Hops to walk downstream"),
+    baseline_windows: int = Field(default=2, ge=1, le=7, description="Earlier equivalent windows each service is compared with"),
+    period: int = Field(default=86400, ge=60, description="Seconds between equivalent windows (86400 = same time on previous days)"),
+    threshold: float = Field(default=3.0, gt=0, description="Mean z-score above which a service counts as anomalous"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
+) -> Dict[str, Any]:
+    """Walk the service's downstream dependencies level by level, comparing p99 latency and error rate with earlier windows, and rank the anomalous services by how likely they are to be the origin."""
+    try:
+        from_time, to_time = _window(from_time, to_time)
+        if _recent(to_time):
+            graph = warm_graph(env).downstream_map()
+        else:
+            with datadog_api(SERVICE_DEPENDENCIES_API) as service_dependencies_api:
+                graph = downstream_graph(service_dependencies_api.list_service_dependencies(env, start=from_time, end=to_time))
+        walk = DependencyWalk(graph, service_name, max_depth, threshold, MAX_LEVEL_SERVICES)
+        if walk.service not in walk.graph:
+            return _walk_result(walk)
+        with ThreadPoolExecutor(max_workers=DATADOG_BATCH_CONCURRENCY) as executor:
+            while walk.next_level():
+                started = time.monotonic()
+                queries = level_queries(
+                    walk.next_level(), DATADOG_APM_OPERATION, DATADOG_MAX_SERVICES_PER_QUERY,
+                    from_time, to_time, baseline_windows, period,
+                )
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, fetch_group, comparable_query(query, from_time, to_time), start, end
+                    )
+                    for _, _, query, start, end, _ in queries
+                ]
+                responses = [future.result() for future in futures]
+                walk.record(level_health(queries, responses, threshold), (time.monotonic() - started) * 1000)
+        return _walk_result(walk)
+    except Exception as e:
+        return {"status": "error", "message": f"Error walking service dependencies: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def analyze_service_with_apm_async(
+    service_name: str = Field(..., description="The name of the service to analyze"),
+    from_time: Optional[int] = Field(None, description="Start time in epoch seconds. Defaults to 2 hours ago if not provided"),
+    to_time: Optional[int] = Field(None, description="End time in epoch seconds. Defaults to current time if not provided"),
+    max_spans: int = Field(default=50, ge=1, le=1000, description="Sample spans to include"),
+    deadline: float = Field(default=DATADOG_ANALYSIS_DEADLINE, gt=0, le=300, description="Seconds to wait for the sub-queries before returning what has finished")
+) -> Dict[str, Any]:
+    """Perform root cause analysis for a service: APM latency, errors and sample spans, plus its monitors and recent incidents, queried concurrently."""
+    try:
+        started = time.monotonic()
+        from_time, to_time = _window(from_time, to_time)
+        sections = _section_kwargs(service_name, from_time, to_time, max_spans)
+        tasks = {name: asyncio.ensure_future(SECTION_TOOLS[name][1](**kwargs)) for name, kwargs in sections.items()}
+        _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+        results = {name: None if task in pending else task.result() for name, task in tasks.items()}
+        return _analysis_result(service_name, from_time, to_time, deadline, started, results)
     except Exception as e:
         return {
             "status": "error",
             "message": f"Unexpected error during root cause analysis with APM: {str(e)}"
         }
+
+async def find_downstream_root_cause_async(
+    service_name: str = Field(..., description="The service showing the problem"),
+    from_time: Optional[int] = Field(None, description="Start time in epoch seconds. Defaults to 2 hours ago if not provided"),
+    to_time: Optional[int] = Field(None, description="End time in epoch seconds. Defaults to current time if not provided"),
+    max_depth: int = Field(default=3, ge=1, le=10, description="Hops to walk downstream"),
+    baseline_windows: int = Field(default=2, ge=1, le=7, description="Earlier equivalent windows each service is compared with"),
+    period: int = Field(default=86400, ge=60, description="Seconds between equivalent windows (86400 = same time on previous days)"),
+    threshold: float = Field(default=3.0, gt=0, description="Mean z-score above which a service counts as anomalous"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
+) -> Dict[str, Any]:
+    """Walk the service's downstream dependencies level by level, comparing p99 latency and error rate with earlier windows, and rank the anomalous services by how likely they are to be the origin."""
+    try:
+        from_time, to_time = _window(from_time, to_time)
+        if _recent(to_time):
+            graph = (await warm_graph_async(env)).downstream_map()
+        else:
+            async with async_datadog_api(SERVICE_DEPENDENCIES_API) as service_dependencies_api:
+                graph = downstream_graph(await service_dependencies_api.list_service_dependencies(env, start=from_time, end=to_time))
+        walk = DependencyWalk(graph, service_name, max_depth, threshold, MAX_LEVEL_SERVICES)
+        if walk.service not in walk.graph:
+            return _walk_result(walk)
+        semaphore = asyncio.Semaphore(DATADOG_BATCH_CONCURRENCY)
+        while walk.next_level():
+            started = time.monotonic()
+            queries = level_queries(
+                walk.next_level(), DATADOG_APM_OPERATION, DATADOG_MAX_SERVICES_PER_QUERY,
+                from_time, to_time, baseline_windows, period,
+            )
+            responses = await asyncio.gather(
+                *(
+                    fetch_group_async(semaphore, comparable_query(query, from_time, to_time), start, end)
+                    for _, _, query, start, end, _ in queries
+                )
+            )
+            walk.record(level_health(queries, responses, threshold), (time.monotonic() - started) * 1000)
+        return _walk_result(walk)
+    except Exception as e:
+        return {"status": "error", "message": f"Error walking service dependencies: {e}"}
@@ -1,13 +1,9 @@
 from typing import List, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.service_checks_api import ServiceChecksApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
 
-mcp = FastMCP("Datadog Service Checks Service")
+SERVICE_CHECKS_API = "datadog_api_client.v1.api.service_checks_api.ServiceChecksApi"
 
-@mcp.tool()
 def submit_service_check(
     check_name: str = Field(..., description="The name of the service check"),
     host_name: str = Field(..., description="The name of the host"),
@@ -17,21 +13,27 @@ def submit_service_check(
 ) -> Dict[str, Any]:
     """Submit a service check."""
     try:
-        with ApiClient(configuration) as api_client:
-            service_checks_api = ServiceChecksApi(api_client)
+        with datadog_api(SERVICE_CHECKS_API) as service_checks_api:
             body = [{"check": check_name, "host_name": host_name, "status": status, "message": message, "tags": tags}]
             service_checks_api.submit_service_check(body=body)
             return {"status": "success", "message": "Service check submitted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error submitting service check: {e}"}
 
-@mcp.tool()
-def list_service_checks() -> Dict[str, Any]:
-    """List all available service checks."""
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def submit_service_check_async(
+    check_name: str = Field(..., description="The name of the service check"),
+    host_name: str = Field(..., description="The name of the host"),
+    status: int = Field(..., description="The status of the service check (e.g., 0 for OK, 1 for WARNING, etc.)"),
+    message: str = Field(default="", description="A message describing the service check status"),
+    tags: List[str] = Field(default_factory=list, description="Tags to associate with the service check")
+) -> Dict[str, Any]:
+    """Submit a service check."""
     try:
-        with ApiClient(configuration) as api_client:
-            service_checks_api = ServiceChecksApi(api_client)
-            response = service_checks_api.list_service_checks()
-            return {"status": "success", "message": "Service checks listed successfully", "content": response.to_dict()}
+        async with async_datadog_api(SERVICE_CHECKS_API) as service_checks_api:
+            body = [{"check": check_name, "host_name": host_name, "status": status, "message": message, "tags": tags}]
+            await service_checks_api.submit_service_check(body=body)
+            return {"status": "success", "message": "Service check submitted successfully"}
     except Exception as e:
-        return {"status": "error", "message": f"Error listing service checks: {e}"}
+        return {"status": "error", "message": f"Error submitting service check: {e}"}
@@ -1,68 +1,214 @@
+import threading
 from typing import Optional, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v2.api.service_dependencies_api import ServiceDependenciesApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from datadog_api_client.api_client import Endpoint as _Endpoint
+from .client import datadog_api, async_datadog_api, call_raw
+from .query_planner import canonical_service
+from .service_graph import ServiceGraph, DOWNSTREAM, UPSTREAM
+from config import DATADOG_APM_ENV, DATADOG_SERVICE_GRAPH_LOOKBACK, DATADOG_SERVICE_GRAPH_REFRESH
 from datadog_api_client.exceptions import (
     ApiException
 )
 
-mcp = FastMCP("Datadog Service Dependencies Service")
 
-@mcp.tool()
+class ServiceDependenciesApi:
+    """APM service dependency map (/api/v1/service_dependencies), which datadog_api_client does not wrap.
+
+    Built on the client's generated Endpoint, so requests get the usual auth, coalescing and rate
+    limiting; methods return the parsed JSON (coroutines when the client is async).
+    """
+
+    def __init__(self, api_client):
+        self.api_client = api_client
+        self._list_service_dependencies_endpoint = _Endpoint(
+            settings={
+                "response_type": (dict,),
+                "auth": ["apiKeyAuth", "appKeyAuth"],
+                "endpoint_path": "/api/v1/service_dependencies",
+                "operation_id": "list_service_dependencies",
+                "http_method": "GET",
+                "version": "v1",
+            },
+            params_map={
+                "env": {"required": True, "openapi_types": (str,), "attribute": "env", "location": "query"},
+                "start": {"openapi_types": (int,), "attribute": "start", "location": "query"},
+                "end": {"openapi_types": (int,), "attribute": "end", "location": "query"},
+            },
+            headers_map={"accept": ["application/json"]},
+            api_client=api_client,
+        )
+
+    def list_service_dependencies(self, env, **kwargs):
+        """{service: {"calls": [downstream services]}} for every service in `env`; optional `start`/`end` epoch seconds."""
+        return call_raw(self._list_service_dependencies_endpoint, env=env, **kwargs)
+
+
+SERVICE_DEPENDENCIES_API = ServiceDependenciesApi
+
+
+def downstream_graph(dependencies):
+    """{service: sorted downstream services} from a list_service_dependencies response."""
+    return {
+        service: sorted({call for call in (entry or {}).get("calls") or [] if call != service})
+        for service, entry in dependencies.items()
+    }
+
+
+# One cached dependency graph per APM environment
+service_graphs = {}
+_service_graphs_lock = threading.Lock()
+
+
+def service_graph(env):
+    with _service_graphs_lock:
+        graph = service_graphs.get(env)
+        if graph is None:
+            graph = service_graphs[env] = ServiceGraph(DATADOG_SERVICE_GRAPH_REFRESH, DATADOG_SERVICE_GRAPH_LOOKBACK)
+        return graph
+
+
+def warm_graph(env):
+    """The cached graph for `env`, built on first use; stale graphs refresh in the background."""
+    def fetch(start, end):
+        with datadog_api(SERVICE_DEPENDENCIES_API) as service_dependencies_api:
+            return service_dependencies_api.list_service_dependencies(env, start=start, end=end)
+
+    graph = service_graph(env)
+    graph.ensure_fresh(fetch)
+    return graph
+
+
+async def warm_graph_async(env):
+    async def fetch(start, end):
+        async with async_datadog_api(SERVICE_DEPENDENCIES_API) as service_dependencies_api:
+            return await service_dependencies_api.list_service_dependencies(env, start=start, end=end)
+
+    graph = service_graph(env)
+    await graph.ensure_fresh_async(fetch)
+    return graph
+
+
+def _graph_meta(graph, service_name):
+    return {"graph_version": graph.version, "service_version": graph.versions.get(canonical_service(service_name)), "graph_age_seconds": graph.snapshot()["age_seconds"]}
+
+
+def _neighbors_result(graph, service_name, direction, depth):
+    if service_name not in graph:
+        return {"status": "error", "message": f"Service '{service_name}' is not in the dependency map"}
+    hops = graph.neighbors(service_name, direction, depth)
+    return {
+        "status": "success",
+        "message": f"{len(hops)} {direction} services within {depth} hops",
+        "content": {
+            "service": service_name,
+            direction: [{"service": s, "hops": h} for s, h in sorted(hops.items(), key=lambda item: (item[1], item[0]))],
+            **_graph_meta(graph, service_name),
+        },
+    }
+
+
+def _blast_radius_result(graph, service_name, max_depth):
+    """Every service that calls `service_name` directly or indirectly, and the entry points among them."""
+    if service_name not in graph:
+        return {"status": "error", "message": f"Service '{service_name}' is not in the dependency map"}
+    hops = graph.neighbors(service_name, UPSTREAM, max_depth)
+    by_depth = {}
+    for service, h in hops.items():
+        by_depth.setdefault(h, []).append(service)
+    return {
+        "status": "success",
+        "message": f"{len(hops)} services depend on {service_name}",
+        "content": {
+            "service": service_name,
+            "affected_services": len(hops),
+            "by_depth": {str(h): sorted(services) for h, services in sorted(by_depth.items())},
+            # Callers nothing else calls: where users would notice the failure
+            "entry_points": sorted(s for s in hops if not graph.edges(s, UPSTREAM)),
+            **_graph_meta(graph, service_name),
+        },
+    }
+
+
 def list_service_dependencies(
-    service_id: str = Field(..., description="The ID of the service to retrieve dependencies for")
+    service_id: str = Field(..., description="The ID of the service to retrieve dependencies for"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment the dependencies are observed in")
 ) -> Dict[str, Any]:
-    """List all dependencies for a specific service."""
+    """List the services a service calls and is called by."""
     try:
-        with ApiClient(configuration) as api_client:
-            service_dependencies_api = ServiceDependenciesApi(api_client)
-            response = service_dependencies_api.list_service_dependencies(service_id)
-            return {"status": "success", "message": "Service dependencies retrieved successfully", "content": response.to_dict()}
+        graph = warm_graph(env)
+        if service_id not in graph:
+            return {"status": "error", "message": f"Service '{service_id}' is not in the dependency map"}
+        content = {"name": service_id, "calls": graph.edges(service_id, DOWNSTREAM), "called_by": graph.edges(service_id, UPSTREAM)}
+        return {"status": "success", "message": "Service dependencies retrieved successfully", "content": content}
     except ApiException as e:
         return {"status": "error", "message": f"API error while retrieving service dependencies: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while retrieving service dependencies: {e}"}
 
-@mcp.tool()
-def create_service_dependency(
-    service_id: str = Field(..., description="The ID of the service to add a dependency to"),
-    dependent_service_id: str = Field(..., description="The ID of the dependent service"),
-    relationship_type: str = Field(..., description="The type of relationship (e.g., 'uses', 'depends_on')")
+def get_downstream_services(
+    service_name: str = Field(..., description="The service whose dependencies to list"),
+    depth: int = Field(default=1, ge=1, le=20, description="Hops to follow (1 = services it calls directly)"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
 ) -> Dict[str, Any]:
-    """Create a new service dependency."""
+    """List the services a service calls, directly or within `depth` hops, from the cached dependency graph."""
     try:
-        with ApiClient(configuration) as api_client:
-            service_dependencies_api = ServiceDependenciesApi(api_client)
-            body = {
-                "data": {
-                    "type": "service_dependency",
-                    "attributes": {
-                        "dependent_service_id": dependent_service_id,
-                        "relationship_type": relationship_type,
-                    },
-                }
-            }
-            response = service_dependencies_api.create_service_dependency(service_id, body=body)
-            return {"status": "success", "message": "Service dependency created successfully", "content": response.to_dict()}
-    except ApiException as e:
-        return {"status": "error", "message": f"API error while creating service dependency: {e}"}
+        return _neighbors_result(warm_graph(env), service_name, DOWNSTREAM, depth)
     except Exception as e:
-        return {"status": "error", "message": f"Unexpected error while creating service dependency: {e}"}
+        return {"status": "error", "message": f"Error reading the service graph: {e}"}
 
-@mcp.tool()
-def delete_service_dependency(
-    service_id: str = Field(..., description="The ID of the service to delete a dependency from"),
-    dependency_id: str = Field(..., description="The ID of the dependency to delete")
+def get_upstream_services(
+    service_name: str = Field(..., description="The service whose callers to list"),
+    depth: int = Field(default=1, ge=1, le=20, description="Hops to follow (1 = services calling it directly)"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
 ) -> Dict[str, Any]:
-    """Delete a specific service dependency."""
+    """List the services that call a service, directly or within `depth` hops, from the cached dependency graph."""
     try:
-        with ApiClient(configuration) as api_client:
-            service_dependencies_api = ServiceDependenciesApi(api_client)
-            service_dependencies_api.delete_service_dependency(service_id, dependency_id)
-            return {"status": "success", "message": "Service dependency deleted successfully"}
-    except ApiException as e:
-        return {"status": "error", "message": f"API error while deleting service dependency: {e}"}
+        return _neighbors_result(warm_graph(env), service_name, UPSTREAM, depth)
+    except Exception as e:
+        return {"status": "error", "message": f"Error reading the service graph: {e}"}
+
+def get_blast_radius(
+    service_name: str = Field(..., description="The service that is failing"),
+    max_depth: int = Field(default=10, ge=1, le=50, description="Hops of callers to follow"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
+) -> Dict[str, Any]:
+    """Services affected if a service fails: all its direct and indirect callers by distance, and the entry points among them."""
+    try:
+        return _blast_radius_result(warm_graph(env), service_name, max_depth)
+    except Exception as e:
+        return {"status": "error", "message": f"Error reading the service graph: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def get_downstream_services_async(
+    service_name: str = Field(..., description="The service whose dependencies to list"),
+    depth: int = Field(default=1, ge=1, le=20, description="Hops to follow (1 = services it calls directly)"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
+) -> Dict[str, Any]:
+    """List the services a service calls, directly or within `depth` hops, from the cached dependency graph."""
+    try:
+        return _neighbors_result(await warm_graph_async(env), service_name, DOWNSTREAM, depth)
+    except Exception as e:
+        return {"status": "error", "message": f"Error reading the service graph: {e}"}
+
+async def get_upstream_services_async(
+    service_name: str = Field(..., description="The service whose callers to list"),
+    depth: int = Field(default=1, ge=1, le=20, description="Hops to follow (1 = services calling it directly)"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
+) -> Dict[str, Any]:
+    """List the services that call a service, directly or within `depth` hops, from the cached dependency graph."""
+    try:
+        return _neighbors_result(await warm_graph_async(env), service_name, UPSTREAM, depth)
+    except Exception as e:
+        return {"status": "error", "message": f"Error reading the service graph: {e}"}
+
+async def get_blast_radius_async(
+    service_name: str = Field(..., description="The service that is failing"),
+    max_depth: int = Field(default=10, ge=1, le=50, description="Hops of callers to follow"),
+    env: str = Field(default=DATADOG_APM_ENV, description="APM environment of the dependency map")
+) -> Dict[str, Any]:
+    """Services affected if a service fails: all its direct and indirect callers by distance, and the entry points among them."""
+    try:
+        return _blast_radius_result(await warm_graph_async(env), service_name, max_depth)
     except Exception as e:
-        return {"status": "error", "message": f"Unexpected error while deleting service dependency: {e}"}
+        return {"status": "error", "message": f"Error reading the service graph: {e}"}
@@ -0,0 +1,188 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+
+from .query_planner import canonical_service
+
+DOWNSTREAM, UPSTREAM = "downstream", "upstream"
+
+
+class ServiceGraph:
+    """In-memory APM service dependency graph with adjacency sets in both directions.
+
+    Refreshes only ask Datadog for dependencies observed since the previous refresh and merge
+    them in; edges (and services) not observed for `lookback` seconds are dropped. Each change
+    bumps `version`, and `versions[service]` records the version its edges last changed at, so
+    callers can tell whether an answer they hold is still current.
+
+    Once built, queries never wait on the network: a stale graph is refreshed in the background
+    (a thread, or a task on the running loop) while the current one keeps answering.
+    """
+
+    def __init__(self, refresh_seconds=300, lookback=86400):
+        self.refresh_seconds = refresh_seconds
+        self.lookback = lookback
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._edge_seen = {}  # (caller, callee) -> epoch seconds it was last observed
+        self._service_seen = {}  # service -> epoch seconds it was last observed
+        self._adjacency = {DOWNSTREAM: defaultdict(set), UPSTREAM: defaultdict(set)}
+        self._task = None
+        self.version = 0
+        self.versions = {}
+        self.refreshed_at = 0.0
+        self.refreshes = 0
+        self.last_changes = {"added": 0, "removed": 0}
+
+    def is_stale(self, now=None):
+        now = time.time() if now is None else now
+        return now - self.refreshed_at >= self.refresh_seconds
+
+    def refresh_window(self, now=None):
+        """(start, end) for the next dependency fetch: the full lookback the first time, then since the last refresh."""
+        now = int(time.time() if now is None else now)
+        if not self.refreshed_at:
+            return now - self.lookback, now
+        return int(max(self.refreshed_at, now - self.lookback)) - 60, now
+
+    def refresh(self, fetch):
+        """Refresh from `fetch(start, end) -> {service: {"calls": [...]}}` if stale; concurrent callers skip."""
+        if not self.is_stale() or not self._refresh_lock.acquire(blocking=not self.refreshed_at):
+            return
+        try:
+            if self.is_stale():
+                now = time.time()
+                self.update(fetch(*self.refresh_window(now)), now)
+        finally:
+            self._refresh_lock.release()
+
+    async def refresh_async(self, fetch):
+        """refresh() for a coroutine `fetch`."""
+        if not self.is_stale():
+            return
+        while not self._refresh_lock.acquire(blocking=False):
+            if self.refreshed_at:
+                return
+            await asyncio.sleep(0.01)
+        try:
+            if self.is_stale():
+                now = time.time()
+                self.update(await fetch(*self.refresh_window(now)), now)
+        finally:
+            self._refresh_lock.release()
+
+    def ensure_fresh(self, fetch):
+        """Build the graph on first use; afterwards refresh stale graphs in a background thread."""
+        if not self.refreshed_at:
+            self.refresh(fetch)
+        elif self.is_stale() and not self._refresh_lock.locked():
+            threading.Thread(target=contextvars.copy_context().run, args=(self._refresh_quietly, fetch), daemon=True).start()
+
+    async def ensure_fresh_async(self, fetch):
+        """ensure_fresh() for a coroutine `fetch`, refreshing in a task on the running loop."""
+        if not self.refreshed_at:
+            await self.refresh_async(fetch)
+        elif self.is_stale() and not self._refresh_lock.locked() and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._refresh_quietly_async(fetch))
+
+    def _refresh_quietly(self, fetch):
+        # A failed background refresh keeps the current graph; the next query retries
+        try:
+            self.refresh(fetch)
+        except Exception:
+            pass
+
+    async def _refresh_quietly_async(self, fetch):
+        try:
+            await self.refresh_async(fetch)
+        except Exception:
+            pass
+
+    def update(self, dependencies, now=None):
+        """Merge observed dependencies and drop edges and services not observed within the lookback."""
+        now = time.time() if now is None else now
+        with self._lock:
+            added = []
+            for service, entry in dependencies.items():
+                caller = canonical_service(service)
+                self._service_seen[caller] = now
+                for callee in (entry or {}).get("calls") or []:
+                    callee = canonical_service(callee)
+                    if callee == caller:
+                        continue
+                    self._service_seen[callee] = now
+                    if (caller, callee) not in self._edge_seen:
+                        added.append((caller, callee))
+                    self._edge_seen[(caller, callee)] = now
+            cutoff = now - self.lookback
+            removed = [edge for edge, seen in self._edge_seen.items() if seen < cutoff]
+            for edge in removed:
+                del self._edge_seen[edge]
+            expired = [service for service, seen in self._service_seen.items() if seen < cutoff]
+            for service in expired:
+                del self._service_seen[service]
+            if added or removed or expired:
+                self.version += 1
+                self._apply(added, removed, expired)
+            self.refreshed_at = now
+            self.refreshes += 1
+            self.last_changes = {"added": len(added), "removed": len(removed)}
+
+    def _apply(self, added, removed, expired):
+        downstream, upstream = self._adjacency[DOWNSTREAM], self._adjacency[UPSTREAM]
+        for caller, callee in added:
+            downstream[caller].add(callee)
+            upstream[callee].add(caller)
+        for caller, callee in removed:
+            downstream[caller].discard(callee)
+            upstream[callee].discard(caller)
+        for caller, callee in added + removed:
+            self.versions[caller] = self.versions[callee] = self.version
+        for service in expired:
+            self.versions.pop(service, None)
+            downstream.pop(service, None)
+            upstream.pop(service, None)
+
+    def __contains__(self, service):
+        return canonical_service(service) in self._service_seen
+
+    def neighbors(self, service, direction, depth=1):
+        """{service: hops} for services reachable in `direction` within `depth` hops (breadth-first)."""
+        adjacency = self._adjacency[direction]
+        start = canonical_service(service)
+        hops = {start: 0}
+        queue = deque([start])
+        with self._lock:
+            while queue:
+                current = queue.popleft()
+                if hops[current] >= depth:
+                    continue
+                for other in adjacency.get(current, ()):
+                    if other not in hops:
+                        hops[other] = hops[current] + 1
+                        queue.append(other)
+        del hops[start]
+        return hops
+
+    def downstream_map(self):
+        """{service: sorted downstream services} for every known service."""
+        with self._lock:
+            downstream = self._adjacency[DOWNSTREAM]
+            return {service: sorted(downstream.get(service, ())) for service in self._service_seen}
+
+    def edges(self, service, direction):
+        with self._lock:
+            return sorted(self._adjacency[direction].get(canonical_service(service), ()))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "services": len(self._service_seen),
+                "edges": len(self._edge_seen),
+                "version": self.version,
+                "refreshes": self.refreshes,
+                "last_changes": self.last_changes,
+                "age_seconds": round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            }
@@ -0,0 +1,288 @@
+import json
+from .client import call_raw
+from .sketch import DDSketch, HyperLogLog
+
+# Datadog caps span search pages at 1000 spans
+SPAN_PAGE_LIMIT = 1000
+
+
+def search_body(query, from_time, to_time, sort=None, limit=SPAN_PAGE_LIMIT, cursor=None):
+    """SpansApi.list_spans request body for one page."""
+    page = {"limit": limit}
+    if cursor:
+        page["cursor"] = cursor
+    attributes = {"filter": {"query": query, "from": str(from_time), "to": str(to_time)}, "page": page}
+    if sort:
+        attributes["sort"] = sort
+    return {"data": {"attributes": attributes, "type": "search_request"}}
+
+
+def _after(response):
+    return ((response.get("meta") or {}).get("page") or {}).get("after")
+
+
+def span_size(span):
+    return len(json.dumps(span, default=str))
+
+
+class SpanStream:
+    """Spans matching a search, fetched page by page by following `meta.page.after`.
+
+    Iterate it to get span dicts one page at a time; only the current page is held in memory.
+    Pages are fetched as plain JSON: deserializing thousands of spans into models costs more
+    than the request itself.
+    Iteration stops early once `max_spans` spans or `max_bytes` of serialized spans have been
+    yielded. Afterwards `truncated` names the budget that stopped it (None if the search was
+    exhausted) and `cursor` is where a follow-up search would resume.
+    """
+
+    def __init__(self, spans_api, query, from_time, to_time, sort=None, max_spans=None, max_bytes=None, cursor=None):
+        self.spans_api = spans_api
+        self.query = query
+        self.from_time = from_time
+        self.to_time = to_time
+        self.sort = sort
+        self.max_spans = max_spans
+        self.max_bytes = max_bytes
+        self.cursor = cursor
+        self.pages = 0
+        self.spans = 0
+        self.bytes = 0
+        self.truncated = None
+        self._page_cursor = cursor
+
+    def _page_limit(self):
+        limit = SPAN_PAGE_LIMIT
+        if self.max_spans is not None:
+            limit = min(limit, self.max_spans - self.spans)
+        if self.max_bytes is not None and self.spans:
+            # Size pages to the remaining byte budget so it rarely runs out mid-page
+            limit = min(limit, int((self.max_bytes - self.bytes) / (self.bytes / self.spans)) + 1)
+        return max(1, limit)
+
+    def _body(self):
+        return search_body(self.query, self.from_time, self.to_time, self.sort, self._page_limit(), self.cursor)
+
+    def _fetch(self):
+        return call_raw(self.spans_api._list_spans_endpoint, body=self._body())
+
+    def _take(self, response):
+        """Yield the page's spans that fit the budgets."""
+        self.pages += 1
+        data = response.get("data") or []
+        self.cursor = _after(response)
+        for i, span in enumerate(data):
+            size = span_size(span) if self.max_bytes is not None else 0
+            if self.max_bytes is not None and self.bytes + size > self.max_bytes and self.spans:
+                self.truncated = "max_bytes"
+                # The API has no per-span cursor, so resuming repeats this page's spans already yielded
+                self.cursor = self._page_cursor
+                return
+            self.bytes += size
+            self.spans += 1
+            yield span
+            if self.max_spans is not None and self.spans >= self.max_spans:
+                if i + 1 < len(data) or self.cursor:
+                    self.truncated = "max_spans"
+                return
+
+    def __iter__(self):
+        while True:
+            self._page_cursor = self.cursor
+            response = self._fetch()
+            yield from self._take(response)
+            if self.truncated or not self.cursor or not response.get("data"):
+                return
+
+    async def __aiter__(self):
+        while True:
+            self._page_cursor = self.cursor
+            response = await self._fetch()
+            for span in self._take(response):
+                yield span
+            if self.truncated or not self.cursor or not response.get("data"):
+                return
+
+    def describe(self, message):
+        """`message` plus how many spans and pages were read, and how to resume if a budget stopped the stream."""
+        read = f"{self.spans} spans from {self.pages} pages"
+        if not self.truncated:
+            return f"{message} ({read})"
+        if not self.cursor:
+            return f"{message} ({read}, stopped at {self.truncated}; narrow the time range or raise the budget for more)"
+        return f"{message} ({read}, stopped at {self.truncated}; resume with cursor={self.cursor})"
+
+    def meta(self):
+        return {
+            "pages": self.pages,
+            "spans": self.spans,
+            "bytes": self.bytes,
+            "truncated": self.truncated,
+            "next_cursor": self.cursor if self.truncated else None,
+        }
+
+
+# Computes for the span duration, as (name, aggregation); @duration is reported in nanoseconds
+LATENCY_COMPUTES = (("count", "count"), ("avg", "avg"), ("p50", "median"), ("p95", "pc95"), ("p99", "pc99"), ("max", "max"))
+
+
+def aggregate_body(query, from_time, to_time, computes, group_by=None, limit=10, sort="count"):
+    """SpansApi.aggregate_spans request body.
+
+    `computes` is a sequence of (name, aggregation); everything but count is computed on @duration.
+    Buckets are grouped by the `group_by` facets, keeping the top `limit` by the `sort` aggregation.
+    """
+    attributes = {
+        "filter": {"query": query, "from": str(from_time), "to": str(to_time)},
+        "compute": [_compute(aggregation) for _, aggregation in computes],
+    }
+    if group_by:
+        order = {"aggregation": sort, "order": "desc"}
+        if sort != "count":
+            order.update(metric="@duration", type="measure")
+        attributes["group_by"] = [{"facet": facet, "limit": limit, "sort": order} for facet in group_by]
+    return {"data": {"attributes": attributes, "type": "aggregate_request"}}
+
+
+def _compute(aggregation):
+    if aggregation == "count":
+        return {"aggregation": "count", "type": "total"}
+    return {"aggregation": aggregation, "metric": "@duration", "type": "total"}
+
+
+def aggregate_rows(response, computes):
+    """aggregate_spans buckets as flat rows: the group-by facet values plus each named compute (durations in ms)."""
+    rows = []
+    for bucket in response.get("data") or []:
+        attributes = bucket.get("attributes") or {}
+        values = attributes.get("computes") or attributes.get("compute") or {}
+        row = dict(attributes.get("by") or {})
+        for i, (name, aggregation) in enumerate(computes):
+            value = values.get(f"c{i}")
+            if isinstance(value, (int, float)) and aggregation != "count":
+                value = round(value / 1e6, 3)
+            row[name] = value
+        rows.append(row)
+    return rows
+
+
+def aggregate_spans(spans_api, body):
+    """Run an aggregate_spans request, returning the parsed JSON (a coroutine for async clients)."""
+    return call_raw(spans_api._aggregate_spans_endpoint, body=body)
+
+
+# Distinct (service, resource) groups tracked before the rest are folded into OTHER_RESOURCE
+MAX_GROUPS = 1000
+OTHER_RESOURCE = "(other)"
+# Resources listed in a summary, busiest first
+TOP_RESOURCES = 20
+QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99))
+
+
+def _duration_ms(attributes):
+    # Span search reports @duration in nanoseconds
+    duration = (attributes.get("custom") or {}).get("duration")
+    return duration / 1e6 if isinstance(duration, (int, float)) else None
+
+
+class _Group:
+    __slots__ = ("count", "errors", "durations")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.durations = DDSketch()
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.durations.merge(other.durations)
+        return self
+
+    def stats(self):
+        stats = {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.count, 4) if self.count else 0.0,
+        }
+        if self.durations.count:
+            stats.update({name: round(self.durations.quantile(q), 3) for name, q in QUANTILES})
+            stats["mean"] = round(self.durations.mean(), 3)
+            stats["max"] = round(self.durations.max, 3)
+        return stats
+
+
+class SpanSummary:
+    """Streaming span aggregation in bounded memory; feed it spans with add().
+
+    Keeps count, errors and a DDSketch of durations (ms, 1% relative accuracy) per
+    (service, resource), and approximate distinct traces in a HyperLogLog. Groups past
+    MAX_GROUPS are folded into an "(other)" resource per service. Sketches are merged for
+    the per-service and overall percentiles, and summaries of separate streams can be merged too.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.traces = HyperLogLog()
+        self.span_count = 0
+        self.folded = 0
+
+    def add(self, span):
+        attributes = span.get("attributes") or {}
+        self.span_count += 1
+        trace_id = attributes.get("trace_id")
+        if trace_id is not None:
+            self.traces.add(trace_id)
+        service = attributes.get("service") or "unknown"
+        key = (service, attributes.get("resource_name") or "unknown")
+        group = self.groups.get(key)
+        if group is None:
+            if len(self.groups) >= MAX_GROUPS:
+                self.folded += 1
+                key = (service, OTHER_RESOURCE)
+                group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = _Group()
+        group.count += 1
+        if (attributes.get("custom") or {}).get("error"):
+            group.errors += 1
+        duration = _duration_ms(attributes)
+        if duration is not None:
+            group.durations.add(duration)
+
+    def merge(self, other):
+        for key, group in other.groups.items():
+            if key in self.groups:
+                self.groups[key].merge(group)
+            else:
+                self.groups[key] = _Group().merge(group)
+        self.traces.merge(other.traces)
+        self.span_count += other.span_count
+        self.folded += other.folded
+        return self
+
+    @property
+    def error_count(self):
+        return sum(group.errors for group in self.groups.values())
+
+    def result(self):
+        overall = _Group()
+        services = {}
+        for (service, _), group in self.groups.items():
+            services.setdefault(service, _Group()).merge(group)
+            overall.merge(group)
+        busiest = sorted(self.groups.items(), key=lambda item: -item[1].count)[:TOP_RESOURCES]
+        return {
+            "span_count": self.span_count,
+            "trace_count": len(self.traces) if self.span_count else 0,
+            "error_count": overall.errors,
+            "duration_ms": {k: v for k, v in overall.stats().items() if k not in ("count", "errors", "error_rate")},
+            "services": {
+                service: group.stats()
+                for service, group in sorted(services.items(), key=lambda item: -item[1].count)
+            },
+            "top_resources": [
+                {"service": service, "resource": resource, **group.stats()} for (service, resource), group in busiest
+            ],
+            "folded_spans": self.folded,
+        }
@@ -0,0 +1,227 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+# Per-call accumulator for the Datadog HTTP requests made by the tool currently running
+_current_call = contextvars.ContextVar("datadog_tool_call", default=None)
+
+
+class _CallStats:
+    def __init__(self):
+        self.lock = threading.Lock()  # Batch tools report HTTP calls from worker threads
+        self.http_seconds = 0.0
+        self.http_requests = 0
+        self.http_response_bytes = 0
+        self.last_error = None
+
+
+def record_http(seconds, response_bytes=0, error=None):
+    """Attribute one Datadog HTTP round trip to the tool call in progress (no-op outside a tool call)."""
+    call = _current_call.get()
+    if call is None:
+        return
+    with call.lock:
+        call.http_seconds += seconds
+        call.http_requests += 1
+        call.http_response_bytes += response_bytes
+        if error is not None:
+            call.last_error = type(error).__name__
+
+
+def payload_size(value):
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+def is_error_result(result):
+    return isinstance(result, dict) and (result.get("status") == "error" or "error" in result)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile (max observed for the open bucket)."""
+        total = sum(self.counts)
+        if not total:
+            return 0.0
+        rank = pct / 100 * total
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        total = sum(self.counts)
+        return {
+            "avg_ms": round(self.total_ms / total, 2) if total else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p90_ms": round(self.percentile(90), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": {
+                ("+inf" if bound == float("inf") else f"le_{bound}"): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)
+            },
+        }
+
+
+class _ToolRecord:
+    def __init__(self):
+        self.calls = 0
+        self.errors = Counter()
+        self.total = _Histogram()
+        self.http = _Histogram()
+        self.local = _Histogram()
+        self.http_requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.http_response_bytes = 0
+
+    def snapshot(self):
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": sum(self.errors.values()),
+            "error_classes": dict(self.errors),
+            "latency": self.total.snapshot(),
+            "http_latency": self.http.snapshot(),
+            "local_latency": self.local.snapshot(),
+            "http_requests": self.http_requests,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "avg_response_bytes": round(self.response_bytes / calls, 1),
+            "http_response_bytes": self.http_response_bytes,
+        }
+
+
+class ToolStats:
+    """Thread-safe per-tool counters: calls, latency (total / Datadog HTTP / local), payload sizes and errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools = {}
+        self.started = time.time()
+
+    def record(self, name, seconds, call, request_bytes, response_bytes, error=None):
+        total_ms = seconds * 1000
+        http_ms = min(call.http_seconds * 1000, total_ms)
+        with self._lock:
+            record = self._tools.get(name)
+            if record is None:
+                record = self._tools[name] = _ToolRecord()
+            record.calls += 1
+            record.total.add(total_ms)
+            record.http.add(http_ms)
+            record.local.add(total_ms - http_ms)
+            record.http_requests += call.http_requests
+            record.request_bytes += request_bytes
+            record.response_bytes += response_bytes
+            record.http_response_bytes += call.http_response_bytes
+            if error is not None:
+                record.errors[error] += 1
+
+    def snapshot(self):
+        with self._lock:
+            tools = {name: record.snapshot() for name, record in sorted(self._tools.items())}
+        return {"since": self.started, "tools": tools}
+
+    def reset(self):
+        with self._lock:
+            self._tools.clear()
+            self.started = time.time()
+
+    def dump(self, path):
+        try:
+            with open(path, "w") as f:
+                json.dump(self.snapshot(), f, indent=2)
+        except OSError as e:
+            logger.warning("Could not write tool stats to %s: %s", path, e)
+
+
+tool_stats = ToolStats()
+
+
+def _finish(name, start, call, kwargs, result=None, exc=None):
+    if exc is not None:
+        error = type(exc).__name__
+    elif is_error_result(result):
+        # Tools catch their own exceptions; blame the failing Datadog request when there was one
+        error = call.last_error or "ToolError"
+    else:
+        error = None
+    tool_stats.record(
+        name,
+        time.perf_counter() - start,
+        call,
+        payload_size(kwargs),
+        payload_size(result) if exc is None else 0,
+        error,
+    )
+
+
+def instrument(tool, name=None):
+    """Wrap a sync or async tool so every call is recorded in `tool_stats` under `name`."""
+    name = name or tool.__name__
+
+    if inspect.iscoroutinefunction(tool):
+        @functools.wraps(tool)
+        async def async_wrapper(**kwargs):
+            call = _CallStats()
+            token = _current_call.set(call)
+            start = time.perf_counter()
+            try:
+                result = await tool(**kwargs)
+            except Exception as e:
+                _finish(name, start, call, kwargs, exc=e)
+                raise
+            finally:
+                _current_call.reset(token)
+            _finish(name, start, call, kwargs, result)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(tool)
+    def wrapper(**kwargs):
+        call = _CallStats()
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            result = tool(**kwargs)
+        except Exception as e:
+            _finish(name, start, call, kwargs, exc=e)
+            raise
+        finally:
+            _current_call.reset(token)
+        _finish(name, start, call, kwargs, result)
+        return result
+
+    return wrapper
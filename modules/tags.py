@@ -1,26 +1,24 @@
 from typing import Optional, Dict, Any, List
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.tags_api import TagsApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
 
-mcp = FastMCP("Datadog Tags Service")
+TAGS_API = "datadog_api_client.v1.api.tags_api.TagsApi"
+
+def _source_kwargs(source):
+    # The generated client rejects source=None, so only pass it when it is set
+    return {"source": source} if source else {}
 
-@mcp.tool()
 def list_host_tags(
     source: Optional[str] = Field(default=None, description="Source of the tags (e.g., 'chef', 'aws')")
 ) -> Dict[str, Any]:
     """List tags for all hosts."""
     try:
-        with ApiClient(configuration) as api_client:
-            tags_api = TagsApi(api_client)
-            response = tags_api.list_host_tags(source=source)
+        with datadog_api(TAGS_API) as tags_api:
+            response = tags_api.list_host_tags(**_source_kwargs(source))
             return {"status": "success", "message": "Host tags listed successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error listing host tags: {e}"}
 
-@mcp.tool()
 def add_host_tags(
     host_name: str = Field(..., description="The name of the host"),
     tags: List[str] = Field(..., description="The tags to add"),
@@ -28,23 +26,33 @@ def add_host_tags(
 ) -> Dict[str, Any]:
     """Add tags to a specific host."""
     try:
-        with ApiClient(configuration) as api_client:
-            tags_api = TagsApi(api_client)
-            tags_api.create_host_tags(host_name, body={"tags": tags}, source=source)
+        with datadog_api(TAGS_API) as tags_api:
+            tags_api.create_host_tags(host_name, body={"tags": tags}, **_source_kwargs(source))
             return {"status": "success", "message": "Tags added to host successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error adding tags to host: {e}"}
 
-@mcp.tool()
 def delete_host_tags(
     host_name: str = Field(..., description="The name of the host"),
     source: Optional[str] = Field(default=None, description="Source of the tags (e.g., 'chef', 'aws')")
 ) -> Dict[str, Any]:
     """Delete all tags from a specific host."""
     try:
-        with ApiClient(configuration) as api_client:
-            tags_api = TagsApi(api_client)
-            tags_api.delete_host_tags(host_name, source=source)
+        with datadog_api(TAGS_API) as tags_api:
+            tags_api.delete_host_tags(host_name, **_source_kwargs(source))
             return {"status": "success", "message": "Tags deleted from host successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting tags from host: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def list_host_tags_async(
+    source: Optional[str] = Field(default=None, description="Source of the tags (e.g., 'chef', 'aws')")
+) -> Dict[str, Any]:
+    """List tags for all hosts."""
+    try:
+        async with async_datadog_api(TAGS_API) as tags_api:
+            response = await tags_api.list_host_tags(**_source_kwargs(source))
+            return {"status": "success", "message": "Host tags listed successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error listing host tags: {e}"}
@@ -0,0 +1,531 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# (longest range in seconds, rollup interval Datadog picks for it), mirroring the default
+# graph resolutions so chunk boundaries fall on bucket edges
+ROLLUP_STEPS = (
+    (3600, 20),
+    (4 * 3600, 60),
+    (86400, 300),
+    (2 * 86400, 600),
+    (7 * 86400, 3600),
+    (30 * 86400, 4 * 3600),
+)
+
+_ROLLUP_RE = re.compile(r"\.rollup\(\s*\w+\s*,\s*(\d+)\s*\)")
+
+
+def rollup_interval(query, seconds):
+    """Bucket size for a query over `seconds`: its explicit .rollup(fn, N) or Datadog's default for the range."""
+    match = _ROLLUP_RE.search(query)
+    if match:
+        return int(match.group(1))
+    for max_range, interval in ROLLUP_STEPS:
+        if seconds <= max_range:
+            return interval
+    return 86400
+
+
+def plan_chunks(query, from_time, to_time, chunk_seconds, max_chunks):
+    """Split [from_time, to_time] into at most `max_chunks` windows of roughly `chunk_seconds`.
+
+    Interior boundaries are aligned to the chunk's rollup interval, so every bucket is
+    computed from a single chunk. Returns one window when the range doesn't need splitting.
+    """
+    span = to_time - from_time
+    if span <= chunk_seconds or max_chunks <= 1:
+        return [(from_time, to_time)]
+    size = max(chunk_seconds, math.ceil(span / max_chunks))
+    align = rollup_interval(query, size)
+    size = math.ceil(size / align) * align
+    boundaries = list(range((from_time // align) * align + size, to_time, size))
+    # Fold slivers at either end into their neighbour so every chunk gets a similar rollup
+    if boundaries and boundaries[0] - from_time < size // 2:
+        boundaries.pop(0)
+    if boundaries and to_time - boundaries[-1] < size // 2:
+        boundaries.pop()
+    edges = [from_time, *boundaries, to_time]
+    return list(zip(edges, edges[1:]))
+
+
+def _series_key(series):
+    return (series.get("metric"), series.get("scope"), series.get("expression"), series.get("query_index"))
+
+
+def stitch(responses, from_time, to_time):
+    """Merge query_metrics response dicts for consecutive chunks into one response.
+
+    Series are matched by metric, scope, expression and query index. Their pointlists are
+    concatenated in time order. `responses` must be in chunk order: adjacent chunks share their
+    boundary timestamp, and the bucket starting there lies in the later chunk, so the later
+    non-null value wins.
+    """
+    if not responses:
+        return {}
+    merged = {}
+    order = []
+    for response in responses:
+        for series in response.get("series") or []:
+            key = _series_key(series)
+            if key not in merged:
+                merged[key] = {**series, "pointlist": {}}
+                order.append(key)
+            target = merged[key]
+            points = target["pointlist"]
+            for point in series.get("pointlist") or []:
+                ts, value = point[0], point[1]
+                if value is not None or ts not in points:
+                    points[ts] = value
+            if series.get("interval") is not None:
+                target["interval"] = min(target.get("interval") or series["interval"], series["interval"])
+
+    series_list = []
+    for key in order:
+        series = merged[key]
+        pointlist = [[ts, series["pointlist"][ts]] for ts in sorted(series["pointlist"])]
+        series["pointlist"] = pointlist
+        series["length"] = len(pointlist)
+        if pointlist:
+            series["start"] = int(pointlist[0][0])
+            series["end"] = int(pointlist[-1][0])
+        series_list.append(series)
+
+    stitched = {**responses[0], "series": series_list}
+    stitched["from_date"] = from_time * 1000
+    stitched["to_date"] = to_time * 1000
+    return stitched
+
+
+# Segment cache for sliding-window polling
+
+_SIMPLE_QUERY_RE = re.compile(
+    r"^\s*\w+:[\w.]+\{[^{}]*\}(\s*by\s*\{[^{}]*\})?(\.as_(count|rate)\(\))?(\.rollup\([^()]*\))?\s*$"
+)
+
+
+def segment_query(query, interval):
+    """The query with an explicit rollup, so fetches of any length return the same buckets.
+
+    Returns None for queries the segment cache can't handle: formulas, multiple queries and
+    rollups without an interval. Without an explicit rollup, .as_count() queries roll up with
+    sum and everything else with avg, matching Datadog's defaults.
+    """
+    if not _SIMPLE_QUERY_RE.match(query):
+        return None
+    query = " ".join(query.split())
+    if ".rollup(" in query:
+        return query if _ROLLUP_RE.search(query) else None
+    method = "sum" if ".as_count()" in query else "avg"
+    return f"{query}.rollup({method}, {interval})"
+
+
+class _Segment:
+    def __init__(self, interval):
+        self.interval = interval
+        self.template = {}
+        self.series = {}  # series key -> (series metadata, {timestamp ms: value})
+        self.start = 0
+        self.settled_end = 0
+
+
+class SegmentCache:
+    """Points already fetched per (rolled-up) query, so polling a sliding window only downloads the new tail.
+
+    Buckets newer than `settle_seconds` may still change and are fetched again on the next poll.
+    """
+
+    def __init__(self, settle_seconds=120, max_entries=256):
+        self.settle_seconds = settle_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def window(self, key, interval, from_time, to_time):
+        """(start, end) that still has to be downloaded for [from_time, to_time], or None if it is all cached."""
+        with self._lock:
+            self.counters["requested_seconds"] += to_time - from_time
+            segment = self._entries.get(key)
+            if segment is None or segment.interval != interval or from_time < segment.start or segment.settled_end < from_time:
+                self.counters["full_fetches"] += 1
+                self.counters["fetched_seconds"] += to_time - from_time
+                return from_time, to_time
+            self._entries.move_to_end(key)
+            if segment.settled_end >= to_time:
+                self.counters["served_from_cache"] += 1
+                return None
+            start = (segment.settled_end // interval) * interval
+            self.counters["tail_fetches"] += 1
+            self.counters["fetched_seconds"] += to_time - start
+            return start, to_time
+
+    def merge(self, key, interval, response, fetched, from_time, to_time, now):
+        """Fold `response` (the data for window `fetched`, or None) into the cache and return [from_time, to_time]."""
+        with self._lock:
+            segment = self._entries.get(key)
+            if fetched is not None and (segment is None or fetched[0] <= segment.start or segment.interval != interval):
+                segment = self._entries[key] = _Segment(interval)
+                segment.start = fetched[0]
+            if response is not None:
+                fetch_from_ms = fetched[0] * 1000
+                segment.template = {k: v for k, v in response.items() if k != "series"}
+                for series in response.get("series") or []:
+                    series_key = _series_key(series)
+                    meta, points = segment.series.get(series_key, (None, {}))
+                    # Refetched (previously unsettled) buckets replace what we had
+                    for ts in [ts for ts in points if ts >= fetch_from_ms]:
+                        del points[ts]
+                    for point in series.get("pointlist") or []:
+                        points[point[0]] = point[1]
+                    segment.series[series_key] = ({k: v for k, v in series.items() if k != "pointlist"}, points)
+                settled = min(fetched[1], now - self.settle_seconds)
+                segment.settled_end = max(segment.settled_end, (settled // interval) * interval)
+            self._prune(segment, from_time - (to_time - from_time))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return self._build(segment, from_time, to_time)
+
+    def _prune(self, segment, before):
+        """Drop points older than `before` (one window back) so a long-running poll stays bounded."""
+        if before <= segment.start:
+            return
+        before_ms = before * 1000
+        for _, points in segment.series.values():
+            for ts in [ts for ts in points if ts < before_ms]:
+                del points[ts]
+        segment.start = before
+
+    def _build(self, segment, from_time, to_time):
+        from_ms, to_ms = from_time * 1000, to_time * 1000
+        series_list = []
+        for meta, points in segment.series.values():
+            pointlist = [[ts, points[ts]] for ts in sorted(points) if from_ms <= ts <= to_ms]
+            series = {**meta, "pointlist": pointlist, "length": len(pointlist)}
+            if pointlist:
+                series["start"] = int(pointlist[0][0])
+                series["end"] = int(pointlist[-1][0])
+            series_list.append(series)
+        return {**segment.template, "series": series_list, "from_date": from_ms, "to_date": to_ms}
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._entries)
+        requested = counters.get("requested_seconds", 0)
+        fetched_ratio = round(counters.get("fetched_seconds", 0) / requested, 3) if requested else 0.0
+        return {"entries": entries, **counters, "fetched_ratio": fetched_ratio}
+
+
+# Summaries (numpy is imported lazily so it does not slow down server startup)
+
+CHANGE_POINT_SCORE = 5.0  # Minimum mean-shift score, in noise standard deviations, to report a change point
+MAX_CHANGE_POINTS = 3
+
+
+def _round(value):
+    return None if value is None or value != value else float(round(float(value), 6))
+
+
+def lttb(ts, values, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns indices of the points to keep."""
+    import numpy as np
+
+    n = len(ts)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start, next_end = end, max(edges[i + 2] if i + 2 < len(edges) else n, end + 1)
+        avg_t, avg_v = ts[next_start:next_end].mean(), values[next_start:next_end].mean()
+        areas = np.abs(
+            (ts[a] - avg_t) * (values[start:end] - values[a])
+            - (ts[a] - ts[start:end]) * (avg_v - values[a])
+        )
+        a = start + int(np.argmax(areas))
+        keep[i + 1] = a
+    return keep
+
+
+def change_points(values, min_segment=5):
+    """Indices where the mean shifts, found by binary segmentation on cumulative sums.
+
+    A split is kept when |mean_left - mean_right| * sqrt(nl * nr / n) exceeds CHANGE_POINT_SCORE
+    noise standard deviations, with noise estimated from the median absolute first difference
+    so the shifts themselves don't inflate it.
+    """
+    import numpy as np
+
+    if len(values) < 2 * min_segment:
+        return []
+    sigma = np.median(np.abs(np.diff(values))) * 1.4826 / np.sqrt(2)
+    if sigma == 0:
+        sigma = np.std(values) or 1.0
+    found = []
+    segments = [(0, len(values))]
+    while segments and len(found) < MAX_CHANGE_POINTS:
+        best = None
+        for lo, hi in segments:
+            segment = values[lo:hi]
+            n = len(segment)
+            if n < 2 * min_segment:
+                continue
+            cumsum = np.cumsum(segment)
+            k = np.arange(min_segment, n - min_segment + 1)
+            left = cumsum[k - 1] / k
+            right = (cumsum[-1] - cumsum[k - 1]) / (n - k)
+            scores = np.abs(left - right) * np.sqrt(k * (n - k) / n) / sigma
+            i = int(np.argmax(scores))
+            if scores[i] >= CHANGE_POINT_SCORE and (best is None or scores[i] > best[0]):
+                best = (scores[i], lo, hi, lo + int(k[i]))
+        if best is None:
+            break
+        _, lo, hi, split = best
+        found.append(split)
+        segments.remove((lo, hi))
+        segments += [(lo, split), (split, hi)]
+    return sorted(found)
+
+
+def summarize_series(series, downsample=None):
+    """Replace a series' pointlist with summary statistics (and optionally an LTTB-downsampled pointlist)."""
+    import numpy as np
+
+    points = series.get("pointlist") or []
+    ts = np.array([p[0] for p in points], dtype=np.float64) / 1000
+    values = np.array([np.nan if p[1] is None else p[1] for p in points], dtype=np.float64)
+    valid = ~np.isnan(values)
+    ts, values = ts[valid], values[valid]
+
+    summary = {
+        key: series.get(key)
+        for key in ("metric", "display_name", "scope", "expression", "unit", "interval", "query_index")
+        if key in series
+    }
+    summary["count"] = int(len(values))
+    summary["nulls"] = int((~valid).sum())
+    if not len(values):
+        return summary
+
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    summary.update({
+        "start": int(ts[0] * 1000),
+        "end": int(ts[-1] * 1000),
+        "min": _round(values.min()),
+        "max": _round(values.max()),
+        "mean": _round(values.mean()),
+        "stddev": _round(values.std()),
+        "p50": _round(p50),
+        "p90": _round(p90),
+        "p99": _round(p99),
+        "first": _round(values[0]),
+        "last": _round(values[-1]),
+        "slope_per_hour": _round(np.polyfit(ts - ts[0], values, 1)[0] * 3600) if len(values) > 1 and ts[-1] > ts[0] else 0.0,
+    })
+    summary["change_points"] = [
+        {
+            "timestamp": int(ts[i] * 1000),
+            "mean_before": _round(values[max(0, prev):i].mean()),
+            "mean_after": _round(values[i:nxt].mean()),
+        }
+        for prev, i, nxt in _neighbours(change_points(values), len(values))
+    ]
+    if downsample:
+        keep = lttb(ts, values, int(downsample))
+        summary["pointlist"] = [[int(ts[i] * 1000), _round(values[i])] for i in keep]
+    return summary
+
+
+def _neighbours(splits, n):
+    bounds = [0, *splits, n]
+    return [(bounds[i - 1], bounds[i], bounds[i + 1]) for i in range(1, len(bounds) - 1)]
+
+
+def summarize_response(response, downsample=None):
+    """query_metrics response dict with every series summarized instead of carrying its full pointlist."""
+    return {**response, "series": [summarize_series(series, downsample) for series in response.get("series") or []]}
+
+
+# Compact columnar encoding (numpy is imported lazily, like the summaries)
+
+COMPACT_KEYS = ("metric", "scope", "tag_set", "aggr", "unit", "interval", "query_index")
+
+
+def _value_column(values, precision):
+    """Values as a JSON-ready list: rounded to `precision` decimals (ints when precision <= 0), NaN as None."""
+    import numpy as np
+
+    valid = ~np.isnan(values)
+    if precision is not None:
+        values = np.round(values, precision)
+        if precision <= 0 and valid.all():
+            return values.astype(np.int64).tolist()
+        if precision <= 0:
+            return [int(v) if ok else None for v, ok in zip(values.tolist(), valid.tolist())]
+    if valid.all():
+        return values.tolist()
+    return [v if ok else None for v, ok in zip(values.tolist(), valid.tolist())]
+
+
+def compact_series(series, precision=None):
+    """Encode a series as `start` (epoch seconds) plus a fixed `step`, or `deltas` between timestamps, and a value column."""
+    import numpy as np
+
+    points = series.get("pointlist") or []
+    ts = np.fromiter((p[0] for p in points), dtype=np.float64, count=len(points))
+    values = np.fromiter((np.nan if p[1] is None else p[1] for p in points), dtype=np.float64, count=len(points))
+    ts = np.rint(ts / 1000).astype(np.int64)
+
+    compact = {key: series[key] for key in COMPACT_KEYS if series.get(key) is not None}
+    compact["start"] = int(ts[0]) if len(ts) else None
+    steps = np.diff(ts)
+    if len(steps) and (steps == steps[0]).all():
+        compact["step"] = int(steps[0])
+    elif len(steps):
+        compact["deltas"] = steps.tolist()
+    compact["values"] = _value_column(values, precision)
+    return compact
+
+
+def compact_response(response, precision=None):
+    """query_metrics response dict with every series in the compact encoding."""
+    compact = {key: response[key] for key in ("query", "from_date", "to_date", "group_by") if key in response}
+    compact["series"] = [compact_series(series, precision) for series in response.get("series") or []]
+    return compact
+
+
+# Baseline comparison (numpy is imported lazily, like the summaries)
+
+MIN_INTERVAL_POINTS = 2  # Consecutive anomalous points needed to report an interval
+
+
+def _points(series):
+    import numpy as np
+
+    points = series.get("pointlist") or []
+    ts = np.fromiter((p[0] for p in points), dtype=np.float64, count=len(points)) / 1000
+    values = np.fromiter((np.nan if p[1] is None else p[1] for p in points), dtype=np.float64, count=len(points))
+    valid = ~np.isnan(values)
+    return ts[valid], values[valid]
+
+
+def _anomalous_intervals(ts, z, threshold, expected, values):
+    import numpy as np
+
+    flagged = np.abs(z) > threshold
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], flagged.astype(np.int8), [0]))))
+    intervals = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < MIN_INTERVAL_POINTS:
+            continue
+        peak = start + int(np.argmax(np.abs(z[start:end])))
+        intervals.append({
+            "start": int(ts[start]),
+            "end": int(ts[end - 1]),
+            "points": int(end - start),
+            "peak_z": _round(z[peak]),
+            "peak_value": _round(values[peak]),
+            "expected_value": _round(expected[peak]),
+        })
+    return intervals
+
+
+def compare_series(target, baselines, threshold=3.0):
+    """Compare a series with the same series in earlier windows.
+
+    `baselines` is a list of (series, offset_seconds) where shifting the baseline's timestamps by
+    `offset_seconds` lines them up with the target window. Baselines are interpolated onto the target
+    timestamps; each point gets a z-score against the baseline mean and standard deviation at that
+    time (floored at the deviation pooled over the window, so a few baselines that happen to agree
+    don't turn noise into anomalies).
+    """
+    import numpy as np
+
+    ts, values = _points(target)
+    result = {key: target.get(key) for key in ("metric", "scope") if key in target}
+    aligned, window_means = [], []
+    for series, offset in baselines:
+        b_ts, b_values = _points(series)
+        if len(b_values) < 2 or not len(ts):
+            continue
+        aligned.append(np.interp(ts, b_ts + offset, b_values, left=np.nan, right=np.nan))
+        window_means.append(b_values.mean())
+    result["baseline_windows"] = len(aligned)
+    if not len(values) or not aligned:
+        result["verdict"] = "no_data" if not len(values) else "no_baseline"
+        return result
+
+    stacked = np.vstack(aligned)
+    covered = ~np.isnan(stacked).all(axis=0)
+    ts, values, stacked = ts[covered], values[covered], stacked[:, covered]
+    if not len(values):
+        result["verdict"] = "no_baseline"
+        return result
+    expected = np.nanmean(stacked, axis=0)
+    counts = (~np.isnan(stacked)).sum(axis=0)
+    if len(aligned) > 1:
+        # Unbiased per-point spread, floored by the spread pooled over the whole window
+        residuals = stacked - expected
+        spread = np.sqrt(np.nansum(residuals ** 2, axis=0) / np.maximum(counts - 1, 1))
+        pooled = float(np.sqrt(np.nansum(residuals ** 2) / max(int(counts.sum()) - len(values), 1)))
+    else:
+        # One baseline: estimate noise from its point-to-point differences
+        diffs = np.diff(stacked[0][~np.isnan(stacked[0])])
+        spread = np.zeros_like(expected)
+        pooled = float(np.median(np.abs(diffs - np.median(diffs))) * 1.4826 / np.sqrt(2)) if len(diffs) else 0.0
+    floor = max(pooled, float(np.abs(expected).mean()) * 0.01, 1e-9)
+    z = (values - expected) / np.maximum(spread, floor)
+
+    target_mean, baseline_mean = float(values.mean()), float(np.mean(window_means))
+    if len(window_means) > 1:
+        # Window means of a steady metric barely move, so shifts under ~5% are treated as noise
+        window_spread = max(float(np.std(window_means, ddof=1)), abs(baseline_mean) * 0.05, 1e-9)
+        mean_z = (target_mean - baseline_mean) / window_spread
+    else:
+        mean_z = float(np.median(z))
+    intervals = _anomalous_intervals(ts, z, threshold, expected, values)
+    result.update({
+        "target_mean": _round(target_mean),
+        "baseline_mean": _round(baseline_mean),
+        "pct_delta": _round((target_mean - baseline_mean) / abs(baseline_mean) * 100) if baseline_mean else None,
+        "target_p99": _round(np.percentile(values, 99)),
+        "baseline_p99": _round(np.nanpercentile(stacked, 99)),
+        "mean_z": _round(mean_z),
+        "max_abs_z": _round(np.abs(z).max()),
+        "anomalous_points": int((np.abs(z) > threshold).sum()),
+        "anomalous_intervals": intervals,
+    })
+    result["verdict"] = "anomalous" if intervals or abs(mean_z) > threshold else "normal"
+    return result
+
+
+def _group_key(series):
+    # Windows are matched on what a series is grouped by, not its expression, which can differ
+    # between windows in how the rollup is spelled
+    return (series.get("metric"), series.get("scope") or ",".join(sorted(series.get("tag_set") or [])), series.get("query_index"))
+
+
+def compare_response(target, baselines, threshold=3.0):
+    """compare_series for every series of a query_metrics response; `baselines` is [(response, offset_seconds)]."""
+    by_key = [({_group_key(s): s for s in response.get("series") or []}, offset) for response, offset in baselines]
+    series = [
+        compare_series(s, [(b[_group_key(s)], offset) for b, offset in by_key if _group_key(s) in b], threshold)
+        for s in target.get("series") or []
+    ]
+    verdicts = {s["verdict"] for s in series}
+    verdict = next((v for v in ("anomalous", "normal", "no_baseline") if v in verdicts), "no_data")
+    return {
+        "query": target.get("query"),
+        "from_date": target.get("from_date"),
+        "to_date": target.get("to_date"),
+        "threshold": threshold,
+        "verdict": verdict,
+        "anomalous_series": sum(1 for s in series if s["verdict"] == "anomalous"),
+        "series": sorted(series, key=lambda s: -(s.get("max_abs_z") or 0)),
+    }
@@ -2,69 +2,59 @@ from typing import Optional, Dict, Any
 from pydantic import BaseModel, Field
 import json
 import time
-from datadog_api_client import ApiClient
-from datadog_api_client.v2.api.spans_api import SpansApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
+from .spans import SpanStream, SpanSummary
+from .trace_tree import TraceTree, span_row
+from config import DATADOG_SPAN_MAX_BYTES, DATADOG_SPAN_SUMMARY_MAX_SPANS
+
+SPANS_API = "datadog_api_client.v2.api.spans_api.SpansApi"
+
+def _filter_query(query, service, operation):
+    filter_query = [query]
+    if service:
+        filter_query.append(f"service:{service}")
+    if operation:
+        filter_query.append(f"operation:{operation}")
+    return " ".join(filter_query)
 
-mcp = FastMCP("Datadog Traces Service")
 
-@mcp.tool()
 def list_traces(
     query: str,
     from_time: int = Field(default_factory=lambda: int(time.time()) - 900, description="Start time in epoch seconds (default: last 15 minutes)"),
     to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
-    limit: int = Field(default=100, ge=1, le=1000, description="Maximum number of traces to return (default: 100)"),
+    limit: int = Field(default=100, ge=1, le=10000, description="Maximum number of spans to return, fetched across pages (default: 100)"),
     sort: str = Field(default="-timestamp", description="Sort order for traces, default is descending timestamp"),
     service: Optional[str] = Field(default=None, description="Filter by service name"),
-    operation: Optional[str] = Field(default=None, description="Filter by operation name")
+    operation: Optional[str] = Field(default=None, description="Filter by operation name"),
+    max_bytes: Optional[int] = Field(default=None, ge=1, description="Stop once this many bytes of spans are collected (default: DATADOG_SPAN_MAX_BYTES)"),
+    cursor: Optional[str] = Field(default=None, description="Resume a truncated listing from its next_cursor")
 ) -> Dict[str, Any]:
     """Retrieves APM traces from Datadog."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            filter_query = [query]
-            if service:
-                filter_query.append(f"service:{service}")
-            if operation:
-                filter_query.append(f"operation:{operation}")
-
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": " ".join(filter_query),
-                                "from": str(from_time),
-                                "to": str(to_time),
-                            },
-                            "sort": sort,
-                            "page": {"limit": limit},
-                        },
-                        "type": "search_request",
-                    }
-                }
+        with datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(
+                spans_api, _filter_query(query, service, operation), from_time, to_time,
+                sort=sort, max_spans=limit, max_bytes=max_bytes or DATADOG_SPAN_MAX_BYTES, cursor=cursor,
             )
+            spans = list(stream)
 
-            if not response.data:
+            if not spans:
                 return {"status": "error", "message": "No traces data returned", "content": []}
 
             return {
                 "status": "success",
-                "message": "Traces retrieved successfully",
-                "content": [{"type": "text", "text": json.dumps(response.data, indent=2)}]
+                "message": stream.describe("Traces retrieved successfully"),
+                "content": [{"type": "text", "text": json.dumps(spans, indent=2, default=str)}]
             }
     except Exception as e:
         return {"status": "error", "message": f"Error fetching traces: {e}", "content": []}
 
-@mcp.tool()
 def get_trace_details(
     trace_id: str = Field(..., description="The unique ID of the trace to retrieve")
 ) -> Dict[str, Any]:
     """Retrieve details of a specific trace by ID."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
+        with datadog_api(SPANS_API) as spans_api:
             response = spans_api.get_span(trace_id)
 
             if not response.data:
@@ -78,47 +68,137 @@ def get_trace_details(
     except Exception as e:
         return {"status": "error", "message": f"Error fetching trace details: {e}", "content": []}
 
-@mcp.tool()
 def summarize_traces(
     query: str = Field(..., description="Query to filter traces"),
     from_time: int = Field(default_factory=lambda: int(time.time()) - 900, description="Start time in epoch seconds"),
-    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds")
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds"),
+    max_spans: int = Field(default=DATADOG_SPAN_SUMMARY_MAX_SPANS, ge=1, description="Stop after reading this many spans")
 ) -> Dict[str, Any]:
-    """Summarize trace statistics for a given query."""
+    """Summarize spans matching a query over the whole window: counts, error rates and duration percentiles per service and resource."""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            filter_query = [query]
-
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": " ".join(filter_query),
-                                "from": from_time,
-                                "to": to_time,
-                            },
-                            "page": {"limit": 1000},
-                        },
-                        "type": "search_request",
-                    }
-                }
-            )
+        with datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, query, from_time, to_time, max_spans=max_spans)
+            summary = SpanSummary()
+            for span in stream:
+                summary.add(span)
 
-            if not response.data:
+            if not summary.span_count:
                 return {"status": "error", "message": "No trace data returned", "content": []}
 
-            trace_count = len(response.data)
-            services = set(d.attributes.get("service", "unknown") for d in response.data)
+            return {
+                "status": "success",
+                "message": stream.describe("Trace summary retrieved successfully"),
+                "content": {**summary.result(), "pagination": stream.meta()}
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error summarizing traces: {e}", "content": []}
+
+def get_trace_tree(
+    trace_id: str = Field(..., description="The trace ID to analyze"),
+    from_time: int = Field(default_factory=lambda: int(time.time()) - 86400, description="Start time in epoch seconds (default: last 24 hours)"),
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
+    max_spans: int = Field(default=DATADOG_SPAN_SUMMARY_MAX_SPANS, ge=1, description="Stop after reading this many spans"),
+    top: int = Field(default=10, ge=1, le=100, description="Number of top self-time spans to list"),
+    max_path_spans: int = Field(default=50, ge=1, le=1000, description="Critical path spans to list, largest contributions first"),
+    max_tree_spans: int = Field(default=200, ge=0, description="Include the full span table when the trace has at most this many spans")
+) -> Dict[str, Any]:
+    """Rebuild a trace's span tree: critical path, self time per span and service, and the spans with the most self time."""
+    try:
+        with datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, f"trace_id:{trace_id}", from_time, to_time, sort="timestamp", max_spans=max_spans)
+            tree = TraceTree(row for row in map(span_row, stream) if row)
+
+            if not len(tree):
+                return {"status": "error", "message": f"No spans found for trace {trace_id}", "content": []}
 
             return {
                 "status": "success",
-                "message": "Trace summary retrieved successfully",
-                "content": {
-                    "trace_count": trace_count,
-                    "services": list(services)
-                }
+                "message": stream.describe("Trace tree built successfully"),
+                "content": {"trace_id": trace_id, **tree.analyze(top=top, max_path_spans=max_path_spans, max_tree_spans=max_tree_spans), "pagination": stream.meta()}
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error building trace tree: {e}", "content": []}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def list_traces_async(
+    query: str,
+    from_time: int = Field(default_factory=lambda: int(time.time()) - 900, description="Start time in epoch seconds (default: last 15 minutes)"),
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
+    limit: int = Field(default=100, ge=1, le=10000, description="Maximum number of spans to return, fetched across pages (default: 100)"),
+    sort: str = Field(default="-timestamp", description="Sort order for traces, default is descending timestamp"),
+    service: Optional[str] = Field(default=None, description="Filter by service name"),
+    operation: Optional[str] = Field(default=None, description="Filter by operation name"),
+    max_bytes: Optional[int] = Field(default=None, ge=1, description="Stop once this many bytes of spans are collected (default: DATADOG_SPAN_MAX_BYTES)"),
+    cursor: Optional[str] = Field(default=None, description="Resume a truncated listing from its next_cursor")
+) -> Dict[str, Any]:
+    """Retrieves APM traces from Datadog."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(
+                spans_api, _filter_query(query, service, operation), from_time, to_time,
+                sort=sort, max_spans=limit, max_bytes=max_bytes or DATADOG_SPAN_MAX_BYTES, cursor=cursor,
+            )
+            spans = [span async for span in stream]
+
+            if not spans:
+                return {"status": "error", "message": "No traces data returned", "content": []}
+
+            return {
+                "status": "success",
+                "message": stream.describe("Traces retrieved successfully"),
+                "content": [{"type": "text", "text": json.dumps(spans, indent=2, default=str)}]
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching traces: {e}", "content": []}
+
+async def summarize_traces_async(
+    query: str = Field(..., description="Query to filter traces"),
+    from_time: int = Field(default_factory=lambda: int(time.time()) - 900, description="Start time in epoch seconds"),
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds"),
+    max_spans: int = Field(default=DATADOG_SPAN_SUMMARY_MAX_SPANS, ge=1, description="Stop after reading this many spans")
+) -> Dict[str, Any]:
+    """Summarize spans matching a query over the whole window: counts, error rates and duration percentiles per service and resource."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, query, from_time, to_time, max_spans=max_spans)
+            summary = SpanSummary()
+            async for span in stream:
+                summary.add(span)
+
+            if not summary.span_count:
+                return {"status": "error", "message": "No trace data returned", "content": []}
+
+            return {
+                "status": "success",
+                "message": stream.describe("Trace summary retrieved successfully"),
+                "content": {**summary.result(), "pagination": stream.meta()}
             }
     except Exception as e:
         return {"status": "error", "message": f"Error summarizing traces: {e}", "content": []}
+
+async def get_trace_tree_async(
+    trace_id: str = Field(..., description="The trace ID to analyze"),
+    from_time: int = Field(default_factory=lambda: int(time.time()) - 86400, description="Start time in epoch seconds (default: last 24 hours)"),
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
+    max_spans: int = Field(default=DATADOG_SPAN_SUMMARY_MAX_SPANS, ge=1, description="Stop after reading this many spans"),
+    top: int = Field(default=10, ge=1, le=100, description="Number of top self-time spans to list"),
+    max_path_spans: int = Field(default=50, ge=1, le=1000, description="Critical path spans to list, largest contributions first"),
+    max_tree_spans: int = Field(default=200, ge=0, description="Include the full span table when the trace has at most this many spans")
+) -> Dict[str, Any]:
+    """Rebuild a trace's span tree: critical path, self time per span and service, and the spans with the most self time."""
+    try:
+        async with async_datadog_api(SPANS_API) as spans_api:
+            stream = SpanStream(spans_api, f"trace_id:{trace_id}", from_time, to_time, sort="timestamp", max_spans=max_spans)
+            tree = TraceTree([row async for span in stream if (row := span_row(span))])
+
+            if not len(tree):
+                return {"status": "error", "message": f"No spans found for trace {trace_id}", "content": []}
+
+            return {
+                "status": "success",
+                "message": stream.describe("Trace tree built successfully"),
+                "content": {"trace_id": trace_id, **tree.analyze(top=top, max_path_spans=max_path_spans, max_tree_spans=max_tree_spans), "pagination": stream.meta()}
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error building trace tree: {e}", "content": []}
@@ -0,0 +1,203 @@
+import heapq
+from datetime import datetime
+
+# Columns of the flat span table returned with a tree, one row per span in depth-first order
+TREE_COLUMNS = ("index", "parent", "depth", "service", "resource", "start_ms", "duration_ms", "self_ms", "error")
+
+
+def _start_ns(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1e9)
+
+
+def span_row(span):
+    """The fields of a span search result a TraceTree keeps, or None if it has no start time."""
+    attributes = span.get("attributes") or {}
+    custom = attributes.get("custom") or {}
+    start = attributes.get("start_timestamp")
+    if start is None:
+        return None
+    return (
+        _start_ns(start),
+        int(custom.get("duration") or 0),
+        str(attributes.get("span_id") or span.get("id")),
+        str(attributes.get("parent_id") or "0"),
+        attributes.get("service") or "unknown",
+        attributes.get("resource_name") or "unknown",
+        1 if custom.get("error") else 0,
+    )
+
+
+def _by_service(times, tree):
+    totals = {}
+    for i, ns in times:
+        service = tree.names[tree.service[i]]
+        totals[service] = totals.get(service, 0) + ns
+    return {service: round(ns / 1e6, 3) for service, ns in sorted(totals.items(), key=lambda item: -item[1])}
+
+
+class TraceTree:
+    """Parent -> children index over the spans of one trace, built from span_row() tuples.
+
+    Spans are reduced to parallel lists (ids, parent positions, start/duration in ns, interned
+    service and resource names), with children stored contiguously per parent in start order.
+    Building the index, self times and the critical path is linear in the number of spans apart
+    from ordering children, so traces with tens of thousands of spans stay cheap to analyze.
+    Spans whose parent is not in the trace are treated as roots.
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+        # Already in start order when fetched with sort=timestamp, which makes this sort linear
+        rows.sort(key=lambda row: row[0])
+        n = len(rows)
+        self.start = [row[0] for row in rows]
+        self.duration = [row[1] for row in rows]
+        self.span_id = [row[2] for row in rows]
+        self.error = [row[6] for row in rows]
+        name_index = {}
+        self.service = [name_index.setdefault(row[4], len(name_index)) for row in rows]
+        self.resource = [name_index.setdefault(row[5], len(name_index)) for row in rows]
+        self.names = list(name_index)
+        position = {span_id: i for i, span_id in enumerate(self.span_id)}
+        self.parent = [position.get(row[3], -1) for row in rows]
+        # A span listed as its own parent is a root
+        self.parent = [-1 if p == i else p for i, p in enumerate(self.parent)]
+        self.roots = [i for i in range(n) if self.parent[i] < 0]
+
+        # Children of span i are child_index[child_start[i]:child_start[i + 1]], in start order
+        counts = [0] * (n + 1)
+        for p in self.parent:
+            if p >= 0:
+                counts[p + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.child_start = counts
+        fill = counts[:-1]
+        self.child_index = [0] * (counts[n] if n else 0)
+        for i, p in enumerate(self.parent):
+            if p >= 0:
+                self.child_index[fill[p]] = i
+                fill[p] += 1
+        self.self_time = [self._self_time(i) for i in range(n)]
+
+    def __len__(self):
+        return len(self.start)
+
+    def children(self, i):
+        return self.child_index[self.child_start[i]:self.child_start[i + 1]]
+
+    def end(self, i):
+        return self.start[i] + self.duration[i]
+
+    def _self_time(self, i):
+        """Duration not covered by any child; overlapping (concurrent) children are only counted once."""
+        lo, hi = self.start[i], self.end(i)
+        covered, cursor = 0, lo
+        for c in self.children(i):
+            c_lo, c_hi = max(self.start[c], cursor), min(self.end(c), hi)
+            if c_hi > c_lo:
+                covered += c_hi - c_lo
+                cursor = c_hi
+        return self.duration[i] - covered
+
+    def root(self):
+        """The longest root span, which the critical path is computed from."""
+        return max(self.roots, key=lambda i: self.duration[i]) if self.roots else None
+
+    def depths(self):
+        depth = [0] * len(self)
+        for i in self.dfs():
+            p = self.parent[i]
+            depth[i] = depth[p] + 1 if p >= 0 else 0
+        return depth
+
+    def dfs(self):
+        """Span positions in depth-first order, roots and siblings in start order."""
+        stack = list(reversed(self.roots))
+        while stack:
+            i = stack.pop()
+            yield i
+            stack.extend(reversed(self.children(i)))
+
+    def critical_path(self, root=None):
+        """{span position: ns it contributes} along the path that determines the root's end time.
+
+        Walking back from the end of a span, the child that finished last is what the span was
+        waiting on; it is on the path until its start, then the child finishing last before that
+        point, and so on. Time not covered by a child on the path belongs to the span itself.
+        The contributions add up to the root's duration.
+        """
+        root = self.root() if root is None else root
+        if root is None:
+            return {}
+        path = {}
+        stack = [(root, self.start[root], self.end(root))]
+        while stack:
+            i, lo, hi = stack.pop()
+            cursor = hi
+            own = 0
+            for c in sorted(self.children(i), key=self.end, reverse=True):
+                if cursor <= lo:
+                    break
+                c_lo, c_hi = max(self.start[c], lo), min(self.end(c), cursor)
+                if c_hi <= c_lo:
+                    continue
+                own += cursor - c_hi
+                stack.append((c, c_lo, c_hi))
+                cursor = c_lo
+            own += max(0, cursor - lo)
+            path[i] = path.get(i, 0) + own
+        return path
+
+    def describe(self, i, origin):
+        return {
+            "span_id": self.span_id[i],
+            "service": self.names[self.service[i]],
+            "resource": self.names[self.resource[i]],
+            "start_ms": round((self.start[i] - origin) / 1e6, 3),
+            "duration_ms": round(self.duration[i] / 1e6, 3),
+            "self_ms": round(self.self_time[i] / 1e6, 3),
+            "error": self.error[i],
+        }
+
+    def analyze(self, top=10, max_path_spans=50, max_tree_spans=200):
+        """Critical path, top self-time spans, time per service, and (for small traces) the span table."""
+        n = len(self)
+        root = self.root()
+        if root is None:
+            return {"span_count": 0}
+        origin = min(self.start[i] for i in self.roots)
+        path = self.critical_path(root)
+        result = {
+            "span_count": n,
+            "root": self.describe(root, origin),
+            "roots": len(self.roots),
+            "error_count": sum(self.error),
+            # Concurrent fan-out puts many short segments on the path: keep the largest, in start order
+            "critical_path": [
+                {**self.describe(i, origin), "critical_ms": round(path[i] / 1e6, 3)}
+                for i in sorted(heapq.nlargest(max_path_spans, path, key=path.__getitem__), key=self.start.__getitem__)
+            ],
+            "critical_path_spans": len(path),
+            "critical_ms_by_service": _by_service(path.items(), self),
+            "top_self_time": [
+                self.describe(i, origin) for i in heapq.nlargest(top, range(n), key=self.self_time.__getitem__)
+            ],
+            "self_ms_by_service": _by_service(enumerate(self.self_time), self),
+        }
+        if n <= max_tree_spans:
+            depth = self.depths()
+            result["tree"] = {
+                "columns": list(TREE_COLUMNS),
+                "rows": [
+                    [
+                        i, self.parent[i], depth[i], self.names[self.service[i]], self.names[self.resource[i]],
+                        round((self.start[i] - origin) / 1e6, 3), round(self.duration[i] / 1e6, 3),
+                        round(self.self_time[i] / 1e6, 3), self.error[i],
+                    ]
+                    for i in self.dfs()
+                ],
+            }
+        return result
@@ -1,23 +1,44 @@
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.usage_metering_api import UsageMeteringApi
-from config import configuration
-from mcp.server.fastmcp import FastMCP
+from .client import datadog_api, async_datadog_api
+
+USAGE_METERING_API = "datadog_api_client.v2.api.usage_metering_api.UsageMeteringApi"
+
+
+def _usage_window(start_date, end_date):
+    """UTC datetimes covering start_date through the end of end_date (the v2 end bound is exclusive)."""
+    start = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    end = datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)
+    return start, end
 
-mcp = FastMCP("Datadog Usage Service")
 
-@mcp.tool()
 def get_hourly_usage(
     start_date: str = Field(..., description="The start date for hourly usage in YYYY-MM-DD format"),
     end_date: str = Field(..., description="The end date for hourly usage in YYYY-MM-DD format"),
-    usage_type: Optional[str] = Field(default=None, description="The type of usage to retrieve (e.g., 'logs', 'hosts')")
+    usage_type: Optional[str] = Field(default=None, description="Comma-separated product families to retrieve (e.g., 'infra_hosts,logs'); all when omitted")
+) -> Dict[str, Any]:
+    """Retrieve hourly usage data."""
+    try:
+        start, end = _usage_window(start_date, end_date)
+        with datadog_api(USAGE_METERING_API) as usage_api:
+            response = usage_api.get_hourly_usage(start, usage_type or "all", filter_timestamp_end=end)
+            return {"status": "success", "message": "Hourly usage retrieved successfully", "content": response.to_dict()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error retrieving hourly usage: {e}"}
+
+# Async variants, registered under the same tool names when DATADOG_ASYNC_MODE is on
+
+async def get_hourly_usage_async(
+    start_date: str = Field(..., description="The start date for hourly usage in YYYY-MM-DD format"),
+    end_date: str = Field(..., description="The end date for hourly usage in YYYY-MM-DD format"),
+    usage_type: Optional[str] = Field(default=None, description="Comma-separated product families to retrieve (e.g., 'infra_hosts,logs'); all when omitted")
 ) -> Dict[str, Any]:
     """Retrieve hourly usage data."""
     try:
-        with ApiClient(configuration) as api_client:
-            usage_api = UsageMeteringApi(api_client)
-            response = usage_api.get_hourly_usage(start_date=start_date, end_date=end_date, usage_type=usage_type)
+        start, end = _usage_window(start_date, end_date)
+        async with async_datadog_api(USAGE_METERING_API) as usage_api:
+            response = await usage_api.get_hourly_usage(start, usage_type or "all", filter_timestamp_end=end)
             return {"status": "success", "message": "Hourly usage retrieved successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error retrieving hourly usage: {e}"}
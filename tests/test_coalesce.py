@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from modules.coalesce import AsyncSingleFlight, SingleFlight, request_key, snapshot
+
+URL = "https://api.datadoghq.com/api/v1/query"
+
+
+def _key(method="GET", url=URL, params=(("query", "avg:m{*}"),), body=None):
+    return request_key(method, url, list(params), body, (dict,), True, True)
+
+
+def test_request_key_only_for_read_only_requests():
+    assert _key() == _key()
+    assert _key() != _key(params=(("query", "avg:n{*}"),))
+    assert _key(method="POST", url="https://api.datadoghq.com/api/v1/monitor") is None
+    assert _key(method="POST", url="https://api.datadoghq.com/api/v2/spans/events/search", body={"a": 1}) is not None
+    assert request_key("GET", URL, [], None, (dict,), True, False) is None
+
+
+def _run_concurrently(flight, key, fn, callers=5):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_upstream_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return {"ok": True}
+
+    threads, results, errors = _run_concurrently(flight, "k", fn)
+    started.wait(1)
+    while flight.counters["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == [{"ok": True}] * 5 and not errors
+    assert snapshot(flight) == {"upstream_calls": 1, "coalesced_calls": 4, "coalesced_ratio": 0.8}
+
+
+def test_error_is_shared_and_the_key_is_released():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(2)
+        raise ValueError("boom")
+
+    threads, results, errors = _run_concurrently(flight, "k", fail, callers=3)
+    while flight.counters["coalesced"] < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3 and all(isinstance(e, ValueError) for e in errors)
+    # The failed flight is gone, so the next call goes upstream again
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.counters["upstream"] == 2
+
+
+def test_none_key_is_never_coalesced():
+    flight = SingleFlight()
+    assert flight.do(None, lambda: 1) == 1
+    assert flight.counters["upstream"] == 0
+
+
+def test_async_callers_share_one_task_and_survive_a_cancelled_caller():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0)
+        others = [asyncio.ensure_future(flight.do("k", fn)) for _ in range(3)]
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await asyncio.gather(*others)
+
+    assert asyncio.run(run()) == [42, 42, 42]
+    assert calls == [1]
+    assert dict(flight.counters) == {"upstream": 1, "coalesced": 3}
@@ -0,0 +1,35 @@
+from modules.timeseries import compact_response, compact_series
+
+
+def _series(points, **extra):
+    return {"metric": "m", "scope": "service:web", "pointlist": points, **extra}
+
+
+def test_regular_series_uses_step():
+    compact = compact_series(_series([[1000_000, 1.5], [1060_000, 2.5], [1120_000, None]]))
+    assert compact["start"] == 1000 and compact["step"] == 60
+    assert "deltas" not in compact
+    assert compact["values"] == [1.5, 2.5, None]
+
+
+def test_irregular_series_uses_deltas():
+    compact = compact_series(_series([[0, 1.0], [60_000, 2.0], [180_000, 3.0]]))
+    assert compact["deltas"] == [60, 120] and "step" not in compact
+
+
+def test_precision_rounds_values():
+    points = [[0, 1.234], [60_000, 2.345], [120_000, None]]
+    assert compact_series(_series(points), precision=1)["values"] == [1.2, 2.3, None]
+    assert compact_series(_series(points[:2]), precision=0)["values"] == [1, 2]
+
+
+def test_empty_series():
+    compact = compact_series(_series([]))
+    assert compact["start"] is None and compact["values"] == []
+
+
+def test_compact_response_keeps_query_fields():
+    response = {"query": "q", "from_date": 0, "to_date": 1, "status": "ok", "series": [_series([[0, 1.0]])]}
+    compact = compact_response(response)
+    assert set(compact) == {"query", "from_date", "to_date", "series"}
+    assert compact["series"][0]["values"] == [1.0]
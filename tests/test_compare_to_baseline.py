@@ -0,0 +1,50 @@
+import re
+import time
+
+from modules import metrics
+
+DAY = 86400
+
+
+def _fake_chunks(calls, interval_default=60):
+    def fetch(metrics_api, query, from_time, to_time):
+        calls.append((query, from_time, to_time))
+        rollup = re.search(r"\.rollup\(\s*\w+\s*,\s*(\d+)\s*\)", query)
+        interval = int(rollup.group(1)) if rollup else interval_default
+        start = from_time - from_time % interval
+        points = [[float(ts * 1000), 50.0 + (ts // interval) % 5] for ts in range(start, to_time + 1, interval)]
+        series = {
+            "metric": "trace.http.request",
+            "scope": "service:web",
+            "tag_set": ["service:web"],
+            # Real Datadog keeps the explicit rollup in the expression
+            "expression": "p99:trace.http.request{service:web}" + (rollup.group(0) if rollup else ""),
+            "interval": interval,
+            "pointlist": points,
+            "query_index": 0,
+        }
+        return {"query": query, "from_date": from_time * 1000, "to_date": to_time * 1000, "series": [series]}
+
+    return fetch
+
+
+def test_recent_window_and_older_baselines_share_query_and_series(monkeypatch):
+    calls = []
+    monkeypatch.setattr(metrics, "_fetch_chunks", _fake_chunks(calls))
+    now = int(time.time())
+    result = metrics.compare_to_baseline(
+        from_time=now - 3600, to_time=now, query="avg:test.baseline.recent{service:web} by {service}",
+        service_name=None, metric="p99_latency", baseline_windows=2, period=DAY, threshold=3.0,
+    )
+    assert result["status"] == "success", result
+    queries = {query for query, _, _ in calls}
+    assert len(queries) == 1 and ".rollup(avg, 20)" in queries.pop()
+    content = result["content"]
+    assert content["baseline_windows"] == 2
+    assert content["series"][0]["verdict"] != "no_baseline"
+
+
+def test_unrollable_query_is_left_alone():
+    query = "avg:a{*} / avg:b{*}"
+    assert metrics.comparable_query(query, 0, 3600) == query
+    assert metrics.comparable_query("avg:a{*}", 0, 3600) == "avg:a{*}.rollup(avg, 20)"
@@ -0,0 +1,58 @@
+from modules.dependency_walk import DependencyWalk
+
+GRAPH = {
+    "web": ["api", "auth"],
+    "api": ["db", "cache"],
+    "auth": ["users"],
+    "db": ["disk"],
+}
+
+
+def _health(mean_z, verdict=None):
+    verdict = verdict or ("anomalous" if mean_z > 3 else "normal")
+    return {"p99_latency": {"verdict": verdict, "mean_z": mean_z, "pct_delta": None}}
+
+
+def _walk(health, max_depth=5, max_level_services=None):
+    walk = DependencyWalk(GRAPH, "web", max_depth, 3.0, max_level_services)
+    levels = []
+    while walk.next_level():
+        levels.append(list(walk.next_level()))
+        walk.record({service: health.get(service, _health(0.0)) for service in walk.next_level()}, 1.0)
+    return walk, levels
+
+
+def test_start_service_is_expanded_and_healthy_services_are_pruned():
+    walk, levels = _walk({"web": _health(0.0), "api": _health(8.0)})
+    assert levels == [["web"], ["api", "auth"], ["db", "cache"]]
+    # auth is healthy, so users is never checked; db and cache are healthy leaves of the anomalous api
+    assert "users" not in walk.health and "disk" not in walk.health
+    assert walk.pruned == 2
+    assert walk.result()["services_checked"] == 5
+
+
+def test_walk_stops_at_max_depth():
+    walk, levels = _walk({"api": _health(8.0), "db": _health(9.0)}, max_depth=1)
+    assert levels == [["web"], ["api", "auth"]]
+    assert walk.depth == 2
+
+
+def test_max_level_services_truncates_each_level():
+    walk, levels = _walk({"api": _health(8.0), "auth": _health(8.0)}, max_level_services=1)
+    assert levels == [["web"], ["api"], ["db"]]
+    assert walk.skipped == 2
+
+
+def test_origins_rank_before_services_they_propagate_to():
+    walk, _ = _walk({"web": _health(4.0), "api": _health(12.0), "db": _health(5.0), "auth": _health(6.0)})
+    suspects = walk.suspects()
+    assert [s["service"] for s in suspects] == ["auth", "db", "api", "web"]
+    assert [s["origin"] for s in suspects] == [True, True, False, False]
+    db = suspects[1]
+    assert db["path"] == ["web", "api", "db"] and db["depth"] == 2
+    assert suspects[2]["anomalous_downstream"] == ["db"]
+
+
+def test_decreases_are_not_anomalous():
+    walk, _ = _walk({"web": _health(-9.0, "anomalous"), "api": _health(-9.0, "anomalous")})
+    assert walk.suspects() == []
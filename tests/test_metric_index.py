@@ -0,0 +1,63 @@
+from modules.metric_index import MetricIndex
+
+NAMES = [
+    "system.cpu.user",
+    "system.cpu.system",
+    "system.cpu",
+    "system.mem.used",
+    "trace.http.request.duration",
+    "trace.http.request.hits",
+    "aws.ec2.cpuutilization",
+]
+
+
+def _index(names=NAMES, now=1000.0):
+    index = MetricIndex(lookback=3600)
+    index.update(names, now)
+    return index
+
+
+def _ranked(index, query, **kwargs):
+    page, total = index.search(query, **kwargs)
+    return [(row["metric"], row["match"]) for row in page], total
+
+
+def test_exact_then_prefix_shortest_first():
+    ranked, total = _ranked(_index(), "system.cpu")
+    assert ranked == [
+        ("system.cpu", "exact"),
+        ("system.cpu.user", "prefix"),
+        ("system.cpu.system", "prefix"),
+    ]
+    assert total == 3
+
+
+def test_token_matches_rank_after_prefix_matches():
+    ranked, _ = _ranked(_index(), "http request")
+    assert ranked == [
+        ("trace.http.request.hits", "tokens"),
+        ("trace.http.request.duration", "tokens"),
+    ]
+
+
+def test_one_typo_is_a_fuzzy_match():
+    ranked, _ = _ranked(_index(), "reqest")
+    assert {name for name, match in ranked if match == "fuzzy"} == {
+        "trace.http.request.hits",
+        "trace.http.request.duration",
+    }
+    assert _ranked(_index(), "reqest", fuzzy=False) == ([], 0)
+
+
+def test_paging_slices_ranked_results():
+    index = _index()
+    full, total = _ranked(index, "system")
+    page, _ = _ranked(index, "system", limit=2, offset=1)
+    assert page == full[1:3] and total == len(full)
+
+
+def test_update_adds_and_expires_names():
+    index = _index(now=1000.0)
+    index.update(["system.disk.free"], now=1000.0 + 3601)
+    assert _ranked(index, "system.disk")[0] == [("system.disk.free", "prefix")]
+    assert _ranked(index, "system.cpu") == ([], 0)
@@ -0,0 +1,39 @@
+from modules.query_planner import canonical_service, plan_service_queries, split_by_tag
+
+
+def test_canonical_service():
+    assert canonical_service("  Check Out ") == "check_out"
+
+
+def test_plan_groups_sorted_unique_services():
+    plan = plan_service_queries("p99_latency", ["web", "Auth", "web ", "", "cart"], "http.request", 2)
+    assert [group for _, group in plan] == [["auth", "cart"], ["web"]]
+    assert plan[0][0] == "p99:trace.http.request{service:auth OR service:cart} by {service}"
+
+
+def test_plan_is_deterministic():
+    first = plan_service_queries("error_rate", ["b", "a", "c"], "http.request", 10)
+    assert first == plan_service_queries("error_rate", ["c", "a", "b"], "http.request", 10)
+    query, group = first[0]
+    assert group == ["a", "b", "c"]
+    assert query.count("service:a OR service:b OR service:c") == 2
+
+
+def test_downstream_latency_groups_by_peer_service():
+    (query, _), = plan_service_queries("downstream_latency", ["db"], "http.request", 10)
+    assert query == "p99:trace.http.request{peer.service:db} by {peer.service}"
+
+
+def test_split_by_tag_uses_tag_set_and_scope():
+    response = {
+        "query": "q",
+        "series": [
+            {"scope": "service:web", "pointlist": [[0, 1.0]]},
+            {"tag_set": ["env:prod", "service:auth"], "scope": "env:prod,service:auth", "pointlist": [[0, 2.0]]},
+            {"scope": "service:other", "pointlist": [[0, 3.0]]},
+        ],
+    }
+    split = split_by_tag(response, "service", ["web", "auth", "cart"])
+    assert [s["pointlist"] for s in split["web"]["series"]] == [[[0, 1.0]]]
+    assert [s["pointlist"] for s in split["auth"]["series"]] == [[[0, 2.0]]]
+    assert split["cart"] == {"query": "q", "series": []}
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from modules.ratelimit import RateLimitScheduler, endpoint_key
+
+URL = "https://api.datadoghq.com/api/v1/monitor/12345"
+SEARCH = "https://api.datadoghq.com/api/v2/spans/events/search"
+HEADERS = {"X-RateLimit-Name": "monitors", "X-RateLimit-Limit": "100", "X-RateLimit-Period": "10"}
+
+
+def test_endpoint_key_collapses_ids_but_not_versions():
+    assert endpoint_key("GET", URL) == "GET /api/v1/monitor/{id}"
+
+
+def test_429_retries_after_reset_and_halves_concurrency():
+    scheduler = RateLimitScheduler(initial_concurrency=8, max_backoff=30)
+    bucket = scheduler.acquire("GET", URL)
+    headers = {**HEADERS, "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "2"}
+    bucket = scheduler.release(bucket, "GET", URL, 429, headers)
+    assert bucket.name == "monitors"
+    assert bucket.concurrency == 4 and bucket.throttled == 1
+    delay = scheduler.retry_delay(bucket, "GET", URL, 0, 429, headers)
+    assert 2 <= delay <= 3
+    assert bucket.retries == 1
+
+
+def test_429_with_a_long_reset_is_not_retried():
+    scheduler = RateLimitScheduler(max_backoff=5)
+    bucket = scheduler.acquire("GET", URL)
+    headers = {**HEADERS, "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "60"}
+    bucket = scheduler.release(bucket, "GET", URL, 429, headers)
+    assert scheduler.retry_delay(bucket, "GET", URL, 0, 429, headers) is None
+
+
+def test_5xx_is_retried_only_for_read_only_requests():
+    scheduler = RateLimitScheduler()
+    bucket = scheduler.acquire("POST", URL)
+    scheduler.release(bucket, "POST", URL, 503, {})
+    assert scheduler.retry_delay(bucket, "POST", URL, 0, 503, {}) is None
+    assert scheduler.retry_delay(bucket, "DELETE", URL, 0, 503, {}) is None
+    assert scheduler.retry_delay(bucket, "GET", URL, 0, 503, {}) is not None
+    assert scheduler.retry_delay(bucket, "POST", SEARCH, 0, 503, {}) is not None
+    # Non-idempotent requests are still retried when Datadog rejected them with a 429
+    assert scheduler.retry_delay(bucket, "POST", URL, 0, 429, {}) is not None
+
+
+def test_retries_stop_after_max_retries():
+    scheduler = RateLimitScheduler(max_retries=2)
+    bucket = scheduler.acquire("GET", URL)
+    scheduler.release(bucket, "GET", URL, 500, {})
+    assert scheduler.retry_delay(bucket, "GET", URL, 2, 500, {}) is None
+    assert scheduler.retry_delay(bucket, "GET", URL, 0, 404, {}) is None
+
+
+def test_exhausted_quota_holds_requests_until_reset():
+    scheduler = RateLimitScheduler()
+    bucket = scheduler.acquire("GET", URL)
+    scheduler.release(bucket, "GET", URL, 200, {**HEADERS, "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0.3"})
+    started = time.monotonic()
+    bucket = scheduler.acquire("GET", URL)
+    assert time.monotonic() - started >= 0.25
+    assert bucket.name == "monitors"
+
+
+def test_concurrency_limit_blocks_until_release():
+    scheduler = RateLimitScheduler(initial_concurrency=1)
+    first = scheduler.acquire("GET", URL)
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (scheduler.acquire("GET", URL), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    scheduler.release(first, "GET", URL, 200, {})
+    assert acquired.wait(1)
+    thread.join()
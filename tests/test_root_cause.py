@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+from modules import root_cause
+from modules.root_cause import _analysis_result
+
+
+def test_missing_and_failed_sections_are_partial():
+    results = {
+        "latency": {"status": "success", "content": {}},
+        "errors": None,
+        "monitors": {"status": "error", "message": "boom"},
+    }
+    result = _analysis_result("web", 0, 60, 5, time.monotonic(), results)
+    assert result["status"] == "success"
+    assert result["content"]["partial"] == ["errors", "monitors"]
+    assert result["content"]["sections"]["errors"]["status"] == "timeout"
+    assert result["message"] == "Root cause analysis completed (partial: errors, monitors)"
+
+
+def test_all_sections_missing_is_an_error():
+    result = _analysis_result("web", 0, 60, 5, time.monotonic(), {"latency": None, "errors": {"status": "error"}})
+    assert result["status"] == "error"
+    assert result["content"]["partial"] == ["latency", "errors"]
+
+
+def test_complete_analysis_has_no_partial_sections():
+    result = _analysis_result("web", 0, 60, 5, time.monotonic(), {"latency": {"status": "success"}})
+    assert result["message"] == "Root cause analysis completed"
+    assert result["content"]["partial"] == [] and result["content"]["time_range"] == {"from": 0, "to": 60}
+
+
+def _ok(**kwargs):
+    return {"status": "success", "content": {}}
+
+
+def _stub_sections(monkeypatch, sync_slow, async_slow):
+    async def ok_async(**kwargs):
+        return _ok()
+
+    for name in root_cause.SECTION_TOOLS:
+        monkeypatch.setitem(root_cause.SECTION_TOOLS, name, (_ok, ok_async))
+    monkeypatch.setitem(root_cause.SECTION_TOOLS, "spans", (sync_slow, async_slow))
+
+
+def test_sync_analysis_returns_at_deadline_with_slow_section_partial(monkeypatch):
+    release = threading.Event()
+
+    def slow(**kwargs):
+        release.wait(5)
+        return _ok()
+
+    _stub_sections(monkeypatch, slow, None)
+    try:
+        started = time.monotonic()
+        result = root_cause.analyze_service_with_apm("web", 0, 60, 50, 0.2)
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+    assert elapsed < 1
+    assert result["status"] == "success"
+    assert result["content"]["partial"] == ["spans"]
+    assert result["content"]["sections"]["spans"]["status"] == "timeout"
+    assert result["content"]["sections"]["latency"]["status"] == "success"
+
+
+def test_async_analysis_cancels_slow_section_at_deadline(monkeypatch):
+    cancelled = []
+
+    async def slow(**kwargs):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return _ok()
+
+    _stub_sections(monkeypatch, None, slow)
+
+    async def run():
+        started = time.monotonic()
+        result = await root_cause.analyze_service_with_apm_async("web", 0, 60, 50, 0.2)
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(0)  # let the cancellation reach the task
+        return result, elapsed
+
+    result, elapsed = asyncio.run(run())
+    assert elapsed < 1
+    assert result["content"]["partial"] == ["spans"]
+    assert result["content"]["sections"]["spans"]["status"] == "timeout"
+    assert cancelled == [True]
@@ -0,0 +1,64 @@
+from modules.timeseries import SegmentCache
+
+
+def _response(from_time, to_time, value=1.0, overrides=None):
+    overrides = overrides or {}
+    points = [[ts * 1000, overrides.get(ts, value)] for ts in range(from_time, to_time + 1, 60)]
+    return {"query": "avg:m{*}.rollup(avg, 60)", "series": [{"metric": "m", "scope": "*", "pointlist": points}]}
+
+
+def _points(response):
+    return {ts // 1000: value for ts, value in response["series"][0]["pointlist"]}
+
+
+def _poll(cache, from_time, to_time, now, **kwargs):
+    fetched = cache.window("q", 60, from_time, to_time)
+    response = _response(*fetched, **kwargs) if fetched else None
+    return fetched, cache.merge("q", 60, response, fetched, from_time, to_time, now)
+
+
+def test_sliding_window_only_refetches_the_unsettled_tail():
+    cache = SegmentCache(settle_seconds=120)
+    assert _poll(cache, 0, 3600, now=3600)[0] == (0, 3600)
+    fetched, merged = _poll(cache, 600, 4200, now=4200)
+    # Buckets newer than now - settle_seconds were not final, so the tail starts there
+    assert fetched == (3480, 4200)
+    assert min(_points(merged)) == 600 and max(_points(merged)) == 4200
+    assert cache.snapshot()["tail_fetches"] == 1
+
+
+def test_settled_window_is_served_from_cache():
+    cache = SegmentCache(settle_seconds=120)
+    _poll(cache, 0, 3600, now=7200)
+    fetched, merged = _poll(cache, 0, 3600, now=7200)
+    assert fetched is None
+    assert len(_points(merged)) == 61
+
+
+def test_refetched_unsettled_points_replace_cached_ones():
+    cache = SegmentCache(settle_seconds=120)
+    _poll(cache, 0, 3600, now=3600, value=1.0)
+    _, merged = _poll(cache, 0, 3660, now=3660, value=1.0, overrides={3540: 9.0, 3600: 7.0})
+    points = _points(merged)
+    assert points[3540] == 9.0 and points[3600] == 7.0
+    assert points[3420] == 1.0
+
+
+def test_points_outside_the_window_are_not_returned_and_old_ones_are_pruned():
+    cache = SegmentCache(settle_seconds=120)
+    _poll(cache, 0, 3600, now=3600)
+    _poll(cache, 3000, 6600, now=6600)
+    fetched, merged = _poll(cache, 6000, 9600, now=9600)
+    assert fetched == (6480, 9600)
+    assert min(_points(merged)) == 6000
+    stored = cache._entries["q"].series
+    assert min(ts for _, points in stored.values() for ts in points) == 2400 * 1000
+    # Points more than one window before the request were dropped, so the old range is fetched again
+    assert cache.window("q", 60, 0, 3600) == (0, 3600)
+    assert cache.snapshot()["full_fetches"] == 2
+
+
+def test_changed_interval_forces_a_full_fetch():
+    cache = SegmentCache(settle_seconds=120)
+    _poll(cache, 0, 3600, now=7200)
+    assert cache.window("q", 300, 0, 3600) == (0, 3600)
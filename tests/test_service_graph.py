@@ -0,0 +1,51 @@
+from modules.service_graph import DOWNSTREAM, UPSTREAM, ServiceGraph
+
+T0 = 1_700_000_000
+
+
+def _graph():
+    graph = ServiceGraph(refresh_seconds=300, lookback=3600)
+    graph.update({"Web": {"calls": ["api", "auth", "web"]}, "api": {"calls": ["db"]}}, now=T0)
+    return graph
+
+
+def test_neighbors_and_edges_follow_the_direction():
+    graph = _graph()
+    assert graph.edges("web", DOWNSTREAM) == ["api", "auth"]
+    assert graph.edges("db", UPSTREAM) == ["api"]
+    assert graph.edges("db", DOWNSTREAM) == []
+    assert graph.neighbors("web", DOWNSTREAM) == {"api": 1, "auth": 1}
+    assert graph.neighbors("web", DOWNSTREAM, depth=2) == {"api": 1, "auth": 1, "db": 2}
+    assert graph.neighbors("db", UPSTREAM, depth=3) == {"api": 1, "web": 2}
+    assert "WEB" in graph and "db" in graph
+
+
+def test_update_merges_new_edges_and_bumps_versions():
+    graph = _graph()
+    assert graph.version == 1
+    graph.update({"api": {"calls": ["db"]}}, now=T0 + 300)
+    assert graph.version == 1 and graph.last_changes == {"added": 0, "removed": 0}
+    graph.update({"api": {"calls": ["cache"]}}, now=T0 + 600)
+    assert graph.version == 2
+    assert graph.edges("api", DOWNSTREAM) == ["cache", "db"]
+    assert graph.versions["cache"] == graph.versions["api"] == 2
+    assert graph.versions["web"] == 1
+
+
+def test_edges_not_observed_within_the_lookback_expire():
+    graph = _graph()
+    graph.update({"web": {"calls": ["api"]}}, now=T0 + 3000)
+    graph.update({}, now=T0 + 3700)
+    assert graph.edges("web", DOWNSTREAM) == ["api"]
+    assert graph.edges("api", DOWNSTREAM) == []
+    assert graph.last_changes == {"added": 0, "removed": 2}
+    assert "db" not in graph and "auth" not in graph
+    assert graph.downstream_map() == {"web": ["api"], "api": []}
+
+
+def test_refresh_window_covers_the_lookback_then_only_the_new_tail():
+    graph = ServiceGraph(refresh_seconds=300, lookback=3600)
+    assert graph.refresh_window(T0) == (T0 - 3600, T0)
+    graph.update({}, now=T0)
+    assert graph.refresh_window(T0 + 300) == (T0 - 60, T0 + 300)
+    assert graph.refresh_window(T0 + 7200) == (T0 + 3540, T0 + 7200)
@@ -0,0 +1,69 @@
+import random
+
+from modules.sketch import DDSketch, HyperLogLog
+
+
+def _exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def test_ddsketch_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(20000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact * 1.0001
+    assert sketch.count == len(values)
+    assert abs(sketch.mean() - sum(values) / len(values)) < 1e-6 * sum(values)
+
+
+def test_ddsketch_merge_matches_single_sketch():
+    rng = random.Random(11)
+    values = [rng.uniform(1, 1000) for _ in range(5000)]
+    whole, left, right = DDSketch(), DDSketch(), DDSketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+    for q in (0.5, 0.99):
+        assert left.quantile(q) == whole.quantile(q)
+    assert left.count == whole.count
+
+
+def test_ddsketch_zero_values_and_bounds():
+    sketch = DDSketch()
+    for value in (0, 0, 5, 10):
+        sketch.add(value)
+    assert sketch.quantile(0.25) == 0
+    assert sketch.quantile(1) <= 10 * 1.01 and sketch.max == 10
+
+
+def test_ddsketch_collapse_keeps_upper_quantiles():
+    sketch = DDSketch(relative_accuracy=0.01, max_buckets=64)
+    values = [1.05 ** i for i in range(500)]
+    for value in values:
+        sketch.add(value)
+    assert len(sketch.bins) <= 64
+    exact = _exact_quantile(values, 0.99)
+    assert abs(sketch.quantile(0.99) - exact) <= 0.01 * exact * 1.0001
+
+
+def test_hyperloglog_estimate_within_error():
+    for n in (100, 5000, 100000):
+        hll = HyperLogLog(precision=12)
+        for i in range(n):
+            hll.add(f"trace-{i}")
+        assert abs(len(hll) - n) <= 0.05 * n
+
+
+def test_hyperloglog_merge_and_duplicates():
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        a.add(i)
+        a.add(i)
+        b.add(i + 1500)
+    assert abs(len(a.merge(b)) - 4500) <= 0.05 * 4500
@@ -0,0 +1,62 @@
+from modules.timeseries import plan_chunks, rollup_interval, stitch
+
+DAY = 86400
+
+
+def _response(*series):
+    return {"query": "avg:m{*}", "series": [{"metric": "m", "scope": scope, "pointlist": points} for scope, points in series]}
+
+
+def test_short_range_is_one_chunk():
+    assert plan_chunks("avg:m{*}", 0, 3600, DAY, 8) == [(0, 3600)]
+
+
+def test_chunks_cover_range_contiguously():
+    start, end = 1_700_000_123, 1_700_000_123 + 30 * DAY
+    chunks = plan_chunks("avg:m{*}", start, end, 7 * DAY, 8)
+    assert chunks[0][0] == start and chunks[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert 1 < len(chunks) <= 8
+
+
+def test_interior_boundaries_align_to_rollup():
+    start, end = 1_700_000_123, 1_700_000_123 + 30 * DAY
+    chunks = plan_chunks("avg:m{*}", start, end, 7 * DAY, 8)
+    align = rollup_interval("avg:m{*}", chunks[1][1] - chunks[1][0])
+    assert all(boundary % align == 0 for _, boundary in chunks[:-1])
+
+
+def test_explicit_rollup_sets_alignment():
+    chunks = plan_chunks("avg:m{*}.rollup(avg, 7200)", 0, 30 * DAY, 7 * DAY, 8)
+    assert all(boundary % 7200 == 0 for _, boundary in chunks[:-1])
+
+
+def test_stitch_concatenates_in_time_order():
+    first = _response(("a", [[0, 1.0], [60, 2.0]]))
+    second = _response(("a", [[120, 3.0], [180, 4.0]]))
+    series = stitch([first, second], 0, 240)["series"]
+    assert len(series) == 1
+    assert series[0]["pointlist"] == [[0, 1.0], [60, 2.0], [120, 3.0], [180, 4.0]]
+    assert (series[0]["start"], series[0]["end"], series[0]["length"]) == (0, 180, 4)
+
+
+def test_stitch_later_chunk_wins_at_boundary():
+    # The bucket starting at the shared boundary belongs to the later chunk
+    first = _response(("a", [[0, 1.0], [120, 9.0]]))
+    second = _response(("a", [[120, 3.0], [180, 4.0]]))
+    assert stitch([first, second], 0, 240)["series"][0]["pointlist"] == [[0, 1.0], [120, 3.0], [180, 4.0]]
+
+
+def test_stitch_null_does_not_replace_value():
+    first = _response(("a", [[0, 1.0], [120, 2.0]]))
+    second = _response(("a", [[120, None], [180, 4.0]]))
+    assert stitch([first, second], 0, 240)["series"][0]["pointlist"] == [[0, 1.0], [120, 2.0], [180, 4.0]]
+
+
+def test_stitch_matches_series_by_scope():
+    first = _response(("a", [[0, 1.0]]), ("b", [[0, 5.0]]))
+    second = _response(("b", [[60, 6.0]]), ("a", [[60, 2.0]]))
+    stitched = stitch([first, second], 0, 120)
+    assert [s["scope"] for s in stitched["series"]] == ["a", "b"]
+    assert stitched["series"][1]["pointlist"] == [[0, 5.0], [60, 6.0]]
+    assert (stitched["from_date"], stitched["to_date"]) == (0, 120_000)
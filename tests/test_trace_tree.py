@@ -0,0 +1,78 @@
+from modules.trace_tree import TraceTree, span_row
+
+MS = 1_000_000
+
+
+def _row(span_id, parent_id, start_ms, duration_ms, service="web", error=0):
+    return (start_ms * MS, duration_ms * MS, span_id, parent_id, service, f"op-{span_id}", error)
+
+
+def _tree():
+    # root 0-100ms calls a (10-40ms) and b (30-90ms) concurrently; b calls c (40-70ms)
+    return TraceTree([
+        _row("b", "root", 30, 60, "api"),
+        _row("root", "0", 0, 100),
+        _row("c", "b", 40, 30, "db", error=1),
+        _row("a", "root", 10, 30, "cache"),
+    ])
+
+
+def _by_id(tree, values):
+    return {tree.span_id[i]: value for i, value in values.items()}
+
+
+def test_structure():
+    tree = _tree()
+    assert len(tree) == 4
+    assert [tree.span_id[i] for i in tree.roots] == ["root"]
+    assert [tree.span_id[i] for i in tree.dfs()] == ["root", "a", "b", "c"]
+    depth = tree.depths()
+    assert {tree.span_id[i]: depth[i] for i in range(len(tree))} == {"root": 0, "a": 1, "b": 1, "c": 2}
+
+
+def test_self_time_counts_overlapping_children_once():
+    tree = _tree()
+    self_ms = {tree.span_id[i]: tree.self_time[i] / MS for i in range(len(tree))}
+    # root is covered by a and b from 10 to 90ms
+    assert self_ms == {"root": 20, "a": 30, "b": 30, "c": 30}
+
+
+def test_critical_path_follows_last_finishing_child():
+    tree = _tree()
+    path = _by_id(tree, tree.critical_path())
+    # root waits on b (ends last) until 30ms, then on a; b waits on c
+    assert {span: ns / MS for span, ns in path.items()} == {"root": 20, "b": 30, "c": 30, "a": 20}
+    assert sum(path.values()) == 100 * MS
+
+
+def test_orphans_and_self_parents_are_roots():
+    tree = TraceTree([_row("x", "missing", 0, 10), _row("y", "y", 5, 20)])
+    assert sorted(tree.span_id[i] for i in tree.roots) == ["x", "y"]
+    assert tree.span_id[tree.root()] == "y"
+
+
+def test_analyze_summaries():
+    result = _tree().analyze(top=2, max_path_spans=2)
+    assert result["span_count"] == 4 and result["error_count"] == 1
+    assert result["critical_path_spans"] == 4
+    assert len(result["critical_path"]) == 2
+    assert result["critical_ms_by_service"] == {"web": 20.0, "api": 30.0, "db": 30.0, "cache": 20.0}
+    assert [row[3] for row in result["tree"]["rows"]] == ["web", "cache", "api", "db"]
+
+
+def test_span_row_from_search_result():
+    span = {
+        "id": "fallback",
+        "attributes": {
+            "start_timestamp": "2026-01-01T00:00:00.5Z",
+            "span_id": "7",
+            "parent_id": "3",
+            "service": "web",
+            "resource_name": "GET /",
+            "custom": {"duration": 1500, "error": 1},
+        },
+    }
+    row = span_row(span)
+    assert row[1:] == (1500, "7", "3", "web", "GET /", 1)
+    assert row[0] % 1_000_000_000 == 500_000_000
+    assert span_row({"attributes": {}}) is None